@@ -0,0 +1,287 @@
+'''
+Columnar representations of trades and transactions for analytics over large
+histories. Requires numpy.
+
+Amounts, prices and fees are int64 arrays of satoshis (multiples of
+common.DECIMAL_PRECISION, see common.to_fixed), times are UTC datetime64[s]
+and markets and currencies are small integer codes into a lookup list.
+Values with more than 8 decimal places are truncated on conversion.
+'''
+import calendar
+import datetime
+
+import numpy as np
+import pytz
+
+import cryptex.common as common
+from cryptex.trade import Trade, Buy, Sell
+from cryptex.transaction import Transaction, Deposit, Withdrawal
+
+SCALE = common.FIXED_SCALE
+
+TRADE_TYPES = {cls.trade_type: cls for cls in (Trade, Buy, Sell)}
+TRANSACTION_TYPES = {cls.transaction_type: cls
+                     for cls in (Transaction, Deposit, Withdrawal)}
+
+# fee_currency codes
+FEE_NONE, FEE_BASE, FEE_COUNTER = 0, 1, 2
+
+def _timestamps(datetimes):
+    return np.array([calendar.timegm(d.utctimetuple()) for d in datetimes],
+                    dtype='int64').astype('datetime64[s]')
+
+def _datetime(timestamp):
+    return pytz.utc.localize(datetime.datetime.utcfromtimestamp(
+        int(timestamp.astype('int64'))))
+
+def _fixed(values):
+    return np.array([0 if v is None else common.to_fixed(v) for v in values],
+                    dtype='int64')
+
+def _codes(keys):
+    lookup = {}
+    codes = np.array([lookup.setdefault(k, len(lookup)) for k in keys],
+                     dtype='int32')
+    values = [None] * len(lookup)
+    for k, code in lookup.iteritems():
+        values[code] = k
+    return codes, values
+
+def multiply(a, b):
+    '''
+    Returns (a * b / SCALE rounded down, whether it was rounded) for arrays of
+    non-negative satoshi values, without overflowing int64 on the way.
+    '''
+    a_high, a_low = np.divmod(a, SCALE)
+    b_high, b_low = np.divmod(b, SCALE)
+    low, remainder = np.divmod(a_low * b_low, SCALE)
+    product = a_high * b_high * SCALE + a_high * b_low + a_low * b_high + low
+    return product, remainder != 0
+
+def _sum_by(codes, size, values):
+    out = np.zeros(size, dtype='int64')
+    np.add.at(out, codes, values)
+    return out
+
+
+class TradeBatch(object):
+    '''
+    Columnar batch of trades
+    '''
+    def __init__(self, trade_id, order_id, market, markets, trade_type,
+                 time, amount, price, fee, has_fee, fee_currency):
+        self.trade_id = trade_id
+        self.order_id = order_id
+        self.market = market
+        self.markets = markets
+        self.trade_type = trade_type
+        self.time = time
+        self.amount = amount
+        self.price = price
+        self.fee = fee
+        self.has_fee = has_fee
+        self.fee_currency = fee_currency
+
+    @classmethod
+    def from_trades(cls, trades):
+        market, markets = _codes((t.base_currency, t.counter_currency)
+                                 for t in trades)
+        fee_currency = []
+        for t in trades:
+            if t.fee_currency is None:
+                fee_currency.append(FEE_NONE)
+            elif t.fee_currency == t.base_currency:
+                fee_currency.append(FEE_BASE)
+            else:
+                fee_currency.append(FEE_COUNTER)
+        return cls(
+            trade_id = np.array([t.trade_id for t in trades], dtype=object),
+            order_id = np.array([t.order_id for t in trades], dtype=object),
+            market = market,
+            markets = markets,
+            trade_type = np.array([t.trade_type for t in trades], dtype='int8'),
+            time = _timestamps(t.datetime for t in trades),
+            amount = _fixed(t.amount for t in trades),
+            price = _fixed(t.price for t in trades),
+            fee = _fixed(t.fee for t in trades),
+            has_fee = np.array([t.fee is not None for t in trades], dtype=bool),
+            fee_currency = np.array(fee_currency, dtype='int8'),
+        )
+
+    def to_trades(self):
+        trades = []
+        for i in xrange(len(self)):
+            base, counter = self.markets[self.market[i]]
+            fee_currency = (None, base, counter)[self.fee_currency[i]]
+            trades.append(TRADE_TYPES[self.trade_type[i]](
+                trade_id = self.trade_id[i],
+                base_currency = base,
+                counter_currency = counter,
+                datetime = _datetime(self.time[i]),
+                order_id = self.order_id[i],
+                amount = common.fixed_to_number(self.amount[i]),
+                price = common.fixed_to_number(self.price[i]),
+                fee = common.fixed_to_number(self.fee[i]) if self.has_fee[i] else None,
+                fee_currency = fee_currency,
+            ))
+        return trades
+
+    def __len__(self):
+        return len(self.amount)
+
+    def select(self, index):
+        '''
+        Returns the batch of the rows selected by a boolean mask or an index
+        array.
+        '''
+        return TradeBatch(self.trade_id[index], self.order_id[index],
+                          self.market[index], self.markets,
+                          self.trade_type[index], self.time[index],
+                          self.amount[index], self.price[index],
+                          self.fee[index], self.has_fee[index],
+                          self.fee_currency[index])
+
+    def market_mask(self, market):
+        try:
+            return self.market == self.markets.index(tuple(market))
+        except ValueError:
+            return np.zeros(len(self), dtype=bool)
+
+    @property
+    def is_buy(self):
+        return self.trade_type == Buy.trade_type
+
+    @property
+    def is_sell(self):
+        return self.trade_type == Sell.trade_type
+
+    def netto_amount(self):
+        '''
+        Vectorized Trade.netto_amount, in satoshis
+        '''
+        return np.where(self.is_buy & self.has_fee,
+                        self.amount - self.fee, self.amount)
+
+    def netto_total(self):
+        '''
+        Vectorized Trade.netto_total, in satoshis
+        '''
+        total, rounded = multiply(self.amount, self.price)
+        with_fee = self.is_sell & self.has_fee
+        netto = np.where(with_fee, total - self.fee, total)
+        # Decimal rounds towards zero, floor division towards -inf
+        return netto + (with_fee & rounded & (netto < 0))
+
+    def totals(self):
+        '''
+        Returns {market: {'bought', 'sold', 'cost', 'proceeds'}} as Decimals,
+        with cost and proceeds being the netto totals of buys and sells.
+        '''
+        size = len(self.markets)
+        netto_total = self.netto_total()
+        columns = {
+            'bought': _sum_by(self.market, size, self.amount * self.is_buy),
+            'sold': _sum_by(self.market, size, self.amount * self.is_sell),
+            'cost': _sum_by(self.market, size, netto_total * self.is_buy),
+            'proceeds': _sum_by(self.market, size, netto_total * self.is_sell),
+        }
+        return {
+            market: {k: common.fixed_to_number(v[code]) for k, v in columns.iteritems()}
+            for code, market in enumerate(self.markets)
+        }
+
+    def positions(self, transactions=None):
+        '''
+        Returns {market: amount of base currency held}, counting deposits and
+        withdrawals of the base currency in every market the way PLCalculator
+        does.
+        '''
+        size = len(self.markets)
+        signed = np.where(self.is_sell, -self.amount, self.amount)
+        held = _sum_by(self.market, size, signed)
+        if transactions is not None:
+            flows = transactions.net_flows()
+            for code, (base, counter) in enumerate(self.markets):
+                held[code] += flows.get(base, 0)
+        return {market: common.fixed_to_number(held[code])
+                for code, market in enumerate(self.markets)}
+
+    def fees(self):
+        '''
+        Returns {currency: total fee paid}
+        '''
+        fees = {}
+        for code, (base, counter) in enumerate(self.markets):
+            in_market = self.has_fee & (self.market == code)
+            for currency, fee_code in ((base, FEE_BASE), (counter, FEE_COUNTER)):
+                paid = self.fee[in_market & (self.fee_currency == fee_code)].sum()
+                if paid:
+                    fees[currency] = fees.get(currency, 0) + int(paid)
+        return {k: common.fixed_to_number(v) for k, v in fees.iteritems()}
+
+
+class TransactionBatch(object):
+    '''
+    Columnar batch of transactions
+    '''
+    def __init__(self, transaction_id, transaction_type, time, currency,
+                 currencies, amount, address, fee, has_fee):
+        self.transaction_id = transaction_id
+        self.transaction_type = transaction_type
+        self.time = time
+        self.currency = currency
+        self.currencies = currencies
+        self.amount = amount
+        self.address = address
+        self.fee = fee
+        self.has_fee = has_fee
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        currency, currencies = _codes(t.currency for t in transactions)
+        return cls(
+            transaction_id = np.array([t.transaction_id for t in transactions],
+                                      dtype=object),
+            transaction_type = np.array([t.transaction_type for t in transactions],
+                                        dtype='int8'),
+            time = _timestamps(t.datetime for t in transactions),
+            currency = currency,
+            currencies = currencies,
+            amount = _fixed(t.amount for t in transactions),
+            address = np.array([t.address for t in transactions], dtype=object),
+            fee = _fixed(t.fee for t in transactions),
+            has_fee = np.array([t.fee is not None for t in transactions],
+                               dtype=bool),
+        )
+
+    def to_transactions(self):
+        return [
+            TRANSACTION_TYPES[self.transaction_type[i]](
+                self.transaction_id[i],
+                _datetime(self.time[i]),
+                self.currencies[self.currency[i]],
+                common.fixed_to_number(self.amount[i]),
+                self.address[i],
+                common.fixed_to_number(self.fee[i]) if self.has_fee[i] else None,
+            )
+            for i in xrange(len(self))
+        ]
+
+    def __len__(self):
+        return len(self.amount)
+
+    def select(self, index):
+        return TransactionBatch(self.transaction_id[index],
+                                self.transaction_type[index], self.time[index],
+                                self.currency[index], self.currencies,
+                                self.amount[index], self.address[index],
+                                self.fee[index], self.has_fee[index])
+
+    def net_flows(self):
+        '''
+        Returns {currency: deposits - withdrawals} in satoshis
+        '''
+        sign = ((self.transaction_type == Deposit.transaction_type).astype('int64') -
+                (self.transaction_type == Withdrawal.transaction_type))
+        flows = _sum_by(self.currency, len(self.currencies), self.amount * sign)
+        return {c: int(flows[code]) for code, c in enumerate(self.currencies)}
@@ -7,5 +7,152 @@ decimal.setcontext(decimal.DefaultContext)
 
 DECIMAL_PRECISION = decimal.Decimal(10) ** -8
 
-def quantize(decimal_value):
-	return decimal_value.quantize(DECIMAL_PRECISION)
+def quantize(value):
+	# Fixed-point values are always exact to DECIMAL_PRECISION
+	if isinstance(value, (int, long)):
+		return value
+	return value.quantize(DECIMAL_PRECISION)
+
+# Fixed-point representation: amounts and prices as integer multiples of
+# DECIMAL_PRECISION (satoshis)
+FIXED_SCALE = 10 ** 8
+
+def _scale(value):
+	return int((decimal.Decimal(value) * FIXED_SCALE).to_integral_value(
+		rounding=decimal.ROUND_DOWN))
+
+def to_fixed(value):
+	'''
+	Satoshis of an amount or price, read like number() does
+	'''
+	if _fixed:
+		return number(value)
+	return _scale(number(value))
+
+def from_fixed(value):
+	return quantize(decimal.Decimal(int(value)) / FIXED_SCALE)
+
+# Numeric backends. DECIMAL represents amounts and prices as Decimals, FIXED
+# as long integers of satoshis. Under FIXED, JSON numbers with a fraction
+# parse straight into satoshis while plain JSON integers stay ints, which
+# leaves ids and timestamps alone. The one rule for telling the two apart,
+# in number(), to_fixed() and format_number() alike: a long is satoshis,
+# any other number (int, float, string, Decimal) is in whole units.
+# Arithmetic rounds towards zero like the Decimal context above.
+DECIMAL = 'decimal'
+FIXED = 'fixed'
+
+_fixed = False
+
+def set_backend(backend):
+	'''
+	Selects the numeric backend. Set it once at startup, before any
+	amounts are parsed.
+	'''
+	global _fixed
+	if backend not in (DECIMAL, FIXED):
+		raise ValueError('Unknown numeric backend "%s"' % backend)
+	_fixed = backend == FIXED
+
+def get_backend():
+	return FIXED if _fixed else DECIMAL
+
+def _truncdiv(a, b):
+	q = abs(a) // abs(b)
+	return q if (a < 0) == (b < 0) else -q
+
+def _parse_fixed(text):
+	'''
+	Satoshis of a decimal string, truncated to DECIMAL_PRECISION
+	'''
+	if 'e' in text or 'E' in text:
+		return long(_scale(text))
+	negative = text.startswith('-')
+	whole, _, fraction = text.lstrip('+-').partition('.')
+	value = long(whole or 0) * FIXED_SCALE + long((fraction[:8] or '0').ljust(8, '0'))
+	return -value if negative else value
+
+def parse_float(text):
+	'''
+	parse_float hook for json.loads
+	'''
+	if _fixed:
+		return _parse_fixed(text)
+	return decimal.Decimal(text)
+
+def number(value):
+	'''
+	Converts an amount or price (a string, int, float, Decimal or, under
+	FIXED, long of satoshis) to the active backend
+	'''
+	if value is None:
+		return None
+	if _fixed:
+		kind = type(value)
+		if kind is long:
+			return value
+		if kind is int:
+			return long(value) * FIXED_SCALE
+		if kind is float:
+			return _parse_fixed(repr(value))
+		if isinstance(value, basestring):
+			return _parse_fixed(value)
+		return long(_scale(value))
+	if isinstance(value, decimal.Decimal):
+		return value
+	if isinstance(value, float):
+		return decimal.Decimal(repr(value))
+	return decimal.Decimal(value)
+
+def descale(product):
+	'''
+	Brings the product of two amounts back to the scale of an amount: a
+	division by FIXED_SCALE under FIXED, a no-op for Decimals
+	'''
+	if _fixed:
+		return _truncdiv(product, FIXED_SCALE)
+	return product
+
+def mul(a, b):
+	'''
+	a * b rounded down to DECIMAL_PRECISION, e.g. the total of amount and
+	price
+	'''
+	if _fixed:
+		return _truncdiv(a * b, FIXED_SCALE)
+	return quantize(a * b)
+
+def divide(a, b):
+	'''
+	a / b, rounded towards zero to an integer under FIXED
+	'''
+	if _fixed:
+		return _truncdiv(a, b)
+	return a / b
+
+def to_decimal(value):
+	'''
+	Decimal of an amount or price of the active backend
+	'''
+	if _fixed and isinstance(value, (int, long)):
+		return from_fixed(number(value))
+	return value
+
+def fixed_to_number(value):
+	'''
+	Amount or price of the active backend from satoshis
+	'''
+	if _fixed:
+		return long(value)
+	return from_fixed(value)
+
+def format_number(value):
+	'''
+	Plain decimal string of an amount or price, e.g. for request parameters
+	'''
+	if value is None:
+		return None
+	if _fixed and type(value) is long:
+		whole, fraction = divmod(abs(value), FIXED_SCALE)
+		return '%s%d.%08d' % ('-' if value < 0 else '', whole, fraction)
+	return str(value)
@@ -0,0 +1,131 @@
+import threading
+from multiprocessing.pool import ThreadPool
+
+
+_executor = None
+_lanes = {}
+_lock = threading.Lock()
+
+def get_default_executor(processes=16):
+    """
+    Returns the worker pool shared by all asynchronous clients.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPool(processes)
+        return _executor
+
+SIGNED_CONCURRENCY = 4
+
+def get_signed_lane(key, concurrency=SIGNED_CONCURRENCY):
+    """
+    Returns the worker pool that runs up to concurrency signed calls for key
+    at a time.
+
+    SingleEndpointAPI draws each nonce from the key's allocator just before
+    the request is sent, so overlapping calls get increasing nonces, and
+    retries the rare call that still reaches the exchange behind a higher
+    nonce. A concurrency of one sends signed calls strictly one by one.
+    """
+    with _lock:
+        lane = _lanes.get((key, concurrency))
+        if lane is None:
+            lane = _lanes[(key, concurrency)] = ThreadPool(concurrency)
+        return lane
+
+def gather(*results, **kwargs):
+    """
+    Waits for the given results and returns their values in order. Raises
+    the first error encountered.
+    """
+    timeout = kwargs.get('timeout')
+    return [r.get(timeout) for r in results]
+
+
+class AsyncSingleEndpointAPI(object):
+    """
+    Non-blocking front for a SingleEndpointAPI. Calls return a
+    multiprocessing.pool.AsyncResult instead of the decoded response.
+
+    Public calls run concurrently on the shared executor. Signed calls run on
+    the key's signed lane, up to signed_concurrency at a time.
+    """
+    def __init__(self, api, executor=None,
+                 signed_concurrency=SIGNED_CONCURRENCY):
+        self.api = api
+        self.executor = executor or get_default_executor()
+        if api.authenticated:
+            self.lane = get_signed_lane(api.key, signed_concurrency)
+        else:
+            self.lane = None
+
+    def submit(self, func, *args, **kwargs):
+        return (self.lane or self.executor).apply_async(func, args, kwargs)
+
+    def perform_request(self, method, data={}):
+        return self.submit(self.api.perform_request, method, data)
+
+
+class AsyncPublic(object):
+    """
+    Non-blocking front for a public client such as BTCEPublic or
+    CryptsyPublic. Every public method returns an AsyncResult.
+    """
+    def __init__(self, public, executor=None):
+        self.public = public
+        self.executor = executor or get_default_executor()
+
+    def __getattr__(self, name):
+        attr = getattr(self.public, name)
+        if not callable(attr):
+            return attr
+
+        def submit(*args, **kwargs):
+            return self.executor.apply_async(attr, args, kwargs)
+        return submit
+
+
+class AsyncExchange(object):
+    """
+    Non-blocking front for a cryptex.exchange.Exchange. Offers the same
+    methods, each returning an AsyncResult, so that independent calls on
+    several exchanges can be awaited together:
+
+        balances, orders = gather(cryptsy.get_my_balances(),
+                                  btce.get_my_open_orders())
+
+    Calls on one exchange are signed, and overlap up to signed_concurrency
+    at a time, see get_signed_lane.
+    """
+    def __init__(self, exchange, executor=None,
+                 signed_concurrency=SIGNED_CONCURRENCY):
+        self.exchange = exchange
+        self.api = AsyncSingleEndpointAPI(exchange.api, executor,
+                                          signed_concurrency)
+        if hasattr(exchange, 'public'):
+            self.public = AsyncPublic(exchange.public, executor)
+
+    def _submit(self, name, args, kwargs):
+        return self.api.submit(getattr(self.exchange, name), *args, **kwargs)
+
+    def get_my_open_orders(self, *args, **kwargs):
+        return self._submit('get_my_open_orders', args, kwargs)
+
+    def get_my_trades(self, *args, **kwargs):
+        return self._submit('get_my_trades', args, kwargs)
+
+    def cancel_order(self, order_id):
+        return self._submit('cancel_order', (order_id,), {})
+
+    def buy(self, market, quantity, price):
+        return self._submit('buy', (market, quantity, price), {})
+
+    def sell(self, market, quantity, price):
+        return self._submit('sell', (market, quantity, price), {})
+
+    def get_my_transactions(self, *args, **kwargs):
+        return self._submit('get_my_transactions', args, kwargs)
+
+    def get_my_balances(self):
+        return self._submit('get_my_balances', (), {})
@@ -0,0 +1,194 @@
+import calendar
+import time
+
+import cryptex.common as common
+from cryptex.exchange.exchange import ReconcilingListener
+from cryptex.order import BuyOrder
+from cryptex.trade import Buy
+from cryptex.transaction import Deposit, Withdrawal
+
+
+def _timestamp(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+
+class BalanceCache(ReconcilingListener):
+    '''
+    Available balances of an account, kept in memory and updated from the
+    events of its Exchange client: funds are put on hold when an order is
+    placed through the client and released when it is cancelled, and fills
+    and transactions are booked as the client fetches them. Exchanges that
+    report balances along with an event (BTC-e) are taken at their word.
+
+    The balances are fetched again with get_my_balances of the exchange
+    every max_age seconds, and on the next read once the local state has
+    drifted: on a fill or cancellation of an order placed elsewhere, a
+    record it cannot book or a negative balance. last_drift holds the
+    difference found by the last reconciliation.
+
+    Holds of buy orders include fee_rate of their total, like Cryptsy
+    charges. Fills without a fee (BTC-e) pay fee_rate of what they receive.
+    Records dated before the last reconciliation are taken to be included
+    in it, so the clocks of exchange and host should roughly agree.
+    '''
+    def __init__(self, exchange, max_age=300, fee_rate=0, clock=time.time):
+        self.fee_rate = common.number(fee_rate)
+        self.balances = None
+        self.last_drift = {}
+        # {order_id: [order, remaining amount]}
+        self._orders = {}
+        self._seen = set()
+        # Changes made while a reconciliation is in flight
+        self._pending = None
+        super(BalanceCache, self).__init__(exchange, max_age, clock)
+
+    def get_my_balances(self):
+        '''
+        Returns {currency: available amount} like Exchange.get_my_balances
+        '''
+        with self._lock:
+            if not self._stale():
+                return dict(self.balances)
+        return self.reconcile()
+
+    def reconcile(self):
+        '''
+        Replaces the local balances with the exchange's and returns them
+        '''
+        with self._lock:
+            self._pending = []
+            started = self.clock()
+        try:
+            server = self.exchange.get_my_balances()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            balances = dict(server)
+            for currency, delta in self._pending:
+                balances[currency] = balances.get(currency, 0) + delta
+            self._pending = None
+            self._replace(balances, started)
+            return dict(balances)
+
+    def _replace(self, balances, fetched_at):
+        if self.balances is not None:
+            drift = {}
+            for currency in set(balances) | set(self.balances):
+                delta = balances.get(currency, 0) - self.balances.get(currency, 0)
+                if delta:
+                    drift[currency] = delta
+            self.last_drift = drift
+        self.balances = balances
+        self._reconciled(fetched_at)
+
+    def _add(self, currency, delta):
+        if not delta:
+            return
+        if self._pending is not None:
+            self._pending.append((currency, delta))
+        if self.balances is None:
+            return
+        value = self.balances[currency] = self.balances.get(currency, 0) + delta
+        if value < 0:
+            self.dirty = True
+
+    def _hold(self, order, amount):
+        '''
+        (currency, amount) an order holds for amount of it
+        '''
+        if isinstance(order, BuyOrder):
+            total = common.mul(amount, order.price)
+            return order.counter_currency, total + common.mul(total, self.fee_rate)
+        return order.base_currency, amount
+
+    def _reported(self, balances):
+        if self._pending is not None:
+            # Newer than the snapshot being fetched
+            self._pending = []
+        self._replace(dict(balances), self.clock())
+
+    # ExchangeListener
+
+    def order_placed(self, exchange, order, balances=None):
+        with self._lock:
+            if balances is not None:
+                self._reported(balances)
+            else:
+                currency, held = self._hold(order, order.amount)
+                self._add(currency, -held)
+            if order.order_id:
+                self._orders[order.order_id] = [order, order.amount]
+
+    def order_cancelled(self, exchange, order_id, balances=None):
+        with self._lock:
+            entry = self._orders.pop(order_id, None)
+            if balances is not None:
+                self._reported(balances)
+            elif entry is None:
+                self.dirty = True
+            else:
+                currency, held = self._hold(*entry)
+                self._add(currency, held)
+
+    def trades_observed(self, exchange, trades):
+        with self._lock:
+            for trade in trades:
+                key = ('trade', trade.trade_id)
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+                entry = self._orders.get(trade.order_id)
+                if entry is not None:
+                    entry[1] -= trade.amount
+                    if entry[1] <= 0:
+                        del self._orders[trade.order_id]
+                if self._included(trade):
+                    continue
+                if entry is None:
+                    self.dirty = True
+                else:
+                    self._fill(entry[0], trade)
+
+    def _included(self, record):
+        return (self.fetched_at is None or
+                _timestamp(record.datetime) < self.fetched_at)
+
+    def _fee(self, trade, currency, received):
+        if trade.fee is None:
+            return common.mul(received, self.fee_rate) if received else 0
+        return trade.fee if trade.fee_currency == currency else 0
+
+    def _fill(self, order, trade):
+        base, counter = trade.base_currency, trade.counter_currency
+        total = common.mul(trade.amount, trade.price)
+        if isinstance(trade, Buy):
+            held = self._hold(order, trade.amount)[1]
+            self._add(counter, held - total - self._fee(trade, counter, 0))
+            self._add(base, trade.amount - self._fee(trade, base, trade.amount))
+        else:
+            self._add(counter, total - self._fee(trade, counter, total))
+            self._add(base, -self._fee(trade, base, 0))
+
+    def transactions_observed(self, exchange, transactions):
+        with self._lock:
+            for tx in transactions:
+                key = ('transaction', tx.transaction_id)
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+                if self._included(tx):
+                    continue
+                if isinstance(tx, Deposit):
+                    self._add(tx.currency, tx.amount)
+                elif isinstance(tx, Withdrawal):
+                    self._add(tx.currency, -(tx.amount + (tx.fee or 0)))
+                else:
+                    self.dirty = True
+
+    def _stats(self):
+        return {
+            'open_orders': len(self._orders),
+            'last_drift': dict(self.last_drift),
+        }
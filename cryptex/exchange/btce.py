@@ -1,22 +1,20 @@
-import datetime
-import pytz
 from urlparse import urljoin
-from decimal import Decimal
-
-import requests
 
+import cryptex.common as common
 from cryptex.exchange import Exchange
-from cryptex.trade import Sell, Buy
-from cryptex.order import SellOrder, BuyOrder
-from cryptex.transaction import Transaction, Deposit, Withdrawal
+from cryptex.timestamps import from_unix
+from cryptex.orderbook import OrderBook
+from cryptex.trade import Sell, Buy, build_trades
+from cryptex.order import SellOrder, BuyOrder, build_orders
+from cryptex.transaction import Transaction, Deposit, Withdrawal, build_transactions
 from cryptex.exchange.single_endpoint import SingleEndpointAPI
+from cryptex.exchange.connection_pool import get_default_pool
+from cryptex.exchange.cache import ResponseCache
+from cryptex.exchange.market_registry import MarketRegistry, MarketInfo
 from cryptex.exception import APIException
 
 class BTCEUtil(object):
-    @staticmethod
-    def format_timestamp(timestamp):
-        return pytz.utc.localize(datetime.datetime.utcfromtimestamp(
-            timestamp))
+    format_timestamp = staticmethod(from_unix)
 
     @staticmethod
     def pair_to_market(pair):
@@ -29,18 +27,38 @@ class BTCEUtil(object):
 class BTCEPublic():
     '''
     BTC-e public API https://btc-e.com/api/3/documentation
-    All information is cached for 2 seconds on the server
+    All information is cached for 2 seconds on the server, so responses are
+    cached locally as well (see CACHE_TTLS). Pass cache=False to disable.
+    Market metadata from `info` is kept in a MarketRegistry, which may be
+    passed in to share or persist it. Requests that miss the cache wait for
+    their turn in scheduler, a cryptex.exchange.scheduler.RequestScheduler,
+    if one is given.
 
-    TODO: Add local caching to prevent frequent requests
     TODO: Format market pairs in output
     '''
     URL_ROOT = "https://btc-e.com/api/3/"
-
-    def perform_request(self, method, markets=[], limit=0, ignore_invalid=False):
+    CACHE_TTLS = {
+        'info': 300,
+        'ticker': 2,
+        'depth': 2,
+        'trades': 2,
+    }
+
+    def __init__(self, pool=None, cache=None, registry=None, scheduler=None):
+        self.pool = pool or get_default_pool()
+        self.scheduler = scheduler
+        if cache is None:
+            cache = ResponseCache(BTCEPublic.CACHE_TTLS)
+        self.cache = cache
+        self.registry = registry or MarketRegistry(self._load_markets)
+
+    def perform_request(self, method, markets=[], limit=0, ignore_invalid=False,
+                        cached=True):
         """
         Perform a request against the BTC-e public API. Market paris
         are represented as a list of tuples of the form ('BTC',
-        'USD').
+        'USD'). Cached responses are shared by all callers and must not be
+        modified; pass cached=False to always ask the server.
         """
         market_pair_strings = [BTCEUtil.market_to_pair(m) for m in markets]
         market_pair_component = "-".join(market_pair_strings)
@@ -54,12 +72,20 @@ class BTCEPublic():
         if ignore_invalid:
             params['ignore_invalid'] = 1
 
-        url = urljoin(BTCEPublic.URL_ROOT, method)
+        url = urljoin(self.URL_ROOT, method)
         if market_pair_component:
             url += "/" + market_pair_component
         #print url
-        r = requests.get(url, params=params)
-        return r.json(parse_float=Decimal)
+        def fetch():
+            if self.scheduler is not None:
+                self.scheduler.acquire(method)
+            r = self.pool.get(url, params=params)
+            return r.json(parse_float=common.parse_float)
+
+        if not self.cache or not cached:
+            return fetch()
+        key = (method, tuple(markets), limit, ignore_invalid)
+        return self.cache.get(key, fetch)
 
     def get_info(self):
         '''
@@ -67,11 +93,22 @@ class BTCEPublic():
         digits after the decimal point in the auction, the minimum price,
         maximum price, minimum quantity purchase / sale, hidden=1whether the
         pair and the pair commission.
+
+        Always asks the server, so that server_time is current.
         '''
-        j = self.perform_request('info')
+        j = self.perform_request('info', cached=False)
         j['server_time'] = BTCEUtil.format_timestamp(j['server_time'])
         return j
 
+    def _load_markets(self):
+        return [
+            MarketInfo(pair, *BTCEUtil.pair_to_market(pair),
+                       decimal_places=p['decimal_places'],
+                       min_amount=p['min_amount'],
+                       fee=p['fee'])
+            for pair, p in self.perform_request('info')['pairs'].iteritems()
+        ]
+
     def get_ticker(self, markets, **kwargs):
         '''
         Information about bidding on a pair, such as: the highest price, lowest
@@ -83,20 +120,16 @@ class BTCEPublic():
         '''
         results = self.perform_request('ticker', markets, **kwargs)
 
-        for (k, v) in results.iteritems():
-            if isinstance(v, dict):
-                v['updated'] = BTCEUtil.format_timestamp(v['updated'])
-
-        return results
+        return {
+            k: dict(v, updated=BTCEUtil.format_timestamp(v['updated']))
+            if isinstance(v, dict) else v
+            for k, v in results.iteritems()
+        }
 
     def get_last_trade_prices(self):
-        def to_tuple(pair):
-            return tuple([s.upper() for s in pair.split('_')])
-
-        pairs = self.get_info()['pairs']
-        pairs = [to_tuple(p) for p in pairs]
-        info = self.get_ticker(pairs)
-        return {to_tuple(k): Decimal(v['last']) for k, v in info.iteritems()}
+        info = self.get_ticker(self.get_markets())
+        return {BTCEUtil.pair_to_market(k): common.number(v['last'])
+                for k, v in info.iteritems()}
 
     def get_depth(self, market, limit=150):
         '''
@@ -104,7 +137,20 @@ class BTCEPublic():
         Takes an optional parameter limit which indicates how many orders you
         want to display (default 150, max 2000)
         '''
-        return self.perform_request('depth', [market], limit=limit)
+        response = self.perform_request('depth', [market], limit=limit)
+
+        return {
+            pair: {side: [list(level) for level in levels]
+                   for side, levels in depth.iteritems()}
+            for pair, depth in response.iteritems()
+        }
+
+    def get_order_book(self, market, limit=150):
+        '''
+        Market depth as a cryptex.orderbook.OrderBook
+        '''
+        depth = self.get_depth(market, limit)[BTCEUtil.market_to_pair(market)]
+        return OrderBook.from_btce_depth(market, depth)
 
     def get_trades(self, market, limit=150):
         '''
@@ -114,55 +160,84 @@ class BTCEPublic():
         '''
         response = self.perform_request('trades', [market], limit)
 
-        for (market, trades) in response.iteritems():
-            for t in trades:
-                t['timestamp'] = BTCEUtil.format_timestamp(t['timestamp'])
-        return response
+        return {
+            market: [dict(t, timestamp=BTCEUtil.format_timestamp(t['timestamp']))
+                     for t in trades]
+            for market, trades in response.iteritems()
+        }
 
     def get_markets(self):
-        return [
-            BTCEUtil.pair_to_market(pair)
-            for pair in self.get_info()['pairs']
-        ]
+        return self.registry.markets()
 
 class BTCE(Exchange):
 
-    def __init__(self, key, secret):
-        self.public = BTCEPublic()
-        self.api = SingleEndpointAPI('https://btc-e.com/tapi', key, secret)
+    def __init__(self, key, secret, pool=None, nonce=None, scheduler=None):
+        self.public = BTCEPublic(pool, scheduler=scheduler)
+        self.api = SingleEndpointAPI('https://btc-e.com/tapi', key, secret,
+                                     pool, nonce, scheduler)
+
+    def get_markets(self):
+        return self.public.get_markets()
 
     def perform_request(self, method, data={}):
         try:
             return self.api.perform_request(method, data)
         except APIException as e:
-            if e.message == 'no orders':
+            if e.message in ('no orders', 'no trades', 'no transactions'):
                 return {}
             else:
                 raise e
     @staticmethod
-    def _format_trade(trade_id, trade):
+    def _trade_row(trade_id, trade):
         base, counter = BTCEUtil.pair_to_market(trade['pair'])
         if trade['type'] == 'buy':
             trade_type = Buy
         else:
             trade_type = Sell
 
-        return trade_type(
-            trade_id = trade_id,
-            base_currency = base.upper(),
-            counter_currency = counter.upper(),
-            datetime = BTCEUtil.format_timestamp(trade['timestamp']),
-            order_id = str(trade['order_id']),
-            amount = trade['amount'],
-            price = trade['rate'],
-        )
+        return (trade_type, trade_id, base.upper(), counter.upper(),
+                BTCEUtil.format_timestamp(trade['timestamp']),
+                str(trade['order_id']), common.number(trade['amount']),
+                common.number(trade['rate']),
+                None, None)
+
+    @staticmethod
+    def _format_trade(trade_id, trade):
+        return build_trades([BTCE._trade_row(trade_id, trade)])[0]
+
+    @staticmethod
+    def _format_trades(trades):
+        return build_trades([BTCE._trade_row(t_id, t)
+                             for t_id, t in trades.iteritems()])
 
     def get_my_trades(self):
-        trades = self.perform_request('TradeHistory')
-        return [BTCE._format_trade(t_id, t) for t_id, t in trades.iteritems()]
+        return self._trades_observed(
+            BTCE._format_trades(self.perform_request('TradeHistory')))
+
+    def _request_pages(self, method, from_id, count=1000):
+        """
+        Requests method in ascending id order starting at from_id, following
+        up with further pages until one comes back short.
+        """
+        records = {}
+        while True:
+            page = self.perform_request(method, {
+                'from_id': from_id,
+                'count': count,
+                'order': 'ASC',
+            })
+            records.update(page)
+            if len(page) < count:
+                return records
+            from_id = max(int(i) for i in page) + 1
+
+    def get_my_new_trades(self, last_trade=None):
+        from_id = 0 if last_trade is None else int(last_trade.trade_id) + 1
+        return self._trades_observed(
+            BTCE._format_trades(self._request_pages('TradeHistory', from_id)))
 
     @staticmethod
-    def _format_order(order_id, order):
+    def _order_row(order_id, order):
         if order['type'] == 'buy':
             order_type = BuyOrder
         else:
@@ -170,52 +245,65 @@ class BTCE(Exchange):
 
         base, counter = BTCEUtil.pair_to_market(order['pair'])
 
-        return order_type(
-            order_id = order_id,
-            base_currency = base.upper(),
-            counter_currency = counter.upper(),
-            datetime = BTCEUtil.format_timestamp(order['timestamp_created']),
-            amount = order['amount'],
-            price = order['rate']
-        )
+        return (order_type, order_id, base.upper(), counter.upper(),
+                BTCEUtil.format_timestamp(order['timestamp_created']),
+                common.number(order['amount']), common.number(order['rate']))
+
+    @staticmethod
+    def _format_order(order_id, order):
+        return build_orders([BTCE._order_row(order_id, order)])[0]
 
     def get_my_open_orders(self):
         orders = self.perform_request('ActiveOrders')
-        return [self._format_order(o_id, o) for o_id, o in orders.iteritems()]
+        return build_orders([BTCE._order_row(o_id, o)
+                             for o_id, o in orders.iteritems()])
 
     def cancel_order(self, order_id):
-        self.perform_request('CancelOrder', {'order_id': order_id})
+        response = self.perform_request('CancelOrder', {'order_id': order_id})
+        self._order_cancelled(str(order_id), BTCE._funds(response.get('funds')))
         return None
 
     def _create_order(self, market, order_type, quantity, price):
         params = {
             'pair': BTCEUtil.market_to_pair(market),
             'type': order_type,
-            'amount': quantity,
-            'rate': price
+            'amount': common.format_number(common.number(quantity)),
+            'rate': common.format_number(common.number(price))
         }
         return self.perform_request('Trade', params)
 
+    @staticmethod
+    def _order_id(order_id):
+        '''
+        order_id of a Trade response as a string like the ids of
+        ActiveOrders and TradeHistory; 0 (filled right away) stays falsy
+        '''
+        return str(order_id) if order_id else order_id
+
     def buy(self, market, quantity, price):
         response = self._create_order(market, 'buy', quantity, price)
-        return response['order_id']
+        return self._order_placed(BuyOrder, tuple(market), quantity, price,
+                                  BTCE._order_id(response['order_id']),
+                                  BTCE._funds(response.get('funds')))
 
     def sell(self, market, quantity, price):
         response = self._create_order(market, 'sell', quantity, price)
-        return response['order_id']
+        return self._order_placed(SellOrder, tuple(market), quantity, price,
+                                  BTCE._order_id(response['order_id']),
+                                  BTCE._funds(response.get('funds')))
 
-    def get_my_transactions(self, limit=1000):
-        transactions = []
-        for tid, t in self.perform_request('TransHistory', {'count': limit}).iteritems():
+    @staticmethod
+    def _format_transactions(records):
+        rows = []
+        for tid, t in records.iteritems():
             if t['type'] == 1:
                 # Assume no fees for deopsit
-                transactions.append(Deposit(tid,
-                                            BTCEUtil.format_timestamp(t['timestamp']),
-                                            t['currency'],
-                                            t['amount'],
-                                            '',
-                                            0
-                                    ))
+                rows.append((Deposit, tid,
+                             BTCEUtil.format_timestamp(t['timestamp']),
+                             t['currency'],
+                             common.number(t['amount']),
+                             '',
+                             0))
             elif t['type'] == 2:
                 idx = t['desc'].find('address ')
                 if idx:
@@ -223,14 +311,35 @@ class BTCE(Exchange):
                 else:
                     address = ''
                 # Withdraw fees are not provided by BTC-e API
-                transactions.append(Withdrawal(tid,
-                                            BTCEUtil.format_timestamp(t['timestamp']),
-                                            t['currency'],
-                                            t['amount'],
-                                            address
-                                    ))
-        return transactions
+                rows.append((Withdrawal, tid,
+                             BTCEUtil.format_timestamp(t['timestamp']),
+                             t['currency'],
+                             common.number(t['amount']),
+                             address,
+                             None))
+        return build_transactions(rows)
+
+    def get_my_transactions(self, limit=1000):
+        return self._transactions_observed(BTCE._format_transactions(
+            self.perform_request('TransHistory', {'count': limit})))
+
+    def get_my_new_transactions(self, last_transaction=None):
+        if last_transaction is None:
+            from_id = 0
+        else:
+            from_id = int(last_transaction.transaction_id) + 1
+        return self._transactions_observed(BTCE._format_transactions(
+            self._request_pages('TransHistory', from_id)))
+
+    @staticmethod
+    def _funds(funds):
+        '''
+        Available balances of a funds object, which getInfo, Trade and
+        CancelOrder return
+        '''
+        if funds is None:
+            return None
+        return {k.upper(): common.number(v) for k, v in funds.iteritems() if v}
 
     def get_my_balances(self):
-        funds = self.perform_request('getInfo')['funds']
-        return {k.upper(): v for k, v in funds.iteritems() if v}
+        return BTCE._funds(self.perform_request('getInfo')['funds'])
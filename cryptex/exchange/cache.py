@@ -0,0 +1,102 @@
+import time
+import threading
+
+
+class _Call(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache(object):
+    """
+    Time-based cache for public API responses.
+
+    Entries are fresh for the TTL of their method (the first element of the
+    key) and are then served stale for another stale_ttl seconds while a
+    background thread refreshes them. Concurrent misses on the same key share
+    a single fetch.
+    """
+    def __init__(self, ttls=None, default_ttl=2, stale_ttl=0, clock=time.time):
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._in_flight = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key, fetch):
+        """
+        Returns the cached value for key, calling fetch() to obtain it if
+        there is no usable entry.
+        """
+        ttl = self.ttls.get(key[0], self.default_ttl)
+        refresh = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = self.clock() - fetched_at
+                if age < ttl:
+                    self.hits += 1
+                    return value
+                if age < ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    if key not in self._in_flight:
+                        refresh = self._in_flight[key] = _Call()
+            if refresh is None:
+                call = self._in_flight.get(key)
+                if call is None:
+                    self.misses += 1
+                    call = self._in_flight[key] = _Call()
+                    leader = True
+                else:
+                    self.coalesced += 1
+                    leader = False
+
+        if refresh is not None:
+            thread = threading.Thread(target=self._fetch,
+                                      args=(key, fetch, refresh))
+            thread.daemon = True
+            thread.start()
+            return value
+
+        if leader:
+            self._fetch(key, fetch, call)
+        else:
+            call.event.wait()
+        if call.error is not None:
+            raise call.error
+        return call.value
+
+    def _fetch(self, key, fetch, call):
+        try:
+            call.value = fetch()
+        except Exception as e:
+            call.error = e
+        with self._lock:
+            if call.error is None:
+                self._entries[key] = (call.value, self.clock())
+            del self._in_flight[key]
+        call.event.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'entries': len(self._entries),
+            }
@@ -0,0 +1,126 @@
+import threading
+from urlparse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ConnectionPool(object):
+    """
+    Shared keep-alive HTTP connections for exchange clients.
+
+    Wraps a requests.Session whose adapters keep up to pool_maxsize open
+    connections per host, so consecutive calls to the same exchange reuse an
+    established TCP/TLS connection instead of doing a new handshake each time.
+    If pool_block is set, callers wait for a free connection instead of
+    opening extra ones once a host's pool is exhausted.
+
+    A caller-provided session is used as is; only its requests are counted.
+    """
+    def __init__(self, pool_connections=10, pool_maxsize=10, max_retries=0,
+                 pool_block=False, timeout=30, session=None):
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            for prefix in ('http://', 'https://'):
+                session.mount(prefix, HTTPAdapter(
+                    pool_connections=pool_connections,
+                    pool_maxsize=pool_maxsize,
+                    max_retries=max_retries,
+                    pool_block=pool_block))
+        self.session = session
+
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._requests = 0
+        self._waits = 0
+        self._overflows = 0
+
+    def _acquire(self, host):
+        with self._lock:
+            in_flight = self._in_flight.get(host, 0)
+            if in_flight >= self.pool_maxsize:
+                # urllib3 only queues callers with pool_block, otherwise it
+                # opens a connection that is discarded after the request
+                if self.pool_block:
+                    self._waits += 1
+                else:
+                    self._overflows += 1
+            self._in_flight[host] = in_flight + 1
+            self._requests += 1
+
+    def _release(self, host):
+        with self._lock:
+            self._in_flight[host] -= 1
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlparse(url).netloc
+        self._acquire(host)
+        try:
+            return self.session.request(method, url, **kwargs)
+        finally:
+            self._release(host)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def _new_connections(self):
+        total = 0
+        for adapter in getattr(self.session, 'adapters', {}).values():
+            pools = getattr(getattr(adapter, 'poolmanager', None), 'pools', None)
+            if pools is None:
+                continue
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    total += pool.num_connections
+        return total
+
+    def stats(self):
+        """
+        Returns a dict with the number of requests made, the number of them
+        served over an already open connection (hits), the number of
+        connections opened, and how many requests found their host's pool
+        exhausted: with pool_block they wait for a connection (waits),
+        without it they use a throwaway one (overflows).
+        """
+        new_connections = self._new_connections()
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'hits': max(self._requests - new_connections, 0),
+                'new_connections': new_connections,
+                'waits': self._waits,
+                'overflows': self._overflows,
+                'in_flight': sum(self._in_flight.values()),
+            }
+
+    def close(self):
+        self.session.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+def get_default_pool():
+    """
+    Returns the process-wide pool used by exchange clients that were not
+    given one explicitly.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = ConnectionPool()
+        return _default_pool
+
+def set_default_pool(pool):
+    global _default_pool
+    with _default_pool_lock:
+        _default_pool = pool
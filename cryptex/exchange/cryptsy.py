@@ -3,12 +3,17 @@ from decimal import Decimal, InvalidOperation
 import pytz
 
 import cryptex.common as common
+from cryptex.timestamps import get_converter
+from cryptex.lazy import LazyRecord
+from cryptex.orderbook import OrderBook
 from cryptex.exception import CryptsyException
 from cryptex.exchange import Exchange
-from cryptex.trade import Sell, Buy
-from cryptex.order import SellOrder, BuyOrder
-from cryptex.transaction import Transaction, Deposit, Withdrawal
+from cryptex.exchange.exchange import BatchResult
+from cryptex.trade import Sell, Buy, build_trades
+from cryptex.order import SellOrder, BuyOrder, build_orders
+from cryptex.transaction import Transaction, Deposit, Withdrawal, build_transactions
 from cryptex.exchange.single_endpoint import SingleEndpointAPI
+from cryptex.exchange.market_registry import MarketRegistry, MarketInfo
 
 
 class CryptsyBase(object):
@@ -17,6 +22,7 @@ class CryptsyBase(object):
         Can't get servertimezone via public API so hardcode to EST
         '''
         self.timezone = pytz.timezone(u'EST')
+        self._converter = None
 
     def _get_info(self):
         raise NotImplementedError
@@ -37,20 +43,29 @@ class CryptsyBase(object):
         """
         Convert cryptsy datetime to timezone-aware datetime object in UTC
         """
-        naive_time = datetime.datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-        cryptsy_time = self._get_timezone()
-        aware_time = cryptsy_time.normalize(cryptsy_time.localize(naive_time)).astimezone(pytz.utc)
-        return aware_time
+        return self._get_converter().convert(time_str)
+
+    def _convert_datetimes(self, time_strs):
+        return self._get_converter().convert_many(time_strs)
+
+    def _get_converter(self):
+        timezone = self._get_timezone()
+        if self._converter is None or self._converter.timezone is not timezone:
+            self._converter = get_converter(timezone)
+        return self._converter
 
 class CryptsyPublic(CryptsyBase):
 
-    def __init__(self):
+    def __init__(self, pool=None, scheduler=None):
         super(CryptsyPublic, self).__init__()
-        self.api = SingleEndpointAPI('http://pubapi.cryptsy.com/api.php')
+        self.api = SingleEndpointAPI('http://pubapi.cryptsy.com/api.php',
+                                     pool=pool, scheduler=scheduler)
 
     def get_market_data(self, market_id=None):
         '''
-        General Market Data
+        General Market Data, as {label: market}. Markets are dict-like views
+        whose lasttradetime and recenttrades times are converted to UTC
+        datetimes when first read.
         '''
         params = {}
         if market_id:
@@ -61,13 +76,40 @@ class CryptsyPublic(CryptsyBase):
 
         market_data = {}
         for key, market in self.api.perform_request(method, params)['markets'].iteritems():
-            if market['lasttradetime'] != '0000-00-00 00:00:00':
-                market['lasttradetime'] = self._convert_datetime(market['lasttradetime'])
-                for trade in market['recenttrades']:
-                    trade['time'] = self._convert_datetime(trade['time'])
-                market_data[key] = market
+            view = self._market_view(market)
+            if view is not None:
+                market_data[key] = view
         return market_data
 
+    def _market_view(self, market):
+        '''
+        Returns a LazyRecord of a market whose timestamps are converted on
+        first access, or None for markets that never traded
+        '''
+        if market['lasttradetime'] == '0000-00-00 00:00:00':
+            return None
+        convert = self._get_converter().convert
+        trade_fields = {'time': convert}
+        return LazyRecord(market, {
+            'lasttradetime': convert,
+            'recenttrades': lambda trades: [LazyRecord(t, trade_fields)
+                                            for t in trades],
+        })
+
+    def iter_market_data(self, market_id=None):
+        '''
+        Yields (label, market) like get_market_data() returns them, one
+        market at a time as the response is read
+        '''
+        if market_id:
+            method, params = 'singlemarketdata', {'marketid': market_id}
+        else:
+            method, params = 'marketdatav2', {}
+        for key, market in self.api.stream_request(method, params, ('markets',)):
+            view = self._market_view(market)
+            if view is not None:
+                yield key, view
+
     def get_last_trade_prices(self):
         """
         Returns a dictionary of the form a: b, where a is
@@ -77,7 +119,7 @@ class CryptsyPublic(CryptsyBase):
         trade_prices = {}
         for market_str, market in market_data.iteritems():
             market_tuple = tuple(market_str.split('/'))
-            trade_prices[market_tuple] = Decimal(market['lasttradeprice'])
+            trade_prices[market_tuple] = common.number(market['lasttradeprice'])
         return trade_prices
 
     def get_order_data(self, market_id=None):
@@ -92,57 +134,67 @@ class CryptsyPublic(CryptsyBase):
             method = 'orderdata'
         return self.api.perform_request(method, params)
 
+    def iter_order_data(self, market_id=None):
+        '''
+        Yields (label, order data) of get_order_data() one market at a time
+        as the response is read
+        '''
+        if market_id:
+            method, params = 'singleorderdata', {'marketid': market_id}
+        else:
+            method, params = 'orderdata', {}
+        return self.api.stream_request(method, params)
+
     def get_markets(self):
         return [tuple(m.split('/')) for m in self.get_market_data().keys()]
 
 
 class Cryptsy(CryptsyBase, Exchange):
 
-    def __init__(self, key, secret):
-        super(Cryptsy, self).__init__()
-        self.market_currency_map = None
-        self.api = SingleEndpointAPI('https://api.cryptsy.com/api', key, secret)
-
-    def _convert_datetime(self, time_str):
+    def __init__(self, key, secret, pool=None, nonce=None, registry=None,
+                 scheduler=None):
         """
-        Convert cryptsy timestamp to timezone-aware datetime object in UTC
+        registry is an optional cryptex.exchange.market_registry.MarketRegistry,
+        e.g. one persisted to disk and shared by several clients. scheduler is
+        an optional cryptex.exchange.scheduler.RequestScheduler that paces and
+        prioritizes the requests.
         """
-        naive_time = datetime.datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-        cryptsy_time = self._get_timezone()
-        aware_time = cryptsy_time.normalize(cryptsy_time.localize(naive_time)).astimezone(pytz.utc)
-        return aware_time
-
-    def _get_market_currency_map(self):
-        if self.market_currency_map is None:
-            markets = self.api.perform_request('getmarkets')
-            self.market_currency_map = {
-                m['marketid']:
-                (m['primary_currency_code'], m['secondary_currency_code'])
-                for m in markets
-            }
-        return self.market_currency_map
+        super(Cryptsy, self).__init__()
+        self.api = SingleEndpointAPI('https://api.cryptsy.com/api', key, secret,
+                                     pool, nonce, scheduler)
+        self.registry = registry or MarketRegistry(self._load_markets)
+
+    def _load_markets(self):
+        return [
+            MarketInfo(m['marketid'], m['primary_currency_code'],
+                       m['secondary_currency_code'])
+            for m in self.api.perform_request('getmarkets')
+        ]
 
     def _get_currencies(self, market_id):
         """
         Cryptsy uses references to market_ids which uniquely identify markets.
         Given a market_id, this function returns a two-tuple containing the currencies involved.
         """
-        market_id = self._get_market_id(market_id)
-        return self._get_market_currency_map()[market_id]
+        market = self.registry.get_by_id(self._get_market_id(market_id))
+        return market.market
 
     def _get_market_id(self, pair):
-        if pair in self._get_market_currency_map():
+        if self.registry.is_market_id(pair):
             # looks like this already is a market_id
             return pair
-        market = filter(lambda m: m[1] == pair, self._get_market_currency_map().iteritems())
-        if not market:
+        market = self.registry.get(pair)
+        if market is None:
             raise CryptsyException('Market not found')
-        return market[0][0]
+        return market.market_id
+
+    def get_markets(self):
+        return self.registry.markets()
 
     def _get_info(self):
         return self.api.perform_request('getinfo')
 
-    def _format_trade(self, trade):
+    def _trade_row(self, trade):
         if trade['tradetype'] == 'Buy':
             trade_type = Buy
         else:
@@ -150,18 +202,18 @@ class Cryptsy(CryptsyBase, Exchange):
 
         base, counter = self._get_currencies(trade['marketid'])
 
-        return trade_type(
-            trade_id = trade['tradeid'],
-            base_currency = base,
-            counter_currency = counter,
-            datetime = self._convert_datetime(trade['datetime']),
-            order_id = trade['order_id'],
-            amount = Decimal(trade['quantity']),
-            price = Decimal(trade['tradeprice']),
-            fee = Decimal(trade['fee']),
-            # Cryptsy's fee is always taken from counter_currency
-            fee_currency = counter,
-        )
+        return (trade_type, trade['tradeid'], base, counter,
+                self._convert_datetime(trade['datetime']), trade['order_id'],
+                common.number(trade['quantity']),
+                common.number(trade['tradeprice']), common.number(trade['fee']),
+                # Cryptsy's fee is always taken from counter_currency
+                counter)
+
+    def _format_trade(self, trade):
+        return build_trades([self._trade_row(trade)])[0]
+
+    def _format_trades(self, trades):
+        return build_trades([self._trade_row(t) for t in trades])
 
     def get_my_trades(self, limit=200, market=None):
         params = {'limit': limit}
@@ -173,9 +225,19 @@ class Cryptsy(CryptsyBase, Exchange):
             for index, trade in enumerate(trades):
                 trade['marketid'] = params['marketid']
                 trades[index] = trade
-        return [self._format_trade(t) for t in trades]
+        return self._trades_observed(self._format_trades(trades))
 
-    def _format_order(self, order):
+    def get_my_new_trades(self, last_trade=None):
+        params = {}
+        if last_trade is not None:
+            # startdate is a server-local date, so step back a day to cover
+            # the timezone offset; already known trades are dropped by caller
+            start = last_trade.datetime - datetime.timedelta(days=1)
+            params['startdate'] = start.strftime('%Y-%m-%d')
+        trades = self.api.perform_request('allmytrades', params)
+        return self._trades_observed(self._format_trades(trades))
+
+    def _order_row(self, order):
         if order['ordertype'] == 'Buy':
             order_type = BuyOrder
         else:
@@ -183,14 +245,12 @@ class Cryptsy(CryptsyBase, Exchange):
 
         base, counter = self._get_currencies(order['marketid'])
 
-        return order_type(
-            order_id = order['orderid'],
-            base_currency = base,
-            counter_currency = counter,
-            datetime = self._convert_datetime(order['created']),
-            amount = Decimal(order['quantity']),
-            price = Decimal(order['price'])
-        )
+        return (order_type, order['orderid'], base, counter,
+                self._convert_datetime(order['created']),
+                common.number(order['quantity']), common.number(order['price']))
+
+    def _format_order(self, order):
+        return build_orders([self._order_row(order)])[0]
 
     def get_my_open_orders(self, market=None):
         if market:
@@ -202,46 +262,70 @@ class Cryptsy(CryptsyBase, Exchange):
                 orders[index] = order
         else:
             orders = self.api.perform_request('allmyorders')
-        return [self._format_order(o) for o in orders]
+        return build_orders([self._order_row(o) for o in orders])
 
     def get_market_orders(self, market):
         market_id = self._get_market_id(market)
         return self.api.perform_request('marketorders', {'marketid': market_id})
 
+    def get_order_book(self, market):
+        '''
+        Market orders as a cryptex.orderbook.OrderBook
+        '''
+        return OrderBook.from_cryptsy(market, self.get_market_orders(market))
+
     def get_market_trades(self, market):
         market_id = self._get_market_id(market)
         trades = self.api.perform_request('markettrades', {'marketid': market_id})
-        for index, trade in enumerate(trades):
-            trade['datetime'] = self._convert_datetime(trade['datetime'])
-            trades[index] = trade
+        times = self._convert_datetimes([t['datetime'] for t in trades])
+        for trade, time in zip(trades, times):
+            trade['datetime'] = time
         return trades
 
     def cancel_order(self, order_id):
         self.api.perform_request('cancelorder', {'orderid': order_id})
+        self._order_cancelled(order_id)
         return None
 
+    def cancel_all(self, market=None, concurrency=4):
+        """
+        Cancels all open orders, or those of one market, in a single request.
+        Returns a BatchResult per cancelled order holding Cryptsy's message.
+        concurrency is accepted like Exchange.cancel_all, but unused.
+        """
+        if market is None:
+            messages = self.api.perform_request('cancelallorders')
+        else:
+            messages = self.api.perform_request(
+                'cancelmarketorders', {'marketid': self._get_market_id(market)})
+        # The messages do not name the orders reliably
+        self._order_cancelled(None)
+        return [BatchResult(m) for m in messages or ()]
+
 
     def _create_order(self, market_id, order_type, quantity, price):
         params = {
             'marketid': market_id,
             'ordertype': order_type,
-            'quantity': quantity,
-            'price': price
+            'quantity': common.format_number(common.number(quantity)),
+            'price': common.format_number(common.number(price))
         }
         return self.api.perform_request('createorder', params)
 
     def buy(self, market, quantity, price):
         market_id = self._get_market_id(market)
         response = self._create_order(market_id, 'Buy', quantity, price)
-        return response['orderid']
+        return self._order_placed(BuyOrder, self._get_currencies(market_id),
+                                  quantity, price, response['orderid'])
 
     def sell(self, market, quantity, price):
         market_id = self._get_market_id(market)
         response = self._create_order(market_id, 'Sell', quantity, price)
-        return response['orderid']
+        return self._order_placed(SellOrder, self._get_currencies(market_id),
+                                  quantity, price, response['orderid'])
 
     def get_my_transactions(self, limit=None):
-        transactions = []
+        rows = []
         for t in self.api.perform_request('mytransactions'):
             tx_type = None
             if t['type'] == 'Withdrawal':
@@ -249,15 +333,14 @@ class Cryptsy(CryptsyBase, Exchange):
             elif t['type'] == 'Deposit':
                 tx_type = Deposit
             if tx_type:
-                transactions.append(tx_type(t['trxid'],
-                                            self._convert_datetime(t['datetime']),
-                                            t['currency'],
-                                            Decimal(t['amount']),
-                                            t['address'],
-                                            Decimal(t['fee']),
-                                    ))
-        return transactions
+                rows.append((tx_type, t['trxid'],
+                             self._convert_datetime(t['datetime']),
+                             t['currency'],
+                             common.number(t['amount']),
+                             t['address'],
+                             common.number(t['fee'])))
+        return self._transactions_observed(build_transactions(rows))
 
     def get_my_balances(self):
         balances = self._get_info()['balances_available']
-        return {k: Decimal(v) for (k,v) in balances.iteritems()}
+        return {k: common.number(v) for (k,v) in balances.iteritems()}
@@ -1,5 +1,191 @@
+import datetime
+import logging
+from multiprocessing.pool import ThreadPool
+import threading
+import time
+
+import pytz
+
+import cryptex.common as common
+from cryptex.order import BuyOrder, SellOrder, build_orders
+
+log = logging.getLogger(__name__)
+
+
+class BatchResult(object):
+    """
+    Outcome of one item of a batch call: value on success, error otherwise.
+    """
+    __slots__ = ('value', 'error')
+
+    def __init__(self, value=None, error=None):
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def get(self):
+        """
+        Returns the value or raises the error
+        """
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def __repr__(self):
+        if self.error is not None:
+            return 'BatchResult(error=%r)' % (self.error,)
+        return 'BatchResult(%r)' % (self.value,)
+
+
+def run_batch(func, items, concurrency=4):
+    """
+    Calls func on every item with up to concurrency calls in flight and
+    returns a BatchResult per item, in input order.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            return BatchResult(func(item))
+        except Exception as e:
+            return BatchResult(error=e)
+
+    if concurrency <= 1 or len(items) == 1:
+        return [call(item) for item in items]
+    # A pool of its own: batches also run from tasks of the shared executor
+    # of cryptex.exchange.async_exchange, which must not wait on itself
+    pool = ThreadPool(min(concurrency, len(items)))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class ExchangeListener(object):
+    """
+    Receives the account events an Exchange observes, see
+    Exchange.add_listener. balances, if not None, are the available balances
+    the exchange reported along with the event.
+    """
+    def order_placed(self, exchange, order, balances=None):
+        """
+        order is a cryptex.order.BuyOrder or SellOrder as placed. Its
+        order_id is falsy if the exchange filled it completely right away.
+        """
+        pass
+
+    def order_cancelled(self, exchange, order_id, balances=None):
+        """
+        order_id is None if the exchange cancelled several orders without
+        naming them, e.g. Cryptsy.cancel_all.
+        """
+        pass
+
+    def trades_observed(self, exchange, trades):
+        """
+        Trades of the account as returned by get_my_trades and
+        get_my_new_trades, including ones that were observed before
+        """
+        pass
+
+    def transactions_observed(self, exchange, transactions):
+        pass
+
+
+class ReconcilingListener(ExchangeListener):
+    """
+    Base of listeners that keep account state of an Exchange in memory and
+    fetch it again from the exchange every max_age seconds, or on the next
+    read once it is dirty. Subclasses hold self._lock while they touch
+    their state and call _reconciled() after each fetch.
+    """
+    def __init__(self, exchange, max_age, clock=time.time):
+        self.exchange = exchange
+        self.max_age = max_age
+        self.clock = clock
+        self.fetched_at = None
+        self.dirty = False
+        self.reconciliations = 0
+        self._lock = threading.Lock()
+        exchange.add_listener(self)
+
+    def _stale(self):
+        return (self.fetched_at is None or self.dirty or
+                self.clock() - self.fetched_at >= self.max_age)
+
+    def _reconciled(self, fetched_at):
+        self.fetched_at = fetched_at
+        self.dirty = False
+        self.reconciliations += 1
+
+    def _stats(self):
+        return {}
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'reconciliations': self.reconciliations,
+                'age': None if self.fetched_at is None
+                       else self.clock() - self.fetched_at,
+                'dirty': self.dirty,
+            }
+            stats.update(self._stats())
+            return stats
+
+
 class Exchange(object):
 
+    listeners = ()
+
+    def add_listener(self, listener):
+        """
+        Registers an ExchangeListener for the orders this client places and
+        cancels and the trades and transactions it fetches.
+        """
+        self.listeners = list(self.listeners) + [listener]
+
+    def remove_listener(self, listener):
+        self.listeners = [l for l in self.listeners if l is not listener]
+
+    def _notify(self, event, *args):
+        # The request has gone through by now, a failing listener must not
+        # hide its result from the caller
+        for listener in self.listeners:
+            try:
+                getattr(listener, event)(self, *args)
+            except Exception:
+                log.exception('Listener %r failed on %s', listener, event)
+
+    def _order_placed(self, cls, market, quantity, price, order_id,
+                      balances=None):
+        if self.listeners:
+            order = build_orders([(cls, order_id, market[0], market[1],
+                                   datetime.datetime.now(pytz.utc),
+                                   common.number(quantity),
+                                   common.number(price))])[0]
+            self._notify('order_placed', order, balances)
+        return order_id
+
+    def _order_cancelled(self, order_id, balances=None):
+        if self.listeners:
+            self._notify('order_cancelled', order_id, balances)
+
+    def _trades_observed(self, trades):
+        if self.listeners and trades:
+            self._notify('trades_observed', trades)
+        return trades
+
+    def _transactions_observed(self, transactions):
+        if self.listeners and transactions:
+            self._notify('transactions_observed', transactions)
+        return transactions
+
     def get_my_open_orders(self):
         """
         Returns a list of exchanges.order.Order that represent currently 
@@ -27,9 +213,62 @@ class Exchange(object):
     def sell(self, market, quantity, price):
         raise NotImplementedError
 
+    def _submit_order(self, order):
+        market = (order.base_currency, order.counter_currency)
+        if isinstance(order, BuyOrder):
+            return self.buy(market, order.amount, order.price)
+        if isinstance(order, SellOrder):
+            return self.sell(market, order.amount, order.price)
+        raise ValueError('Order must be a BuyOrder or SellOrder')
+
+    def submit_orders(self, orders, concurrency=4):
+        """
+        Places a list of cryptex.order.BuyOrder and SellOrder (their order_id
+        and datetime are ignored) with up to concurrency requests in flight.
+        Returns a BatchResult per order, in input order, holding the new
+        order_id or the error.
+
+        Nonces are drawn in order but concurrent requests may still reach
+        the exchange out of order; the API retries those with a fresh nonce.
+        """
+        return run_batch(self._submit_order, orders, concurrency)
+
+    def cancel_orders(self, order_ids, concurrency=4):
+        """
+        Cancels the given orders concurrently and returns a BatchResult per
+        order_id, in input order.
+        """
+        return run_batch(self.cancel_order, order_ids, concurrency)
+
+    def cancel_all(self, market=None, concurrency=4):
+        """
+        Cancels all open orders, or those of one market. Returns a
+        BatchResult per cancelled order.
+        """
+        orders = self.get_my_open_orders()
+        if market is not None:
+            orders = [o for o in orders
+                      if (o.base_currency, o.counter_currency) == tuple(market)]
+        return self.cancel_orders([o.order_id for o in orders], concurrency)
+
     def get_my_transactions(self, limit=None):
         raise NotImplementedError
 
+    def get_my_new_trades(self, last_trade=None):
+        """
+        Returns the user's trades newer than last_trade, a trade previously
+        returned by this exchange. Exchanges that cannot filter on the server
+        may also return older trades; callers drop the ones they know.
+        """
+        return self.get_my_trades()
+
+    def get_my_new_transactions(self, last_transaction=None):
+        """
+        Returns the user's transactions newer than last_transaction, with the
+        same caveat as get_my_new_trades.
+        """
+        return self.get_my_transactions()
+
     def get_my_balances(self):
         """
         Returns a dict that represent all the user's funds (not on orders) as {'CURRENCY': Decimal(<Value>), ...}.
@@ -0,0 +1,154 @@
+'''
+Incremental decoding of large JSON responses.
+
+iter_members() scans a document chunk by chunk and decodes the members of
+one nested object or array as soon as each is complete, so only the member
+being read is held in memory, not the whole document or its decoded form.
+'''
+import json
+import re
+from decimal import Decimal
+
+_TOKEN = re.compile(r'[{}\[\]",:]')
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+# Within a member being captured only brackets and, outside nested values,
+# the end of the member matter: these skip whole strings and everything else
+# up to the next one
+_INNER = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.S)
+_OUTER = re.compile(r'(?:[^"{}\[\],]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.S)
+
+
+class _Frame(object):
+    __slots__ = ('is_object', 'key', 'matched', 'index')
+
+    def __init__(self, is_object, matched):
+        self.is_object = is_object
+        self.key = None
+        self.matched = matched
+        # Position of the next member of an array
+        self.index = 0
+
+
+def iter_members(chunks, path=(), parse_float=Decimal, header=None):
+    '''
+    Yields (key, value) for each member of the object at path in the JSON
+    document made up of chunks, or (index, value) if it is an array. path is
+    a sequence of object keys from the root.
+
+    If header is a dict, the other members of the root object (e.g. success
+    and error) are decoded into it as they complete.
+    '''
+    path = tuple(path)
+    depth = len(path)
+    loads = lambda text: json.loads(text, parse_float=parse_float)
+
+    buf = ''
+    pos = 0
+    stack = []
+    # (kind, key, start, depth of the frame the member belongs to)
+    capture = None
+    # Brackets open within the captured member
+    inner = 0
+
+    def member_start(frame, start):
+        '''
+        Capture for the member of the top frame that starts at start
+        '''
+        level = len(stack) - 1
+        if frame.matched and level == depth:
+            return ('member', frame.key, start, level)
+        if header is not None and level == 0 and depth and frame.key != path[0]:
+            return ('header', frame.key, start, level)
+        return None
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buf += chunk
+        while True:
+            if capture is not None:
+                # Skip to the end of the member, json.loads decodes it
+                i = (_INNER if inner else _OUTER).match(buf, pos).end()
+                c = buf[i:i + 1]
+                if not c or c == '"':
+                    # Member or a string in it continues in the next chunk
+                    pos = i
+                    break
+                pos = i + 1
+                if c in '{[':
+                    inner += 1
+                    continue
+                if inner:
+                    inner -= 1
+                    continue
+                # , } or ] after the member, handled below
+            else:
+                m = _TOKEN.search(buf, pos)
+                if m is None:
+                    # Rest is whitespace or part of a number or literal
+                    break
+                c = m.group()
+                i = m.start()
+            frame = stack[-1] if stack else None
+
+            if c == '"':
+                s = _STRING.match(buf, i)
+                if s is None:
+                    # String continues in the next chunk
+                    pos = i
+                    break
+                if frame is not None and frame.is_object and frame.key is None:
+                    frame.key = json.loads(s.group())
+                pos = s.end()
+                continue
+
+            pos = i + 1
+            if c == ':':
+                if capture is None:
+                    capture = member_start(frame, pos)
+            elif c in '{[':
+                if frame is None:
+                    matched = True
+                elif frame.is_object:
+                    matched = (frame.matched and len(stack) - 1 < depth and
+                               frame.key == path[len(stack) - 1])
+                else:
+                    matched = False
+                new = _Frame(c == '{', matched)
+                stack.append(new)
+                if c == '[' and capture is None:
+                    new.key = 0
+                    capture = member_start(new, pos)
+            else:
+                # , } or ]
+                if capture is not None and capture[3] == len(stack) - 1:
+                    kind, key, start, _ = capture
+                    capture = None
+                    text = buf[start:i]
+                    if text.strip():
+                        value = loads(text)
+                        if kind == 'member':
+                            yield key, value
+                        else:
+                            header[key] = value
+                if c == ',':
+                    if frame.is_object:
+                        frame.key = None
+                    else:
+                        frame.index += 1
+                        frame.key = frame.index
+                        if capture is None:
+                            capture = member_start(frame, pos)
+                else:
+                    stack.pop()
+
+        # Drop what has been read, keeping a member being captured
+        keep = capture[2] if capture is not None else pos
+        if keep:
+            buf = buf[keep:]
+            pos -= keep
+            if capture is not None:
+                capture = capture[:2] + (0,) + capture[3:]
+
+    if stack:
+        raise ValueError('Truncated JSON document')
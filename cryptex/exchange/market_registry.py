@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import threading
+from decimal import Decimal
+
+
+class MarketInfo(object):
+    '''
+    Static metadata of a market
+    '''
+    def __init__(self, market_id, base_currency, counter_currency,
+                 decimal_places=8, min_amount=None, fee=None):
+        '''
+        :param market_id: reference id of the market on the exchange
+        :param base_currency: the base currency (LTC in "LTC/BTC")
+        :param counter_currency: the counter currency (BTC in "LTC/BTC")
+        :param decimal_places: number of decimal places accepted in prices
+        :param min_amount: minimum order amount, if the exchange has one
+        :param fee: trade fee in percent, if the exchange publishes it
+        '''
+        self.market_id = market_id
+        self.base_currency = base_currency
+        self.counter_currency = counter_currency
+        self.decimal_places = decimal_places
+        self.min_amount = min_amount
+        self.fee = fee
+
+    @property
+    def market(self):
+        return (self.base_currency, self.counter_currency)
+
+    def to_json(self):
+        return {
+            'market_id': self.market_id,
+            'base_currency': self.base_currency,
+            'counter_currency': self.counter_currency,
+            'decimal_places': self.decimal_places,
+            'min_amount': None if self.min_amount is None else str(self.min_amount),
+            'fee': None if self.fee is None else str(self.fee),
+        }
+
+    @classmethod
+    def from_json(cls, j):
+        return cls(j['market_id'], j['base_currency'], j['counter_currency'],
+                   j['decimal_places'],
+                   None if j['min_amount'] is None else Decimal(j['min_amount']),
+                   None if j['fee'] is None else Decimal(j['fee']))
+
+
+class MarketRegistry(object):
+    """
+    Market metadata of one exchange, indexed by market id and by
+    (base_currency, counter_currency) tuple.
+
+    loader is a callable returning a list of MarketInfo. If path is given the
+    markets are saved there and loaded on the next start; an expired file is
+    still used while a background thread refreshes it, so only the very
+    first start of a process blocks on the exchange.
+    """
+    VERSION = 1
+
+    def __init__(self, loader, path=None, max_age=3600, miss_refresh=60,
+                 clock=time.time):
+        self.loader = loader
+        self.path = path
+        self.max_age = max_age
+        self.miss_refresh = miss_refresh
+        self.clock = clock
+
+        self._by_id = None
+        self._by_market = None
+        self._fetched_at = 0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _index(self, markets, fetched_at):
+        by_id = {}
+        by_market = {}
+        for m in markets:
+            by_id[m.market_id] = m
+            by_market[m.market] = m
+        # Swap whole indexes so readers never need the lock
+        self._by_id, self._by_market = by_id, by_market
+        self._fetched_at = fetched_at
+
+    def _ensure_loaded(self):
+        if self._by_id is None:
+            with self._lock:
+                if self._by_id is None and not self.load():
+                    self._refresh()
+        if self.clock() - self._fetched_at > self.max_age:
+            self.refresh_async()
+
+    def _refresh(self):
+        markets = self.loader()
+        self._index(markets, self.clock())
+        if self.path is not None:
+            self.save()
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception:
+                pass
+            finally:
+                self._refreshing = False
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def start(self, interval=None):
+        """
+        Refreshes the registry every interval seconds (max_age by default)
+        on a background thread.
+        """
+        interval = interval or self.max_age
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception:
+                    pass
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def load(self):
+        """
+        Loads markets from path. Returns False if there is no usable file.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            try:
+                j = json.load(f)
+            except ValueError:
+                return False
+        if j.get('version') != MarketRegistry.VERSION:
+            return False
+        self._index([MarketInfo.from_json(m) for m in j['markets']],
+                    j['fetched_at'])
+        return True
+
+    def save(self):
+        j = {
+            'version': MarketRegistry.VERSION,
+            'fetched_at': self._fetched_at,
+            'expires_at': self._fetched_at + self.max_age,
+            'markets': [m.to_json() for m in self._by_id.itervalues()],
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(j, f)
+        os.rename(tmp_path, self.path)
+
+    def _lookup(self, index_name, key):
+        self._ensure_loaded()
+        info = getattr(self, index_name).get(key)
+        if info is None and self.clock() - self._fetched_at > self.miss_refresh:
+            # Possibly a newly listed market
+            self.refresh()
+            info = getattr(self, index_name).get(key)
+        return info
+
+    def get(self, market):
+        """
+        Returns the MarketInfo of a (base, counter) tuple, or None.
+        """
+        return self._lookup('_by_market', tuple(market))
+
+    def get_by_id(self, market_id):
+        """
+        Returns the MarketInfo of a market id, or None.
+        """
+        return self._lookup('_by_id', market_id)
+
+    def is_market_id(self, market_id):
+        self._ensure_loaded()
+        return market_id in self._by_id
+
+    def markets(self):
+        self._ensure_loaded()
+        return self._by_market.keys()
@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+class NonceAllocator(object):
+    """
+    Issues strictly increasing nonces for one API key within a process.
+
+    Nonces start at the current unix time so that they stay above the ones
+    earlier versions of this library sent, and from then on grow by one per
+    call, so any number of nonces can be drawn per second.
+    """
+    def __init__(self, start=0):
+        self.last = start
+        self._lock = threading.Lock()
+
+    def _next(self, last):
+        return max(last + 1, int(time.time()))
+
+    def next(self):
+        with self._lock:
+            self.last = self._next(self.last)
+            return self.last
+
+
+class FileNonceAllocator(NonceAllocator):
+    """
+    Nonce allocator whose high-water mark lives in a file, so that several
+    processes using the same key never hand out the same nonce and a
+    restarted process continues above the last nonce it used.
+
+    Each call takes an exclusive flock on the file, reads the last nonce,
+    and writes back the new one. Pass fsync=True to also survive an
+    operating system crash, at the cost of a disk flush per nonce.
+    """
+    def __init__(self, path, fsync=False):
+        if fcntl is None:
+            raise RuntimeError('FileNonceAllocator requires fcntl')
+        super(FileNonceAllocator, self).__init__()
+        self.path = path
+        self.fsync = fsync
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0600)
+
+    def next(self):
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                stored = os.read(self._fd, 32).strip()
+                self.last = self._next(max(self.last, int(stored or 0)))
+                data = '%020d\n' % self.last
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, data)
+                if self.fsync:
+                    os.fsync(self._fd)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            return self.last
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+def _nonce_path(key, directory):
+    # Named after a digest, the key itself stays out of the file system
+    return os.path.join(directory, hashlib.sha256(key).hexdigest()[:32])
+
+def get_nonce_allocator(key, directory=None):
+    """
+    Returns the allocator shared by all clients using key. By default an
+    in-process NonceAllocator. Given a directory, a FileNonceAllocator
+    keeping the key's high-water mark there, so nonces keep increasing
+    across restarts and processes; where no file can be used, e.g. without
+    fcntl, an in-process NonceAllocator again.
+    """
+    if directory is not None:
+        directory = os.path.abspath(directory)
+    with _allocators_lock:
+        allocator = _allocators.get((key, directory))
+        if allocator is None:
+            allocator = _allocators[(key, directory)] = _open_allocator(
+                key, directory)
+        return allocator
+
+def _open_allocator(key, directory):
+    if directory is None:
+        return NonceAllocator()
+    if fcntl is None:
+        log.warning('Nonces of a key are not persisted, fcntl is missing')
+        return NonceAllocator()
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0700)
+        return FileNonceAllocator(_nonce_path(key, directory))
+    except (IOError, OSError):
+        log.warning('Nonces of a key are not persisted, %s is not writable',
+                    directory)
+        return NonceAllocator()
@@ -0,0 +1,186 @@
+import time
+
+from cryptex.exchange.exchange import ReconcilingListener
+from cryptex.order import build_orders
+
+
+def _copy(order, amount):
+    return build_orders([(order.__class__, order.order_id, order.base_currency,
+                          order.counter_currency, order.datetime, amount,
+                          order.price)])[0]
+
+
+class OrderDiff(object):
+    '''
+    Changes of the open orders since the last reconciliation: new orders
+    placed elsewhere, orders that were filled or cancelled, and
+    partially_filled as (order, amount filled) of the orders still open.
+    '''
+    __slots__ = ('new', 'filled', 'partially_filled', 'cancelled')
+
+    def __init__(self, new=(), filled=(), partially_filled=(), cancelled=()):
+        self.new = list(new)
+        self.filled = list(filled)
+        self.partially_filled = list(partially_filled)
+        self.cancelled = list(cancelled)
+
+    def __nonzero__(self):
+        return bool(self.new or self.filled or self.partially_filled or
+                    self.cancelled)
+
+    def __repr__(self):
+        return 'OrderDiff(new=%d, filled=%d, partially_filled=%d, cancelled=%d)' % (
+            len(self.new), len(self.filled), len(self.partially_filled),
+            len(self.cancelled))
+
+
+class OrderTracker(ReconcilingListener):
+    '''
+    Open orders of an account, kept in memory from the orders its Exchange
+    client places and cancels, so get_my_open_orders of the exchange only
+    has to be polled every max_age seconds to catch what happened elsewhere.
+    Fills in the trades the client fetches are booked against the orders as
+    they come.
+
+    reconcile() returns an OrderDiff of the exchange's open orders against
+    the local ones. An order that is gone counts as filled if its fills have
+    been seen; otherwise get_my_new_trades is asked once for the trades
+    after the last one seen, unless fetch_trades is False, and the order
+    counts as cancelled if they do not fill it either. Until the client has
+    fetched some trade that would be the whole trade history, so it is not
+    asked then.
+    '''
+    def __init__(self, exchange, max_age=60, fetch_trades=True,
+                 clock=time.time):
+        self.fetch_trades = fetch_trades
+        self.last_diff = OrderDiff()
+        # {order_id: order with the amount still open}
+        self._orders = {}
+        # {order_id: amount filled} of the tracked orders
+        self._filled = {}
+        self._seen = set()
+        self._last_trade = None
+        # Orders placed and cancelled while a reconciliation is in flight
+        self._placed = None
+        self._cancelled = None
+        super(OrderTracker, self).__init__(exchange, max_age, clock)
+
+    def get_my_open_orders(self):
+        '''
+        Returns the open orders like Exchange.get_my_open_orders,
+        reconciling first if they are due
+        '''
+        with self._lock:
+            if not self._stale():
+                return self._open_orders()
+        self.reconcile()
+        with self._lock:
+            return self._open_orders()
+
+    def _open_orders(self):
+        filled = self._filled
+        orders = []
+        for order in self._orders.itervalues():
+            remaining = order.amount - filled.get(order.order_id, 0)
+            if remaining > 0:
+                orders.append(_copy(order, remaining))
+        return orders
+
+    def reconcile(self):
+        '''
+        Fetches the open orders of the exchange, brings the local ones in
+        line and returns the OrderDiff
+        '''
+        with self._lock:
+            self._placed = set()
+            self._cancelled = set()
+            started = self.clock()
+        try:
+            server = self.exchange.get_my_open_orders()
+            with self._lock:
+                gone = [i for i in self._orders
+                        if i not in self._placed and
+                        self._filled.get(i, 0) < self._orders[i].amount]
+                last_trade = self._last_trade
+            if gone and self.fetch_trades and last_trade is not None:
+                server_ids = set(o.order_id for o in server)
+                if any(i not in server_ids for i in gone):
+                    # Books the fills through trades_observed
+                    self.exchange.get_my_new_trades(last_trade)
+            with self._lock:
+                diff = self._apply(server)
+                self._reconciled(started)
+                self.last_diff = diff
+                return diff
+        finally:
+            with self._lock:
+                self._placed = self._cancelled = None
+
+    def _apply(self, server):
+        diff = OrderDiff()
+        orders, filled = self._orders, self._filled
+        server = dict((o.order_id, o) for o in server)
+        for order_id, order in orders.items():
+            if order_id in server or order_id in self._placed:
+                continue
+            del orders[order_id]
+            if filled.pop(order_id, 0) >= order.amount:
+                diff.filled.append(order)
+            else:
+                diff.cancelled.append(order)
+        for order_id, order in server.iteritems():
+            if order_id in self._cancelled:
+                continue
+            local = orders.get(order_id)
+            if local is None:
+                diff.new.append(order)
+                orders[order_id] = order
+                continue
+            # Fills seen but not yet reflected by the exchange stay booked
+            remaining = min(order.amount, local.amount - filled.pop(order_id, 0))
+            if remaining < local.amount:
+                diff.partially_filled.append((order, local.amount - remaining))
+            orders[order_id] = _copy(order, remaining)
+        return diff
+
+    # ExchangeListener
+
+    def order_placed(self, exchange, order, balances=None):
+        if not order.order_id:
+            # Filled completely right away
+            return
+        with self._lock:
+            self._orders[order.order_id] = order
+            if self._placed is not None:
+                self._placed.add(order.order_id)
+
+    def order_cancelled(self, exchange, order_id, balances=None):
+        with self._lock:
+            if order_id is None:
+                self.dirty = True
+                return
+            self._orders.pop(order_id, None)
+            self._filled.pop(order_id, None)
+            if self._cancelled is not None:
+                self._cancelled.add(order_id)
+
+    def trades_observed(self, exchange, trades):
+        with self._lock:
+            for trade in trades:
+                if trade.trade_id in self._seen:
+                    continue
+                self._seen.add(trade.trade_id)
+                last = self._last_trade
+                if last is None or trade.datetime >= last.datetime:
+                    self._last_trade = trade
+                if trade.order_id in self._orders:
+                    self._filled[trade.order_id] = (
+                        self._filled.get(trade.order_id, 0) + trade.amount)
+
+    def _stats(self):
+        diff = self.last_diff
+        return {
+            'open_orders': len(self._orders),
+            'last_diff': (len(diff.new), len(diff.filled),
+                          len(diff.partially_filled), len(diff.cancelled)),
+        }
@@ -0,0 +1,180 @@
+import heapq
+import itertools
+import threading
+import time
+
+# Priority classes, lower runs first
+ORDER = 0
+ACCOUNT = 1
+HISTORY = 2
+
+PRIORITIES = {
+    # Cryptsy
+    'createorder': ORDER,
+    'cancelorder': ORDER,
+    'cancelmarketorders': ORDER,
+    'cancelallorders': ORDER,
+    'allmytrades': HISTORY,
+    'mytrades': HISTORY,
+    'mytransactions': HISTORY,
+    # BTC-e
+    'Trade': ORDER,
+    'CancelOrder': ORDER,
+    'TradeHistory': HISTORY,
+    'TransHistory': HISTORY,
+}
+
+# {endpoint: (requests per second, burst)}, None limits the whole exchange
+DEFAULT_LIMITS = {
+    'btce': {None: (2, 10)},
+    'cryptsy': {None: (2, 10)},
+}
+
+
+class TokenBucket(object):
+    """
+    Allows rate requests per second on average and bursts of up to capacity.
+    Not thread safe by itself; RequestScheduler guards its buckets.
+    """
+    def __init__(self, rate, capacity=None, clock=time.time):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _fill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now=None):
+        '''
+        Seconds until a token is available
+        '''
+        if now is None:
+            now = self.clock()
+        self._fill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class RequestScheduler(object):
+    """
+    Paces the requests of one exchange through token buckets and lets them
+    out by priority.
+
+    limits maps endpoints (API methods) to (requests per second, burst); the
+    None entry applies to every request. Waiting requests are served in
+    priority order (see PRIORITIES) and first come, first served within a
+    class, so an order placed while a history sync is throttled goes out
+    with the next free token. Share one scheduler between all clients that
+    use the same key or address; see get_scheduler.
+    """
+    def __init__(self, limits=None, priorities=None, default_priority=ACCOUNT,
+                 clock=time.time):
+        self.priorities = PRIORITIES if priorities is None else priorities
+        self.default_priority = default_priority
+        self.clock = clock
+        self.buckets = {
+            endpoint: TokenBucket(rate, burst, clock)
+            for endpoint, (rate, burst) in (limits or {}).iteritems()
+        }
+        self._waiting = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {}
+
+    def priority(self, endpoint):
+        return self.priorities.get(endpoint, self.default_priority)
+
+    def _buckets(self, endpoint):
+        return [b for b in (self.buckets.get(None), self.buckets.get(endpoint))
+                if b is not None]
+
+    def acquire(self, endpoint, priority=None):
+        '''
+        Blocks until a request to endpoint may be sent. Returns the seconds
+        waited.
+        '''
+        if priority is None:
+            priority = self.priority(endpoint)
+        ticket = (priority, next(self._counter))
+        buckets = self._buckets(endpoint)
+        start = self.clock()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            # A new head of the queue must re-check the buckets
+            self._cond.notify_all()
+            while True:
+                if self._waiting[0] == ticket:
+                    now = self.clock()
+                    delay = max([b.delay(now) for b in buckets] or [0])
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                else:
+                    self._cond.wait()
+            for b in buckets:
+                b.take()
+            heapq.heappop(self._waiting)
+            self._cond.notify_all()
+
+            waited = self.clock() - start
+            stats = self._stats.setdefault(
+                priority, {'requests': 0, 'wait': 0.0, 'max_wait': 0.0})
+            stats['requests'] += 1
+            stats['wait'] += waited
+            stats['max_wait'] = max(stats['max_wait'], waited)
+            return waited
+
+    def run(self, endpoint, func, *args, **kwargs):
+        '''
+        Waits for the turn of a request to endpoint, then calls func
+        '''
+        self.acquire(endpoint)
+        return func(*args, **kwargs)
+
+    def queue_depth(self):
+        '''
+        Returns {priority: number of waiting requests}
+        '''
+        with self._cond:
+            depth = {}
+            for priority, _ in self._waiting:
+                depth[priority] = depth.get(priority, 0) + 1
+            return depth
+
+    def stats(self):
+        '''
+        Returns {priority: {'requests', 'wait', 'max_wait', 'queued'}}, with
+        wait being the total seconds requests of that class spent queued.
+        '''
+        depth = self.queue_depth()
+        with self._cond:
+            stats = {p: dict(s, queued=0) for p, s in self._stats.iteritems()}
+        for priority, queued in depth.iteritems():
+            stats.setdefault(priority, {'requests': 0, 'wait': 0.0,
+                                        'max_wait': 0.0})['queued'] = queued
+        return stats
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(exchange, limits=None):
+    '''
+    Returns the scheduler shared by all clients of exchange ('btce',
+    'cryptsy', ...), created with limits or DEFAULT_LIMITS on first use.
+    '''
+    with _schedulers_lock:
+        if exchange not in _schedulers:
+            if limits is None:
+                limits = DEFAULT_LIMITS.get(exchange)
+            _schedulers[exchange] = RequestScheduler(limits)
+        return _schedulers[exchange]
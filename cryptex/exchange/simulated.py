@@ -0,0 +1,331 @@
+import datetime
+import heapq
+import itertools
+from decimal import Decimal
+
+import pytz
+
+import cryptex.common as common
+from cryptex.exchange import Exchange
+from cryptex.exception import APIException
+from cryptex.orderbook import OrderBook, BID, ASK
+from cryptex.order import BuyOrder, SellOrder, build_orders
+from cryptex.trade import Buy, Sell, build_trades
+from cryptex.transaction import Deposit, Withdrawal
+import cryptex.ticks as ticks
+
+
+class FeeModel(object):
+    '''
+    Fee as a fraction of the total of a fill, taken from the counter currency
+    like Cryptsy does: buys pay total + fee, sells receive total - fee.
+    Maker fills are those of resting orders, taker fills those of orders
+    that cross the book when placed.
+    '''
+    def __init__(self, maker=Decimal('0.002'), taker=Decimal('0.003')):
+        self.maker = maker
+        self.taker = taker
+        self.max_rate = max(maker, taker)
+
+    def fee(self, amount, price, maker):
+        rate = common.number(self.maker if maker else self.taker)
+        return common.quantize(
+            common.descale(common.descale(amount * price) * rate))
+
+
+# Open order fields, followed by the funds the order still holds
+_CLS, _ID, _BASE, _COUNTER, _TIME, _REMAINING, _PRICE, _HELD = range(8)
+
+
+class _Market(object):
+    '''
+    Resting orders of one market in price-time priority, as heaps of
+    (price key, sequence, order_id) with the best order on top. Cancelled
+    and filled orders are dropped from the heaps lazily.
+    '''
+    def __init__(self, market):
+        self.book = OrderBook(market)
+        self.bids = []
+        self.asks = []
+
+
+class SimulatedExchange(Exchange):
+    '''
+    Exchange that matches the orders of one account against historical
+    market data, for backtests of code written against Exchange.
+
+    Market data comes in through trade(), book_update() / book_snapshot() or
+    feed() with cryptex.ticks.Tick objects; the time of the last event is
+    the exchange's clock. Resting orders fill against market trades at their
+    own price, best price and oldest order first, for at most the traded
+    amount across both sides; trades whose aggressor is known only fill the
+    side they took. New orders that cross the last known book fill against it as
+    taker first; orders that would cross the account's own resting orders
+    are rejected, as with an exchange's self-trade prevention. Orders,
+    trades, balances and transactions are returned as the same objects the
+    live adapters return.
+    '''
+    def __init__(self, balances=None, fees=None, clock=None):
+        self.fees = fees or FeeModel()
+        self.now = clock or datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+        self.balances = {}
+        self.holds = {}
+        self.orders = {}
+        self.markets = {}
+        self._trades = []
+        self._transactions = []
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self._sequence = itertools.count()
+        for currency, amount in (balances or {}).iteritems():
+            self.deposit(currency, amount)
+
+    def _market(self, market):
+        market = tuple(market)
+        m = self.markets.get(market)
+        if m is None:
+            m = self.markets[market] = _Market(market)
+        return m
+
+    def _advance(self, time):
+        if time is not None and time > self.now:
+            self.now = time
+
+    # Account
+
+    def deposit(self, currency, amount):
+        self.balances[currency] = self.balances.get(currency, 0) + amount
+        self._transactions.append(Deposit(
+            str(len(self._transactions) + 1), self.now, currency, amount, '', None))
+
+    def withdraw(self, currency, amount, address=''):
+        if amount > self._available(currency):
+            raise APIException('Insufficient funds')
+        self.balances[currency] -= amount
+        self._transactions.append(Withdrawal(
+            str(len(self._transactions) + 1), self.now, currency, amount,
+            address, None))
+
+    def _available(self, currency):
+        return self.balances.get(currency, 0) - self.holds.get(currency, 0)
+
+    def _hold(self, currency, amount):
+        self.holds[currency] = self.holds.get(currency, 0) + amount
+
+    def _order_hold(self, order, amount):
+        '''
+        Funds an order holds for amount of it: the base currency of a sell,
+        the total plus the highest possible fee of a buy.
+        '''
+        if order[_CLS] is BuyOrder:
+            rate = common.number(1 + self.fees.max_rate)
+            return order[_COUNTER], common.descale(
+                common.descale(amount * order[_PRICE]) * rate)
+        return order[_BASE], amount
+
+    # Matching
+
+    def _fill(self, order, amount, price, maker):
+        base, counter = order[_BASE], order[_COUNTER]
+        fee = self.fees.fee(amount, price, maker)
+        total = common.mul(amount, price)
+        balances = self.balances
+        if order[_CLS] is BuyOrder:
+            trade_cls = Buy
+            balances[base] = balances.get(base, 0) + amount
+            balances[counter] = balances.get(counter, 0) - total - fee
+        else:
+            trade_cls = Sell
+            balances[base] = balances.get(base, 0) - amount
+            balances[counter] = balances.get(counter, 0) + total - fee
+        order[_REMAINING] -= amount
+        currency, held = self._order_hold(order, amount)
+        if not order[_REMAINING]:
+            # Releases what rounding left of the hold too
+            held = order[_HELD]
+            del self.orders[order[_ID]]
+        order[_HELD] -= held
+        self.holds[currency] -= held
+        self._trades.append((trade_cls, str(next(self._trade_ids)), base,
+                             counter, self.now, order[_ID], amount, price,
+                             fee, counter))
+
+    def _match_resting(self, heap, is_bid, price, amount):
+        '''
+        Fills the resting orders of one side that cross a market trade of
+        amount at price and returns the amount left over
+        '''
+        orders = self.orders
+        while heap and amount > 0:
+            order_id = heap[0][2]
+            order = orders.get(order_id)
+            if order is None:
+                heapq.heappop(heap)
+                continue
+            order_price = order[_PRICE]
+            if (order_price < price) if is_bid else (order_price > price):
+                # Best order is priced worse than the trade
+                break
+            fill = min(order[_REMAINING], amount)
+            self._fill(order, fill, order[_PRICE], True)
+            amount -= fill
+            if order_id not in orders:
+                heapq.heappop(heap)
+        return amount
+
+    def trade(self, market, price, amount, time=None, kind=ticks.TRADE):
+        '''
+        A trade of the market at large. kind is ticks.BUY if the buyer took
+        liquidity, so it can only fill resting sells, ticks.SELL if the
+        seller did. With ticks.TRADE the side is unknown and the amount is
+        shared, bids first.
+        '''
+        self._advance(time)
+        m = self.markets.get(tuple(market))
+        if m is not None:
+            self._match(m, price, amount, kind)
+
+    def _match(self, m, price, amount, kind):
+        if m.bids and kind != ticks.BUY:
+            amount = self._match_resting(m.bids, True, price, amount)
+        if m.asks and kind != ticks.SELL and amount > 0:
+            self._match_resting(m.asks, False, price, amount)
+
+    def book_update(self, market, side, price, amount, time=None):
+        self._advance(time)
+        self._market(market).book.update(side, price, amount)
+
+    def book_snapshot(self, market, bids, asks, time=None):
+        self._advance(time)
+        self._market(market).book.apply_snapshot(bids, asks)
+
+    def feed(self, events):
+        '''
+        Runs cryptex.ticks.Tick events through the exchange, e.g. from
+        TickReader.ticks()
+        '''
+        trade_kinds = (ticks.TRADE, ticks.BUY, ticks.SELL)
+        markets = self.markets
+        for tick in events:
+            kind = tick.kind
+            if kind in trade_kinds:
+                # Ticks come in timestamp order
+                self.now = tick.datetime
+                # Markets without resting orders are skipped cheaply
+                m = markets.get(tick.market)
+                if m is not None and (m.bids or m.asks):
+                    self._match(m, tick.price, tick.amount, kind)
+            elif kind == ticks.BOOK_BID:
+                self.book_update(tick.market, BID, tick.price, tick.amount,
+                                 tick.datetime)
+            elif kind == ticks.BOOK_ASK:
+                self.book_update(tick.market, ASK, tick.price, tick.amount,
+                                 tick.datetime)
+            else:
+                self._advance(tick.datetime)
+
+    def _take(self, order, m):
+        '''
+        Fills a new order against the opposite side of the book as far as it
+        crosses, consuming the liquidity it takes
+        '''
+        if order[_CLS] is BuyOrder:
+            side, crosses = ASK, lambda level: level <= order[_PRICE]
+        else:
+            side, crosses = BID, lambda level: level >= order[_PRICE]
+        book = m.book
+        while order[_ID] in self.orders:
+            best = book.best_ask() if side == ASK else book.best_bid()
+            if best is None or not crosses(best[0]):
+                break
+            level_price, level_amount = best
+            fill = min(order[_REMAINING], level_amount)
+            book.update(side, level_price, level_amount - fill)
+            self._fill(order, fill, level_price, False)
+
+    def _best_resting(self, heap):
+        '''
+        Best open order of one side, dropping cancelled and filled ones from
+        the top of the heap
+        '''
+        while heap:
+            order = self.orders.get(heap[0][2])
+            if order is not None:
+                return order
+            heapq.heappop(heap)
+        return None
+
+    def _crosses_own(self, m, cls, price):
+        if cls is BuyOrder:
+            best = self._best_resting(m.asks)
+            return best is not None and best[_PRICE] <= price
+        best = self._best_resting(m.bids)
+        return best is not None and best[_PRICE] >= price
+
+    def _create_order(self, market, cls, quantity, price):
+        market = tuple(market)
+        if quantity <= 0 or price <= 0:
+            raise APIException('Invalid quantity or price')
+        m = self._market(market)
+        if self._crosses_own(m, cls, price):
+            raise APIException('Order would trade with your own order')
+        order_id = str(next(self._order_ids))
+        order = [cls, order_id, market[0], market[1], self.now, quantity, price,
+                 None]
+        currency, held = self._order_hold(order, quantity)
+        if held > self._available(currency):
+            raise APIException('Insufficient funds')
+        order[_HELD] = held
+        self._hold(currency, held)
+        self.orders[order_id] = order
+
+        self._take(order, m)
+        if order_id in self.orders:
+            if cls is BuyOrder:
+                heapq.heappush(m.bids, (-price, next(self._sequence), order_id))
+            else:
+                heapq.heappush(m.asks, (price, next(self._sequence), order_id))
+        return order_id
+
+    # Exchange
+
+    def get_markets(self):
+        return self.markets.keys()
+
+    def buy(self, market, quantity, price):
+        return self._order_placed(
+            BuyOrder, tuple(market), quantity, price,
+            self._create_order(market, BuyOrder, quantity, price))
+
+    def sell(self, market, quantity, price):
+        return self._order_placed(
+            SellOrder, tuple(market), quantity, price,
+            self._create_order(market, SellOrder, quantity, price))
+
+    def cancel_order(self, order_id):
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            raise APIException('Invalid order id')
+        currency, _ = self._order_hold(order, order[_REMAINING])
+        self.holds[currency] -= order[_HELD]
+        self._order_cancelled(order_id)
+        return None
+
+    def get_my_open_orders(self):
+        return build_orders([tuple(o[:7]) for o in self.orders.itervalues()])
+
+    def get_my_trades(self):
+        return self._trades_observed(build_trades(self._trades))
+
+    def get_my_new_trades(self, last_trade=None):
+        if last_trade is None:
+            return self.get_my_trades()
+        return self._trades_observed(
+            build_trades(self._trades[int(last_trade.trade_id):]))
+
+    def get_my_transactions(self, limit=None):
+        return self._transactions_observed(list(self._transactions))
+
+    def get_my_balances(self):
+        return {currency: common.quantize(self._available(currency))
+                for currency in self.balances}
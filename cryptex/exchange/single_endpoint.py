@@ -1,12 +1,12 @@
-import time
 import hmac
 from hashlib import sha512
 from urllib import urlencode
-from decimal import Decimal
-
-import requests
 
+import cryptex.common as common
 from cryptex.exception import APIException
+from cryptex.exchange.connection_pool import get_default_pool
+from cryptex.exchange.nonce import get_nonce_allocator
+from cryptex.exchange.json_stream import iter_members
 
 class SingleEndpointAPI(object):
     """
@@ -14,12 +14,31 @@ class SingleEndpointAPI(object):
     exists a single endpoint. Different actions are performed by passing a 
     "method" parameter.  All requests are POST. All reponses are json, 
     returing an object with keys "success" and "return" (if successful).
+
+    Requests go through a shared cryptex.exchange.connection_pool.ConnectionPool
+    unless a pool is passed in. Nonces come from the allocator shared by all
+    clients of the same key, or from the given cryptex.exchange.nonce
+    allocator. Pass get_nonce_allocator(key, directory) or a
+    FileNonceAllocator to keep nonces increasing across restarts.
+
+    If a cryptex.exchange.scheduler.RequestScheduler is given, each request
+    waits for its turn there. The nonce is only drawn once the request may be
+    sent, so reordering by priority never sends nonces out of order.
     """
-    def __init__(self, base_url, key=None, secret=None):
+    NONCE_RETRIES = 3
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, base_url, key=None, secret=None, pool=None, nonce=None,
+                 scheduler=None):
         self.base_url = base_url
         self.authenticated = key and secret
         self.key = key
         self.secret = secret
+        self.pool = pool or get_default_pool()
+        if self.authenticated and nonce is None:
+            nonce = get_nonce_allocator(key)
+        self.nonce = nonce
+        self.scheduler = scheduler
 
     def get_request_params(self, method, data):
         payload = {'method': method}
@@ -27,7 +46,7 @@ class SingleEndpointAPI(object):
         headers = {}
 
         if self.authenticated:
-            payload.update({'nonce': int(time.time())})
+            payload.update({'nonce': self.nonce.next()})
             signature = hmac.new(self.secret, urlencode(payload),
                 sha512).hexdigest()
 
@@ -38,14 +57,30 @@ class SingleEndpointAPI(object):
 
         return (payload, headers)
 
-    def perform_request(self, method, data={}):
+    def _open(self, method, data, stream=False):
+        if self.scheduler is not None:
+            self.scheduler.acquire(method)
         payload, headers = self.get_request_params(method, data)
+        kwargs = {'stream': True} if stream else {}
         if self.authenticated:
-            r = requests.post(self.base_url, data=payload, headers=headers)
-        else:
-            r = requests.get(self.base_url, params=payload, headers=headers)
+            return self.pool.post(self.base_url, data=payload, headers=headers,
+                                  **kwargs)
+        return self.pool.get(self.base_url, params=payload, headers=headers,
+                             **kwargs)
 
-        content = r.json(parse_float=Decimal)
+    def _send(self, method, data):
+        return self._open(method, data).json(parse_float=common.parse_float)
+
+    def perform_request(self, method, data={}):
+        content = self._send(method, data)
+
+        # Concurrent signed requests may arrive out of nonce order. Those
+        # were not executed and are sent again with a fresh nonce.
+        retries = self.NONCE_RETRIES if self.authenticated else 0
+        while (retries and int(content['success']) != 1 and
+               'nonce' in unicode(content.get('error', '')).lower()):
+            retries -= 1
+            content = self._send(method, data)
 
         # Cryptsy returns success as a string, BTC-e as a int
         if int(content['success']) != 1:
@@ -58,3 +93,23 @@ class SingleEndpointAPI(object):
                 'moreinfo': content['moreinfo']
             }
         return content['return']
+
+    def stream_request(self, method, data={}, path=()):
+        '''
+        Like perform_request, but decodes the response as it arrives and
+        yields (key, value) for each member of the object at path within
+        "return" (or (index, value) for an array), e.g. one market at a time
+        of a large market data response. Errors are raised once the whole
+        response has been read, and are not retried.
+        '''
+        r = self._open(method, data, stream=True)
+        header = {}
+        try:
+            chunks = r.iter_content(self.STREAM_CHUNK_SIZE)
+            for member in iter_members(chunks, ('return',) + tuple(path),
+                                       common.parse_float, header):
+                yield member
+        finally:
+            r.close()
+        if int(header.get('success', 0)) != 1:
+            raise APIException(header.get('error', 'Invalid response'))
@@ -0,0 +1,193 @@
+import os
+import io
+import json
+import calendar
+import threading
+
+import cryptex.common as common
+from cryptex.timestamps import from_unix
+from cryptex.trade import Trade, Buy, Sell
+from cryptex.transaction import Transaction, Deposit, Withdrawal
+
+TRADE_TYPES = {cls.__name__: cls for cls in (Trade, Buy, Sell)}
+TRANSACTION_TYPES = {cls.__name__: cls for cls in (Transaction, Deposit, Withdrawal)}
+
+def _to_timestamp(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+_to_str = common.format_number
+_to_number = common.number
+
+def _id_key(record_id):
+    # Exchanges use numeric ids, which must not be compared as strings
+    if unicode(record_id).isdigit():
+        return (0, int(record_id))
+    return (1, record_id)
+
+def trade_to_json(trade):
+    return {
+        'type': trade.type(),
+        'trade_id': trade.trade_id,
+        'base_currency': trade.base_currency,
+        'counter_currency': trade.counter_currency,
+        'datetime': _to_timestamp(trade.datetime),
+        'order_id': trade.order_id,
+        'amount': _to_str(trade.amount),
+        'price': _to_str(trade.price),
+        'fee': _to_str(trade.fee),
+        'fee_currency': trade.fee_currency,
+    }
+
+def trade_from_json(j):
+    return TRADE_TYPES[j['type']](
+        trade_id = j['trade_id'],
+        base_currency = j['base_currency'],
+        counter_currency = j['counter_currency'],
+        datetime = from_unix(j['datetime']),
+        order_id = j['order_id'],
+        amount = _to_number(j['amount']),
+        price = _to_number(j['price']),
+        fee = _to_number(j['fee']),
+        fee_currency = j['fee_currency'],
+    )
+
+def transaction_to_json(tx):
+    return {
+        'type': tx.type(),
+        'transaction_id': tx.transaction_id,
+        'datetime': _to_timestamp(tx.datetime),
+        'currency': tx.currency,
+        'amount': _to_str(tx.amount),
+        'address': tx.address,
+        'fee': _to_str(tx.fee),
+    }
+
+def transaction_from_json(j):
+    return TRANSACTION_TYPES[j['type']](
+        j['transaction_id'],
+        from_unix(j['datetime']),
+        j['currency'],
+        _to_number(j['amount']),
+        j['address'],
+        _to_number(j['fee']),
+    )
+
+
+class _RecordLog(object):
+    """
+    Append-only JSON lines file of records with unique ids.
+    """
+    def __init__(self, path, id_attr, to_json, from_json):
+        self.path = path
+        self.id_attr = id_attr
+        self.to_json = to_json
+        self.records = []
+        self.ids = set()
+        self.last = None
+
+        if os.path.exists(path):
+            with io.open(path, 'r', encoding='utf-8') as f:
+                self._index([from_json(json.loads(line))
+                             for line in f if line.strip()])
+
+    def _key(self, record):
+        return (record.datetime, _id_key(getattr(record, self.id_attr)))
+
+    def _index(self, records):
+        for r in records:
+            self.records.append(r)
+            self.ids.add(getattr(r, self.id_attr))
+            if self.last is None or self._key(r) > self._key(self.last):
+                self.last = r
+
+    def append(self, records):
+        new = []
+        seen = set()
+        for r in sorted(records, key=self._key):
+            record_id = getattr(r, self.id_attr)
+            if record_id not in self.ids and record_id not in seen:
+                seen.add(record_id)
+                new.append(r)
+        if new:
+            with io.open(self.path, 'a', encoding='utf-8') as f:
+                for r in new:
+                    f.write(unicode(json.dumps(self.to_json(r))) + u'\n')
+            self._index(new)
+        return new
+
+
+class HistoryStore(object):
+    """
+    Local, append-only copy of one account's trades and transactions. Each
+    exchange account should get its own directory.
+    """
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._trades = _RecordLog(os.path.join(directory, 'trades.jsonl'),
+                                  'trade_id', trade_to_json, trade_from_json)
+        self._transactions = _RecordLog(
+            os.path.join(directory, 'transactions.jsonl'),
+            'transaction_id', transaction_to_json, transaction_from_json)
+
+    def add_trades(self, trades):
+        """
+        Stores the trades that are not stored yet and returns them.
+        """
+        with self._lock:
+            return self._trades.append(trades)
+
+    def add_transactions(self, transactions):
+        with self._lock:
+            return self._transactions.append(transactions)
+
+    def trades(self):
+        return list(self._trades.records)
+
+    def transactions(self):
+        return list(self._transactions.records)
+
+    def last_trade(self):
+        return self._trades.last
+
+    def last_transaction(self):
+        return self._transactions.last
+
+
+class HistorySync(object):
+    """
+    Keeps a HistoryStore up to date with an exchange, fetching only records
+    newer than the last stored ones. Serves get_my_trades and
+    get_my_transactions from the store, so it can stand in for the exchange
+    wherever only history is read:
+
+        PLCalculator(HistorySync(exchange, HistoryStore('history/btce')))
+    """
+    def __init__(self, exchange, store):
+        self.exchange = exchange
+        self.store = store
+
+    def sync_trades(self):
+        trades = self.exchange.get_my_new_trades(self.store.last_trade())
+        return self.store.add_trades(trades)
+
+    def sync_transactions(self):
+        transactions = self.exchange.get_my_new_transactions(
+            self.store.last_transaction())
+        return self.store.add_transactions(transactions)
+
+    def sync(self):
+        """
+        Returns the newly stored trades and transactions.
+        """
+        return (self.sync_trades(), self.sync_transactions())
+
+    def get_my_trades(self):
+        self.sync_trades()
+        return self.store.trades()
+
+    def get_my_transactions(self):
+        self.sync_transactions()
+        return self.store.transactions()
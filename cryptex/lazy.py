@@ -0,0 +1,65 @@
+'''
+Records whose fields are converted on first access.
+'''
+from collections import MutableMapping
+
+
+class LazyRecord(MutableMapping):
+    '''
+    Dict-like view of a decoded JSON object that runs converters[field] on
+    the raw value of a field the first time it is read and keeps the result.
+    Fields without a converter are returned as they are. Assigned values are
+    taken as already converted.
+
+    Anything that reads every value, like items() or comparison with a dict,
+    converts the whole record.
+    '''
+    __slots__ = ('_data', '_converters', '_converted')
+
+    def __init__(self, data, converters):
+        self._data = data
+        self._converters = converters
+        self._converted = None
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        converter = self._converters.get(key)
+        if converter is None:
+            return value
+        converted = self._converted
+        if converted is None:
+            converted = self._converted = {}
+        elif key in converted:
+            return converted[key]
+        value = converted[key] = converter(value)
+        return value
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+        if key in self._converters:
+            if self._converted is None:
+                self._converted = {}
+            self._converted[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+        if self._converted is not None:
+            self._converted.pop(key, None)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def raw(self, key):
+        '''
+        The value of key as decoded, before conversion
+        '''
+        return self._data[key]
+
+    def __repr__(self):
+        return 'LazyRecord(%r)' % dict(self.iteritems())
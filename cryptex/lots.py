@@ -0,0 +1,122 @@
+from collections import deque
+
+import cryptex.common as common
+from cryptex.transaction import Deposit
+from cryptex.trade import Trade, Buy
+
+FIFO = 'fifo'
+LIFO = 'lifo'
+AVERAGE = 'average'
+
+
+class LotBook(object):
+    '''
+    Open lots of one market
+
+    Lots are kept as [amount, price, datetime] lists in a deque and are only
+    turned into Buy objects when asked for.
+    '''
+    def __init__(self, market, method=LIFO):
+        if method not in (FIFO, LIFO, AVERAGE):
+            raise ValueError('Unknown lot method "%s"' % method)
+        self.market = market
+        self.method = method
+        self.lots = deque()
+
+    def buy(self, amount, price, datetime):
+        lots = self.lots
+        if self.method == AVERAGE and lots:
+            lot = lots[0]
+            total = lot[0] + amount
+            if total:
+                lot[1] = common.divide(lot[0] * lot[1] + amount * price, total)
+            lot[0] = total
+        else:
+            lots.append([amount, price, datetime])
+
+    def sell(self, amount):
+        '''
+        Takes amount out of the open lots. Selling more than is held empties
+        the book; the excess stems from history that is not known.
+        '''
+        lots = self.lots
+        if self.method == FIFO:
+            index, pop = 0, lots.popleft
+        else:
+            index, pop = -1, lots.pop
+        while amount > 0 and lots:
+            lot = lots[index]
+            if lot[0] > amount:
+                lot[0] -= amount
+                return
+            amount -= lot[0]
+            pop()
+
+    def amount(self):
+        return sum(lot[0] for lot in self.lots)
+
+    def open_lots(self):
+        base, counter = self.market
+        return [Buy(None, base, counter, datetime, None, amount, price)
+                for amount, price, datetime in self.lots]
+
+
+class LotEngine(object):
+    '''
+    Incremental lot accounting over all markets of an account
+
+    Trades and transactions are fed one at a time in chronological order.
+    Deposits and withdrawals of a currency count as zero-price buys and
+    sells in every market that has it as base currency, including markets
+    first traded after the transaction.
+    '''
+    def __init__(self, method=LIFO):
+        self.method = method
+        self.books = {}
+        self._markets_by_currency = {}
+        self._transactions = {}
+
+    def _book(self, market):
+        book = self.books.get(market)
+        if book is None:
+            book = self.books[market] = LotBook(market, self.method)
+            base = market[0]
+            self._markets_by_currency.setdefault(base, []).append(book)
+            for is_deposit, amount, datetime in self._transactions.get(base, ()):
+                if is_deposit:
+                    book.buy(amount, common.number(0), datetime)
+                else:
+                    book.sell(amount)
+        return book
+
+    def add_trade(self, trade):
+        book = self._book((trade.base_currency, trade.counter_currency))
+        if isinstance(trade, Buy):
+            book.buy(trade.amount, trade.price, trade.datetime)
+        else:
+            book.sell(trade.amount)
+
+    def add_transaction(self, tx):
+        is_deposit = isinstance(tx, Deposit)
+        self._transactions.setdefault(tx.currency, []).append(
+            (is_deposit, tx.amount, tx.datetime))
+        for book in self._markets_by_currency.get(tx.currency, ()):
+            if is_deposit:
+                book.buy(tx.amount, common.number(0), tx.datetime)
+            else:
+                book.sell(tx.amount)
+
+    def add(self, record):
+        if isinstance(record, Trade):
+            self.add_trade(record)
+        else:
+            self.add_transaction(record)
+
+    def open_lots(self, market=None):
+        '''
+        Returns {market: [Buy, ...]}, or the list of one market.
+        '''
+        if market is not None:
+            book = self.books.get(market)
+            return book.open_lots() if book is not None else []
+        return {m: book.open_lots() for m, book in self.books.iteritems()}
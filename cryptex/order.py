@@ -2,6 +2,8 @@ class Order(object):
     '''
     Basic order
     '''
+    __slots__ = ('order_id', 'base_currency', 'counter_currency', 'datetime',
+                 'amount', 'price')
     order_type = 0
     def __init__(self, order_id, base_currency, counter_currency,
                 datetime, amount, price):
@@ -15,11 +17,35 @@ class Order(object):
     def type(self):
         return self.__class__.__name__
 
+    def as_dict(self):
+        return {name: getattr(self, name) for name in Order.__slots__}
+
     def __str__(self):
-        return repr(self.__dict__)
+        return repr(self.as_dict())
 
 class BuyOrder(Order):
+    __slots__ = ()
     order_type = 1
 
 class SellOrder(Order):
+    __slots__ = ()
     order_type = 2
+
+def build_orders(rows):
+    '''
+    Builds orders from rows of the form (cls, order_id, base_currency,
+    counter_currency, datetime, amount, price).
+    '''
+    orders = []
+    append = orders.append
+    new = object.__new__
+    for cls, order_id, base_currency, counter_currency, datetime, amount, price in rows:
+        o = new(cls)
+        o.order_id = order_id
+        o.base_currency = base_currency
+        o.counter_currency = counter_currency
+        o.datetime = datetime
+        o.amount = amount
+        o.price = price
+        append(o)
+    return orders
@@ -0,0 +1,212 @@
+from bisect import bisect_left
+
+import cryptex.common as common
+
+BID = 'bid'
+ASK = 'ask'
+
+
+class _Side(object):
+    '''
+    Price levels of one side of a book
+
+    Prices are kept in a sorted list of keys with the best price last, so
+    the best level is read in O(1) and levels near the top of the book are
+    inserted and removed without moving the rest of the list. Asks use the
+    negated price as key so that both sides sort the same way.
+    '''
+    def __init__(self, sign):
+        self.sign = sign
+        self.keys = []
+        self.amounts = {}
+
+    def update(self, price, amount):
+        key = price * self.sign
+        if amount:
+            if key not in self.amounts:
+                keys = self.keys
+                keys.insert(bisect_left(keys, key), key)
+            self.amounts[key] = amount
+        elif key in self.amounts:
+            del self.amounts[key]
+            keys = self.keys
+            del keys[bisect_left(keys, key)]
+
+    def best(self):
+        if not self.keys:
+            return None
+        key = self.keys[-1]
+        return (key * self.sign, self.amounts[key])
+
+    def levels(self, depth=None):
+        '''
+        Returns [(price, amount)] from the best price outwards
+        '''
+        keys = self.keys
+        stop = 0 if depth is None else max(len(keys) - depth, 0)
+        return [(keys[i] * self.sign, self.amounts[keys[i]])
+                for i in xrange(len(keys) - 1, stop - 1, -1)]
+
+    def amount_to(self, price):
+        '''
+        Cumulative amount offered at price or better
+        '''
+        keys = self.keys
+        start = bisect_left(keys, price * self.sign)
+        amounts = self.amounts
+        return sum(amounts[keys[i]] for i in xrange(start, len(keys)))
+
+    def cost_of(self, amount):
+        '''
+        Returns (amount filled, total cost) of taking amount from this side
+        '''
+        filled = total = 0
+        keys = self.keys
+        for i in xrange(len(keys) - 1, -1, -1):
+            if filled >= amount:
+                break
+            take = min(self.amounts[keys[i]], amount - filled)
+            filled += take
+            total += take * keys[i] * self.sign
+        return (filled, common.descale(total))
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class OrderBook(object):
+    '''
+    Aggregated (L2) order book of one market
+
+    Starts from a snapshot and is kept current with update(), which sets the
+    amount available at a price level (an amount of 0 removes it), or with
+    apply_snapshot(), which applies only the levels that changed.
+    '''
+    def __init__(self, market, bids=(), asks=()):
+        self.market = market
+        self.load(bids, asks)
+
+    def _side(self, side):
+        if side == BID:
+            return self.bids
+        if side == ASK:
+            return self.asks
+        raise ValueError('Unknown side "%s"' % side)
+
+    def load(self, bids, asks):
+        '''
+        Replaces the book with lists of (price, amount)
+        '''
+        self.bids = _Side(1)
+        self.asks = _Side(-1)
+        for price, amount in bids:
+            self.bids.update(price, amount)
+        for price, amount in asks:
+            self.asks.update(price, amount)
+
+    def update(self, side, price, amount):
+        self._side(side).update(price, amount)
+
+    def apply_updates(self, updates):
+        '''
+        Applies an iterable of (side, price, amount)
+        '''
+        for side, price, amount in updates:
+            self._side(side).update(price, amount)
+
+    def diff(self, bids, asks):
+        '''
+        Returns the updates that turn this book into the given snapshot
+        '''
+        updates = []
+        for side, snapshot in ((BID, bids), (ASK, asks)):
+            book_side = self._side(side)
+            levels = {}
+            for price, amount in snapshot:
+                levels[price] = amount
+            for key, amount in book_side.amounts.iteritems():
+                price = key * book_side.sign
+                if price not in levels:
+                    updates.append((side, price, 0))
+            for price, amount in levels.iteritems():
+                if book_side.amounts.get(price * book_side.sign) != amount:
+                    updates.append((side, price, amount))
+        return updates
+
+    def apply_snapshot(self, bids, asks):
+        '''
+        Brings the book up to date with a new snapshot and returns the
+        updates that were applied
+        '''
+        updates = self.diff(bids, asks)
+        self.apply_updates(updates)
+        return updates
+
+    def best_bid(self):
+        '''
+        Returns (price, amount) of the highest bid, or None
+        '''
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def spread(self):
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def levels(self, side, depth=None):
+        return self._side(side).levels(depth)
+
+    def depth(self, side, price):
+        '''
+        Cumulative amount offered on side at price or better
+        '''
+        return self._side(side).amount_to(price)
+
+    def cost(self, side, amount):
+        '''
+        Returns (amount filled, total) of taking amount from side, e.g. the
+        cost of buying amount is cost(ASK, amount)
+        '''
+        return self._side(side).cost_of(amount)
+
+    @classmethod
+    def from_btce_depth(cls, market, depth):
+        '''
+        Book from one market of BTCEPublic.get_depth
+        '''
+        return cls(market, *btce_levels(depth))
+
+    @classmethod
+    def from_cryptsy(cls, market, orders):
+        '''
+        Book from Cryptsy.get_market_orders or one market of
+        CryptsyPublic.get_order_data
+        '''
+        return cls(market, *cryptsy_levels(orders))
+
+
+def btce_levels(depth):
+    '''
+    Returns (bids, asks) as lists of (price, amount) from one market of
+    BTC-e depth
+    '''
+    def levels(entries):
+        return [(common.number(price), common.number(amount))
+                for price, amount in entries or ()]
+    return levels(depth.get('bids')), levels(depth.get('asks'))
+
+def cryptsy_levels(orders):
+    '''
+    Returns (bids, asks) as lists of (price, amount) from Cryptsy
+    marketorders or orderdata
+    '''
+    def levels(entries, price_key):
+        return [(common.number(o.get(price_key, o.get('price'))),
+                 common.number(o['quantity']))
+                for o in entries or ()]
+    return (levels(orders.get('buyorders'), 'buyprice'),
+            levels(orders.get('sellorders'), 'sellprice'))
@@ -1,12 +1,18 @@
-from decimal import Decimal
-
+import cryptex.common as common
 from cryptex.transaction import Deposit, Withdrawal
 from cryptex.trade import Buy, Sell
-from functools import partial
+from cryptex.lots import LotBook, LotEngine, LIFO
 
 class PLCalculator(object):
-    def __init__(self, exchange):
+    def __init__(self, exchange, method=LIFO):
+        '''
+        :param exchange: source of trades and transactions, e.g. an Exchange
+            or a cryptex.history.HistorySync
+        :param method: lot matching method, one of cryptex.lots.FIFO, LIFO
+            and AVERAGE
+        '''
         self.exchange = exchange
+        self.method = method
 
     @staticmethod
     def convert_transaction(market, tx):
@@ -20,63 +26,35 @@ class PLCalculator(object):
             trade_cls = Sell
 
         return trade_cls(None, base, counter, tx.datetime, None,
-                         tx.amount, Decimal('0'))
-
-    def _get_trades(self, market, trades, transactions):
-        """
-        Returns all trades in a particular market along with
-        transaction of the base currency, sorted by time.
-        """
-        base, counter = market
-        trades = [t for t in trades
-                  if t.base_currency == base and 
-                  t.counter_currency == counter]
-        txs = [t for t in transactions
-               if t.currency == base]
-        tx_trades = map(partial(PLCalculator.convert_transaction, market), txs)
-
-        all_trades = sorted(trades + tx_trades, key=lambda x: x.datetime)
-        return all_trades
+                         tx.amount, common.number(0))
 
     def get_markets(self, trades):
         return set([(t.base_currency, t.counter_currency) for t in trades])
 
     @staticmethod
-    def calculate_pl(market, trades):
-        base, counter = market
-        acc = []
+    def calculate_pl(market, trades, method=LIFO):
+        book = LotBook(market, method)
         for trade in trades:
             if isinstance(trade, Buy):
-                new_trade = Buy(None, base, counter, trade.datetime, None,
-                                trade.amount, trade.price)
-                acc.append(new_trade)
+                book.buy(trade.amount, trade.price, trade.datetime)
             else:
-                oldest_buy = None
-                total_amount = Decimal('0')
-                while total_amount < trade.amount:
-                    oldest_buy = acc.pop()
-                    total_amount += oldest_buy.amount
-                buy_amount = total_amount - trade.amount
-                if buy_amount != Decimal('0'):
-                    new_trade = Buy(None, base, counter, oldest_buy.datetime,
-                                    None, buy_amount, oldest_buy.price) 
-                    acc.append(new_trade)
-        return acc
+                book.sell(trade.amount)
+        return book.open_lots()
 
-    def unrealized_pl(self, market=None):
-        all_trades = self.exchange.get_my_trades()
-        all_transactions = self.exchange.get_my_transactions()
-        markets = self.get_markets(all_trades)
+    def engine(self):
+        """
+        Returns a cryptex.lots.LotEngine loaded with the exchange's history,
+        to which later trades and transactions can be added one by one.
+        """
+        records = list(self.exchange.get_my_trades())
+        records.extend(self.exchange.get_my_transactions())
+        # Stable sort, so trades come before transactions of the same time
+        records.sort(key=lambda r: r.datetime)
 
-        result = {}
-        for m in markets:
-            trades = self._get_trades(m, all_trades, all_transactions)
-            result[m] = PLCalculator.calculate_pl(m, trades)
+        engine = LotEngine(self.method)
+        for record in records:
+            engine.add(record)
+        return engine
 
-        if market is None:
-            return result
-        else:
-            try:
-                return result[market]
-            except KeyError:
-                return [] 
+    def unrealized_pl(self, market=None):
+        return self.engine().open_lots(market)
@@ -6,9 +6,14 @@ from pprint import pprint
 class BlockChainInfoSocket(WebSocketBase, WebSocketConsumer):
     WEBSOCKET_HOST = 'ws://ws.blockchain.info/inv'
 
-    def __init__(self):
+    def __init__(self, manager=None):
+        '''
+        manager is an optional cryptex.soxex.multiplexer.SocketManager to run
+        the connection on
+        '''
         super(BlockChainInfoSocket, self).__init__()
         self.callback = None
+        self.manager = manager
 
     def _connect(self):
         self.start_socket(self.WEBSOCKET_HOST)
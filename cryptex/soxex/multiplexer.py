@@ -0,0 +1,324 @@
+import json
+import logging
+import os
+import select
+import threading
+import time
+import Queue
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+import websocket
+
+log = logging.getLogger(__name__)
+
+# Backpressure policies of a full consumer queue
+DROP_OLDEST = 'drop_oldest'
+BLOCK = 'block'
+COALESCE = 'coalesce'
+
+
+def _close(connection):
+    '''
+    Sends a close frame without waiting up to 3 seconds for the reply like
+    WebSocket.close() does
+    '''
+    try:
+        connection.send_close()
+    except Exception:
+        pass
+    connection.connected = False
+    connection.sock.close()
+
+
+class ConsumerQueue(object):
+    '''
+    Bounded queue of (received time, message) between the decoder and one
+    consumer
+
+    When full, DROP_OLDEST discards the oldest message and BLOCK makes the
+    decoder wait, which holds up every socket of the manager. COALESCE keeps
+    only the newest message per key(message) (by default one message in all),
+    and drops the oldest once maxsize different keys are queued.
+    '''
+    def __init__(self, maxsize=1000, policy=DROP_OLDEST, key=None):
+        if policy not in (DROP_OLDEST, BLOCK, COALESCE):
+            raise ValueError('Unknown policy "%s"' % policy)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key = key or (lambda message: None)
+        self.dropped = 0
+        self.coalesced = 0
+        self._items = deque()
+        self._pending = {}
+        self._draining = False
+        self._cond = threading.Condition()
+
+    def put(self, received, message):
+        '''
+        Returns True if the queue was idle and needs a drain scheduled
+        '''
+        with self._cond:
+            key = None
+            if self.policy == COALESCE:
+                key = self.key(message)
+                entry = self._pending.get(key)
+                if entry is not None:
+                    entry[0], entry[1] = received, message
+                    self.coalesced += 1
+                    return False
+            if len(self._items) >= self.maxsize:
+                if self.policy == BLOCK:
+                    while len(self._items) >= self.maxsize:
+                        self._cond.wait()
+                else:
+                    self._pop()
+                    self.dropped += 1
+            entry = [received, message, key]
+            self._items.append(entry)
+            if self.policy == COALESCE:
+                self._pending[key] = entry
+            if not self._draining:
+                self._draining = True
+                return True
+            return False
+
+    def _pop(self):
+        entry = self._items.popleft()
+        if self.policy == COALESCE:
+            del self._pending[entry[2]]
+        return entry
+
+    def get(self):
+        '''
+        Returns the next (received time, message), or None once empty, after
+        which the next put schedules a new drain
+        '''
+        with self._cond:
+            if not self._items:
+                self._draining = False
+                return None
+            entry = self._pop()
+            self._cond.notify()
+            return entry[0], entry[1]
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ManagedSocket(object):
+    '''
+    One websocket connection run by a SocketManager. Offers send() and
+    close() like websocket.WebSocketApp.
+    '''
+    def __init__(self, manager, name, connection, callback, queue, on_close):
+        self.manager = manager
+        self.name = name
+        self.connection = connection
+        self.fd = connection.fileno()
+        self.callback = callback
+        self.queue = queue
+        self.on_close = on_close
+        self.received = 0
+        self.delivered = 0
+        self.errors = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._fragments = None
+
+    def send(self, message):
+        self.connection.send(message)
+
+    def close(self):
+        self.manager.remove(self)
+
+    def stats(self):
+        '''
+        lag is the seconds between receipt and delivery of the last message
+        '''
+        return {
+            'received': self.received,
+            'delivered': self.delivered,
+            'errors': self.errors,
+            'dropped': self.queue.dropped,
+            'coalesced': self.queue.coalesced,
+            'queue_depth': len(self.queue),
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+        }
+
+
+class SocketManager(object):
+    '''
+    Runs any number of websocket connections on one I/O thread
+
+    The I/O thread selects over all sockets and only reads frames. A decoder
+    thread turns them into messages and queues them per socket (see
+    ConsumerQueue for the backpressure policies), and a small pool of
+    workers runs the callbacks, never more than one at a time per socket, so
+    a slow callback only delays its own socket.
+    '''
+    READ_TIMEOUT = 0.05
+
+    def __init__(self, workers=4, queue_size=1000, policy=DROP_OLDEST,
+                 decode=json.loads, connect=websocket.create_connection):
+        self.queue_size = queue_size
+        self.policy = policy
+        self.decode = decode
+        self.connect = connect
+        self.workers = workers
+        self._sockets = {}
+        self._lock = threading.Lock()
+        self._raw = Queue.Queue()
+        self._wake_r, self._wake_w = os.pipe()
+        self._pool = None
+        self._threads = []
+        self._running = False
+
+    def add(self, url, callback, policy=None, queue_size=None, key=None,
+            on_close=None, name=None):
+        '''
+        Connects to url and delivers its decoded messages to callback.
+        on_close(error) is called if the connection ends without
+        remove(). name identifies the socket in stats() and defaults to url.
+        '''
+        connection = self.connect(url)
+        connection.settimeout(self.READ_TIMEOUT)
+        queue = ConsumerQueue(queue_size or self.queue_size,
+                              policy or self.policy, key)
+        sock = ManagedSocket(self, name or url, connection, callback, queue,
+                             on_close)
+        with self._lock:
+            self._sockets[sock.fd] = sock
+        self._wake()
+        return sock
+
+    def _pop(self, sock):
+        '''
+        Unregisters sock and returns whether it was registered. The fd of a
+        dropped socket may already belong to a new one, which stays.
+        '''
+        with self._lock:
+            if self._sockets.get(sock.fd) is not sock:
+                return False
+            del self._sockets[sock.fd]
+            return True
+
+    def remove(self, sock):
+        if self._pop(sock):
+            _close(sock.connection)
+            self._wake()
+
+    def sockets(self):
+        with self._lock:
+            return self._sockets.values()
+
+    def stats(self):
+        '''
+        Returns {socket name: ManagedSocket.stats()}
+        '''
+        return {sock.name: sock.stats() for sock in self.sockets()}
+
+    def start(self):
+        self._running = True
+        self._pool = ThreadPool(self.workers)
+        self._threads = [threading.Thread(target=self._io_loop),
+                         threading.Thread(target=self._decode_loop)]
+        for t in self._threads:
+            t.daemon = True
+            t.start()
+
+    def stop(self):
+        self._running = False
+        self._wake()
+        self._raw.put(None)
+        for t in self._threads:
+            t.join()
+        for sock in self.sockets():
+            self.remove(sock)
+        if self._pool is not None:
+            self._pool.close()
+
+    def _wake(self):
+        os.write(self._wake_w, 'x')
+
+    def _io_loop(self):
+        while self._running:
+            with self._lock:
+                sockets = dict(self._sockets)
+            try:
+                readable = select.select(sockets.keys() + [self._wake_r],
+                                         [], [], 1.0)[0]
+            except (select.error, ValueError):
+                # A socket was closed by remove() meanwhile
+                continue
+            for fd in readable:
+                if fd == self._wake_r:
+                    os.read(self._wake_r, 4096)
+                    continue
+                sock = sockets[fd]
+                try:
+                    self._read(sock)
+                except websocket.WebSocketTimeoutException:
+                    # Partial frame, recv_frame keeps what it has read
+                    pass
+                except Exception as e:
+                    self._closed(sock, e)
+
+    def _read(self, sock):
+        frame = sock.connection.recv_frame()
+        opcode = frame.opcode
+        if opcode in (websocket.ABNF.OPCODE_TEXT, websocket.ABNF.OPCODE_BINARY):
+            if frame.fin:
+                self._raw.put((sock, frame.data, time.time()))
+            else:
+                sock._fragments = [frame.data]
+        elif opcode == websocket.ABNF.OPCODE_CONT and sock._fragments is not None:
+            sock._fragments.append(frame.data)
+            if frame.fin:
+                data = ''.join(sock._fragments)
+                sock._fragments = None
+                self._raw.put((sock, data, time.time()))
+        elif opcode == websocket.ABNF.OPCODE_PING:
+            sock.connection.pong(frame.data)
+        elif opcode == websocket.ABNF.OPCODE_CLOSE:
+            self._closed(sock, None)
+
+    def _closed(self, sock, error):
+        if not self._pop(sock):
+            return
+        _close(sock.connection)
+        if sock.on_close is not None:
+            self._pool.apply_async(sock.on_close, (error,))
+
+    def _decode_loop(self):
+        while True:
+            item = self._raw.get()
+            if item is None:
+                return
+            sock, data, received = item
+            sock.received += 1
+            try:
+                message = self.decode(data)
+            except ValueError:
+                sock.errors += 1
+                log.warning('Undecodable message on %s', sock.name)
+                continue
+            if sock.queue.put(received, message):
+                self._pool.apply_async(self._deliver, (sock,))
+
+    def _deliver(self, sock):
+        while True:
+            entry = sock.queue.get()
+            if entry is None:
+                return
+            received, message = entry
+            lag = time.time() - received
+            sock.lag = lag
+            sock.max_lag = max(sock.max_lag, lag)
+            try:
+                sock.callback(message)
+            except Exception:
+                sock.errors += 1
+                log.exception('Callback of %s failed', sock.name)
+            sock.delivered += 1
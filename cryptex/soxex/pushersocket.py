@@ -1,32 +1,129 @@
 import pusherclient as pusher
 import json
 import logging
+import threading
 
 from pprint import pprint
 
 class PusherConnection(object):
+    '''
+    One Pusher socket per app key, shared by any number of channels
 
-    def __init__(self, key, channel, event, callback):
-        self.channel_name = channel
-        self.event = event
+    Channels are subscribed and unsubscribed on the open socket as they come
+    and go. Each (channel, event) may have one callback per subscriber, and
+    all subscriptions are sent again whenever Pusher (re)establishes the
+    connection.
+    '''
+    def __init__(self, key, socket=None):
         self.key = key
-        self.event = event
-        self.callback = callback
+        # {channel: {event: {owner: callback}}}
+        self.subscriptions = {}
+        self._lock = threading.Lock()
 
-        def json_proxy(data):
-            self.callback(json.loads(data))
+        self.socket = socket or pusher.Pusher(key, log_level=logging.ERROR)
+        self.socket.connection.bind('pusher:connection_established',
+                                    self._handle_connect)
+        if socket is None:
+            self.socket.connect()
 
-        def handle_connect(data):
-            channel = self.socket.subscribe(self.channel_name)
-            channel.bind(self.event, json_proxy)
+    @property
+    def connected(self):
+        # pusherclient signals no disconnects, but keeps the state current
+        # through drops, errors and reconnects
+        return self.socket.connection.state == 'connected'
 
-        self.socket = pusher.Pusher(key, log_level=logging.ERROR)
-        self.socket.connection.bind('pusher:connection_established', handle_connect)
-        self.socket.connect()
+    def _handle_connect(self, data):
+        with self._lock:
+            for channel_name, events in self.subscriptions.items():
+                self._subscribe(channel_name, events.keys())
+
+    def _subscribe(self, channel_name, events):
+        channel = self.socket.subscribe(channel_name)
+        for event in events:
+            self._bind(channel, event)
+
+    def _bind(self, channel, event):
+        channel_name = channel.name
+
+        def dispatch(data):
+            with self._lock:
+                callbacks = self.subscriptions.get(channel_name, {}).get(event, {})
+                callbacks = callbacks.values()
+            if callbacks:
+                message = json.loads(data)
+                for callback in callbacks:
+                    callback(message)
+
+        channel.bind(event, dispatch)
+
+    def subscribe(self, channel_name, event, callback, owner=None):
+        with self._lock:
+            events = self.subscriptions.get(channel_name)
+            if events is None:
+                events = self.subscriptions[channel_name] = {}
+                if self.connected:
+                    self._subscribe(channel_name, [event])
+            elif event not in events and self.connected:
+                self._bind(self.socket.channel(channel_name), event)
+            events.setdefault(event, {})[owner] = callback
+
+    def unsubscribe(self, channel_name, owner=None):
+        '''
+        Drops the callbacks of owner on channel_name, and the channel itself
+        once nobody listens to it. Returns whether any channels are left.
+        '''
+        with self._lock:
+            events = self.subscriptions.get(channel_name, {})
+            for event, callbacks in events.items():
+                callbacks.pop(owner, None)
+                if not callbacks:
+                    del events[event]
+            if not events and channel_name in self.subscriptions:
+                del self.subscriptions[channel_name]
+                if self.connected:
+                    self.socket.unsubscribe(channel_name)
+            return bool(self.subscriptions)
 
     def disconnect(self):
         self.socket.disconnect()
 
+
+_connections = {}
+_connections_lock = threading.Lock()
+
+def get_connection(key):
+    '''
+    Returns the connection shared by all subscribers of a Pusher app key
+    '''
+    with _connections_lock:
+        return _get_connection(key)
+
+def _get_connection(key):
+    if key not in _connections:
+        _connections[key] = PusherConnection(key)
+    return _connections[key]
+
+def subscribe(key, channel_name, event, callback, owner=None):
+    '''
+    Subscribes callback to event on channel_name of the app key's shared
+    connection, and returns the connection
+    '''
+    with _connections_lock:
+        connection = _get_connection(key)
+        connection.subscribe(channel_name, event, callback, owner)
+        return connection
+
+def release_connection(connection, channel_name, owner=None):
+    '''
+    Unsubscribes owner from channel_name and disconnects once no channels
+    are left
+    '''
+    with _connections_lock:
+        if not connection.unsubscribe(channel_name, owner):
+            if _connections.get(connection.key) is connection:
+                del _connections[connection.key]
+            connection.disconnect()
+
 class PusherClientInterface(object):
 
     def __init__(self):
@@ -37,14 +134,13 @@ class PusherClientInterface(object):
         if channel in self.channels:
             self.close(channel)
 
-        self.channels[channel] = PusherConnection(key, channel, event, callback)
+        self.channels[channel] = subscribe(key, channel, event, callback, self)
 
     def close(self, channel=None):
         if channel is None:
-            for channel in self.channels.values():
-                channel.disconnect()
+            for channel, connection in self.channels.items():
+                release_connection(connection, channel, self)
 
             self.channels = {}
         else:
-            self.channels[channel].disconnect()
-            self.channels.pop(channel)
+            release_connection(self.channels.pop(channel), channel, self)
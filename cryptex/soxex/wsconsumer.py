@@ -13,8 +13,12 @@ class WebSocketConsumer(object):
         self.socket = None
         self.is_open = False
         self.backlog = []
+        self.manager = None
 
     def start_socket(self, url):
+        if self.manager is not None:
+            return self._start_managed_socket(url)
+
         def on_message(ws, data):
             self.message_callback(json.loads(data))
 
@@ -45,6 +49,20 @@ class WebSocketConsumer(object):
 
         thread.start_new_thread(run, ())
 
+    def _start_managed_socket(self, url):
+        '''
+        Runs the connection on self.manager, a
+        cryptex.soxex.multiplexer.SocketManager, instead of its own thread
+        '''
+        self.socket = self.manager.add(
+            url, lambda data: self.message_callback(data))
+        self.is_open = True
+
+        backlog = self.backlog
+        self.backlog = []
+        for msg in backlog:
+            self.send_message(msg)
+
     def stop_socket(self):
         if self.socket is not None:
             self.socket.close()
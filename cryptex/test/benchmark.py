@@ -0,0 +1,340 @@
+'''
+Benchmarks of the parsing, normalization and P&L hot paths.
+
+    python -m cryptex.test.benchmark --sizes 1000 100000 --save baseline.json
+    python -m cryptex.test.benchmark --sizes 1000 100000 --compare baseline.json
+
+Every case runs in a fresh interpreter on synthetic payloads of size records,
+so that peak memory is measured per case. Results are kept as JSON of
+{"case/size": {"seconds": ..., "memory_kb": ..., "peak_rss_kb": ...}};
+seconds is the best of --repeat runs, memory_kb the growth of peak RSS during
+the timed part and peak_rss_kb the peak RSS of the whole run.
+Against a saved baseline, cases that take more than --tolerance longer or
+use more memory are reported and the exit status is 1.
+'''
+import argparse
+import datetime
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import pytz
+
+import cryptex.common as common
+
+SIZES = [10 ** 3, 10 ** 4, 10 ** 5]
+TOLERANCE = 0.2
+# Memory is compared with some slack, small cases barely move the peak
+MEMORY_SLACK_KB = 1024
+
+MARKETS = [('LTC', 'BTC'), ('DOGE', 'BTC'), ('FTC', 'BTC'), ('NMC', 'LTC')]
+START = datetime.datetime(2014, 1, 1, tzinfo=pytz.utc)
+
+
+def _server_time(i):
+    return (START + datetime.timedelta(seconds=i * 17)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _amount(i):
+    return '%.8f' % (1 + i % 997 / 7.0)
+
+
+def _price(i):
+    return '%.8f' % (0.01 + i % 113 / 10000.0)
+
+
+def cryptsy_trades_payload(size):
+    trades = [{
+        'tradeid': str(i + 1),
+        'tradetype': 'Buy' if i % 2 else 'Sell',
+        'datetime': _server_time(i),
+        'marketid': str(i % len(MARKETS) + 1),
+        'tradeprice': _price(i),
+        'quantity': _amount(i),
+        'fee': '0.00000100',
+        'initiate_ordertype': 'Buy',
+        'order_id': str(100000 + i),
+    } for i in xrange(size)]
+    return json.dumps({'success': '1', 'return': trades})
+
+
+def btce_trades_payload(size):
+    trades = {str(i + 1): {
+        'pair': '%s_%s' % tuple(c.lower() for c in MARKETS[i % len(MARKETS)]),
+        'type': 'buy' if i % 2 else 'sell',
+        'amount': float(_amount(i)),
+        'rate': float(_price(i)),
+        'order_id': 100000 + i,
+        'is_your_order': 1,
+        'timestamp': 1388534400 + i * 17,
+    } for i in xrange(size)}
+    return json.dumps({'success': 1, 'return': trades})
+
+
+def market_data_payload(size):
+    '''
+    marketdatav2 with size recent trades spread over the markets
+    '''
+    markets = {}
+    for index, market in enumerate(MARKETS):
+        count = size // len(MARKETS) + (index < size % len(MARKETS))
+        markets['%s/%s' % market] = {
+            'marketid': str(index + 1),
+            'label': '%s/%s' % market,
+            'lasttradeprice': _price(index),
+            'volume': _amount(index),
+            'lasttradetime': _server_time(count),
+            'primarycode': market[0],
+            'secondarycode': market[1],
+            'recenttrades': [{
+                'id': str(i + 1),
+                'time': _server_time(i),
+                'price': _price(i),
+                'quantity': _amount(i),
+                'total': _price(i),
+            } for i in xrange(count)],
+            'sellorders': [],
+            'buyorders': [],
+        }
+    return json.dumps({'success': '1', 'return': {'markets': markets}})
+
+
+def _decode(payload):
+    return json.loads(payload, parse_float=common.parse_float)['return']
+
+
+def _cryptsy():
+    from cryptex.exchange.cryptsy import Cryptsy
+    from cryptex.exchange.market_registry import MarketRegistry, MarketInfo
+    from cryptex.exchange.nonce import NonceAllocator
+    markets = [MarketInfo(str(i + 1), m[0], m[1]) for i, m in enumerate(MARKETS)]
+    return Cryptsy('key', 'secret', nonce=NonceAllocator(),
+                   registry=MarketRegistry(lambda: markets))
+
+
+class _PayloadAPI(object):
+    '''
+    Stands in for SingleEndpointAPI, decoding a prepared response body
+    '''
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def perform_request(self, method, data={}):
+        return _decode(self.payload)
+
+    def stream_request(self, method, data={}, path=()):
+        from cryptex.exchange.json_stream import iter_members
+        payload, size = self.payload, self.CHUNK_SIZE
+        chunks = (payload[i:i + size] for i in xrange(0, len(payload), size))
+        return iter_members(chunks, ('return',) + tuple(path),
+                            common.parse_float)
+
+
+class _History(object):
+    def __init__(self, trades, transactions):
+        self.trades = trades
+        self.transactions = transactions
+
+    def get_my_trades(self):
+        return self.trades
+
+    def get_my_transactions(self):
+        return self.transactions
+
+
+# Cases: name -> setup(size), which returns the function to time
+
+def setup_json_decode(size):
+    payload = cryptsy_trades_payload(size)
+    return lambda: _decode(payload)
+
+def setup_cryptsy_format_trades(size):
+    exchange = _cryptsy()
+    exchange.registry.markets()
+    trades = _decode(cryptsy_trades_payload(size))
+    return lambda: exchange._format_trades(trades)
+
+def setup_btce_format_trades(size):
+    from cryptex.exchange.btce import BTCE
+    trades = _decode(btce_trades_payload(size))
+    return lambda: BTCE._format_trades(trades)
+
+def setup_timestamps(size):
+    from cryptex.timestamps import ServerTimeConverter
+    strings = [_server_time(i) for i in xrange(size)]
+    timezone = pytz.timezone('EST')
+    # A fresh converter each run, so the offset cache starts out cold
+    return lambda: ServerTimeConverter(timezone).convert_many(strings)
+
+def setup_market_data(size):
+    from cryptex.exchange.cryptsy import CryptsyPublic
+    public = CryptsyPublic()
+    public.api = _PayloadAPI(market_data_payload(size))
+    return public.get_market_data
+
+def _streaming_public(size):
+    from cryptex.exchange.cryptsy import CryptsyPublic
+    public = CryptsyPublic()
+    public.api = _PayloadAPI(market_data_payload(size))
+    return public
+
+def setup_market_data_stream(size):
+    public = _streaming_public(size)
+    return lambda: list(public.iter_market_data())
+
+def setup_market_data_first(size):
+    '''
+    Time to the first market of a streamed response
+    '''
+    public = _streaming_public(size)
+    return lambda: next(public.iter_market_data())
+
+def setup_unrealized_pl(size):
+    from cryptex.pl_calculator import PLCalculator
+    from cryptex.trade import Buy, Sell
+    from cryptex.transaction import Deposit
+    trades = []
+    for i in xrange(size):
+        base, counter = MARKETS[i % len(MARKETS)]
+        # Two buys for every sell, so lots stay open
+        cls = Sell if i % 3 == 2 else Buy
+        trades.append(cls(str(i), base, counter,
+                          START + datetime.timedelta(seconds=i), str(i),
+                          common.number(_amount(i)), common.number(_price(i))))
+    transactions = [Deposit(str(i), START, currency, common.number(1000), '', None)
+                    for i, currency in enumerate(['LTC', 'DOGE', 'FTC', 'NMC'])]
+    calculator = PLCalculator(_History(trades, transactions))
+    return calculator.unrealized_pl
+
+CASES = {
+    'json_decode': setup_json_decode,
+    'cryptsy_format_trades': setup_cryptsy_format_trades,
+    'btce_format_trades': setup_btce_format_trades,
+    'timestamps': setup_timestamps,
+    'market_data': setup_market_data,
+    'market_data_stream': setup_market_data_stream,
+    'market_data_first': setup_market_data_first,
+    'unrealized_pl': setup_unrealized_pl,
+}
+
+
+def _peak_rss_kb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(case, size, repeat=3, backend=common.DECIMAL):
+    '''
+    Times one case in this process with the given common numeric backend;
+    returns {seconds, memory_kb, peak_rss_kb}
+    '''
+    common.set_backend(backend)
+    func = CASES[case](size)
+    before = _peak_rss_kb()
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        result = func()
+        elapsed = time.time() - start
+        del result
+        best = elapsed if best is None else min(best, elapsed)
+    peak = _peak_rss_kb()
+    return {'seconds': best, 'memory_kb': peak - before, 'peak_rss_kb': peak}
+
+
+def run_case(case, size, repeat=3, backend=common.DECIMAL):
+    '''
+    Measures one case in a fresh interpreter
+    '''
+    output = subprocess.check_output([
+        sys.executable, '-m', 'cryptex.test.benchmark',
+        '--measure', case, str(size), '--repeat', str(repeat),
+        '--backend', backend])
+    return json.loads(output)
+
+
+def run(cases=None, sizes=SIZES, repeat=3, report=None,
+        backend=common.DECIMAL):
+    '''
+    Returns {"case/size": measure() results}
+    '''
+    results = {}
+    for case in cases or sorted(CASES):
+        for size in sizes:
+            name = '%s/%d' % (case, size)
+            results[name] = run_case(case, size, repeat, backend)
+            if report is not None:
+                report(name, results[name])
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    '''
+    Returns [(name, metric, baseline value, new value)] of the results that
+    regressed against baseline. Cases missing from either side are skipped.
+    '''
+    regressions = []
+    for name, result in sorted(results.iteritems()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['seconds'] > base['seconds'] * (1 + tolerance):
+            regressions.append((name, 'seconds', base['seconds'],
+                                result['seconds']))
+        limit = base['memory_kb'] * (1 + tolerance) + MEMORY_SLACK_KB
+        if result['memory_kb'] > limit:
+            regressions.append((name, 'memory_kb', base['memory_kb'],
+                                result['memory_kb']))
+    return regressions
+
+
+def _print_result(name, result):
+    print '%-32s %10.4fs %10d kB' % (name, result['seconds'], result['memory_kb'])
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES),
+                        help='cases to run, default all')
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES,
+                        help='payload sizes in records, up to 10^7')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--backend', choices=(common.DECIMAL, common.FIXED),
+                        default=common.DECIMAL, help='numeric backend')
+    parser.add_argument('--save', metavar='PATH',
+                        help='write the results to PATH as a baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='flag regressions against the baseline at PATH')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--measure', nargs=2, metavar=('CASE', 'SIZE'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        case, size = args.measure
+        print json.dumps(measure(case, int(size), args.repeat, args.backend))
+        return 0
+
+    results = run(args.cases, args.sizes, args.repeat, _print_result,
+                  args.backend)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print 'REGRESSION %s %s: %s -> %s' % (name, metric, old, new)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
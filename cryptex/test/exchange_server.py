@@ -0,0 +1,481 @@
+'''
+Local stand-in for the Cryptsy and BTC-e HTTP APIs.
+
+Serves synthetic responses of a configurable size, checks signatures and
+nonces of private calls the way the exchanges do, and injects latency and
+errors. Point clients at it by replacing their endpoint:
+
+    server = ExchangeServer(CRYPTSY, keys={'key': 'secret'}, size=1000)
+    server.start()
+    exchange = Cryptsy('key', 'secret')
+    exchange.api.base_url = server.private_url
+'''
+import hashlib
+import hmac
+import json
+import random
+import threading
+import time
+import urlparse
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+CRYPTSY = 'cryptsy'
+BTCE = 'btce'
+
+CURRENCIES = ['BTC', 'LTC', 'DOGE', 'FTC', 'NMC', 'PPC', 'XPM', 'TRC']
+COUNTERS = ['BTC', 'LTC']
+# Cryptsy's server time lags UTC by 5 hours
+SERVER_OFFSET = -5 * 3600
+START_TIME = 1388534400
+
+
+def _markets():
+    markets = []
+    for counter in COUNTERS:
+        for base in CURRENCIES:
+            if base != counter:
+                markets.append((base, counter))
+    return markets
+
+
+class _Generator(object):
+    '''
+    Synthetic payloads with size records each
+    '''
+    def __init__(self, size, seed):
+        self.size = size
+        self.random = random.Random(seed)
+        self.markets = _markets()
+        self.lock = threading.Lock()
+
+    def price(self):
+        with self.lock:
+            return '%.8f' % self.random.uniform(0.000001, 0.05)
+
+    def amount(self):
+        with self.lock:
+            return '%.8f' % self.random.uniform(0.01, 10000)
+
+    def choice(self, items):
+        with self.lock:
+            return self.random.choice(items)
+
+    @staticmethod
+    def server_time(i):
+        return time.strftime('%Y-%m-%d %H:%M:%S',
+                             time.gmtime(START_TIME + SERVER_OFFSET + i * 60))
+
+    # Cryptsy
+
+    def cryptsy_market_id(self, market):
+        return str(self.markets.index(market) + 1)
+
+    def cryptsy_getmarkets(self, params):
+        return [{
+            'marketid': self.cryptsy_market_id(m),
+            'label': '%s/%s' % m,
+            'primary_currency_code': m[0],
+            'secondary_currency_code': m[1],
+            'last_trade': self.price(),
+        } for m in self.markets]
+
+    def cryptsy_getinfo(self, params):
+        return {
+            'balances_available': {c: self.amount() for c in CURRENCIES},
+            'balances_hold': {},
+            'servertimestamp': int(time.time()),
+            'servertimezone': 'EST',
+            'serverdatetime': self.server_time(0),
+            'openordercount': self.size,
+        }
+
+    def cryptsy_trade(self, i, market_id=None):
+        market = self.choice(self.markets)
+        trade_type = self.choice(['Buy', 'Sell'])
+        return {
+            'tradeid': str(i + 1),
+            'tradetype': trade_type,
+            'datetime': self.server_time(i),
+            'marketid': market_id or self.cryptsy_market_id(market),
+            'tradeprice': self.price(),
+            'quantity': self.amount(),
+            'fee': '0.00000100',
+            'initiate_ordertype': trade_type,
+            'order_id': str(100000 + i),
+        }
+
+    def cryptsy_allmytrades(self, params):
+        return [self.cryptsy_trade(i) for i in xrange(self.size)]
+
+    def cryptsy_mytrades(self, params):
+        return [self.cryptsy_trade(i, params.get('marketid'))
+                for i in xrange(self.size)]
+
+    def cryptsy_order(self, i, market_id=None):
+        return {
+            'orderid': str(200000 + i),
+            'marketid': market_id or self.cryptsy_market_id(self.choice(self.markets)),
+            'created': self.server_time(i),
+            'ordertype': self.choice(['Buy', 'Sell']),
+            'price': self.price(),
+            'quantity': self.amount(),
+        }
+
+    def cryptsy_allmyorders(self, params):
+        return [self.cryptsy_order(i) for i in xrange(self.size)]
+
+    def cryptsy_myorders(self, params):
+        return [{k: v for k, v in self.cryptsy_order(i).iteritems()
+                 if k != 'marketid'} for i in xrange(self.size)]
+
+    def cryptsy_mytransactions(self, params):
+        return [{
+            'currency': self.choice(CURRENCIES),
+            'timestamp': START_TIME + i * 60,
+            'datetime': self.server_time(i),
+            'timezone': 'EST',
+            'type': self.choice(['Deposit', 'Withdrawal']),
+            'address': 'address%d' % i,
+            'amount': self.amount(),
+            'fee': '0.00000000',
+            'trxid': 'trx%d' % i,
+        } for i in xrange(self.size)]
+
+    def cryptsy_marketorders(self, params):
+        return {
+            'sellorders': [{'sellprice': self.price(), 'quantity': self.amount()}
+                           for _ in xrange(self.size)],
+            'buyorders': [{'buyprice': self.price(), 'quantity': self.amount()}
+                          for _ in xrange(self.size)],
+        }
+
+    def cryptsy_markettrades(self, params):
+        return [{
+            'tradeid': str(i + 1),
+            'datetime': self.server_time(i),
+            'tradeprice': self.price(),
+            'quantity': self.amount(),
+            'initiate_ordertype': self.choice(['Buy', 'Sell']),
+        } for i in xrange(self.size)]
+
+    def cryptsy_cancelorder(self, params):
+        return 'Your order #%s has been cancelled.' % params.get('orderid')
+
+    def cryptsy_cancelallorders(self, params):
+        return ['Order #%d has been cancelled.' % (200000 + i)
+                for i in xrange(self.size)]
+
+    cryptsy_cancelmarketorders = cryptsy_cancelallorders
+
+    def cryptsy_createorder(self, params):
+        return {'orderid': '300000', 'moreinfo': 'Your order has been placed.'}
+
+    def cryptsy_market_data(self, market):
+        base, counter = market
+        orders = self.cryptsy_marketorders({})
+        return {
+            'marketid': self.cryptsy_market_id(market),
+            'label': '%s/%s' % market,
+            'lasttradeprice': self.price(),
+            'volume': self.amount(),
+            'lasttradetime': self.server_time(0),
+            'primaryname': base,
+            'primarycode': base,
+            'secondaryname': counter,
+            'secondarycode': counter,
+            'recenttrades': [{
+                'id': str(i + 1),
+                'time': self.server_time(i),
+                'price': self.price(),
+                'quantity': self.amount(),
+                'total': self.price(),
+            } for i in xrange(self.size)],
+            'sellorders': [{'price': o['sellprice'], 'quantity': o['quantity'],
+                            'total': o['sellprice']}
+                           for o in orders['sellorders']],
+            'buyorders': [{'price': o['buyprice'], 'quantity': o['quantity'],
+                           'total': o['buyprice']}
+                          for o in orders['buyorders']],
+        }
+
+    def cryptsy_marketdatav2(self, params):
+        return {'markets': {'%s/%s' % m: self.cryptsy_market_data(m)
+                            for m in self.markets}}
+
+    def cryptsy_orderdata(self, params):
+        data = {}
+        for m in self.markets:
+            market = self.cryptsy_market_data(m)
+            data['%s/%s' % m] = {k: market[k] for k in (
+                'marketid', 'label', 'primaryname', 'primarycode',
+                'secondaryname', 'secondarycode', 'sellorders', 'buyorders')}
+        return data
+
+    # BTC-e
+
+    @staticmethod
+    def btce_pair(market):
+        return '%s_%s' % (market[0].lower(), market[1].lower())
+
+    def btce_getInfo(self, params):
+        return {
+            'funds': {c.lower(): float(self.amount()) for c in CURRENCIES},
+            'rights': {'info': 1, 'trade': 1, 'withdraw': 0},
+            'transaction_count': self.size,
+            'open_orders': self.size,
+            'server_time': int(time.time()),
+        }
+
+    def _btce_page(self, params, record):
+        from_id = int(params.get('from_id', 0))
+        count = int(params.get('count', 1000))
+        ids = range(max(from_id, 1), self.size + 1)[:count]
+        return {str(i): record(i) for i in ids}
+
+    def btce_TradeHistory(self, params):
+        return self._btce_page(params, lambda i: {
+            'pair': self.btce_pair(self.choice(self.markets)),
+            'type': self.choice(['buy', 'sell']),
+            'amount': float(self.amount()),
+            'rate': float(self.price()),
+            'order_id': 100000 + i,
+            'is_your_order': 1,
+            'timestamp': START_TIME + i * 60,
+        })
+
+    def btce_TransHistory(self, params):
+        return self._btce_page(params, lambda i: {
+            'type': self.choice([1, 2]),
+            'amount': float(self.amount()),
+            'currency': self.choice(CURRENCIES),
+            'desc': 'BTC Payment to address address%d' % i,
+            'status': 2,
+            'timestamp': START_TIME + i * 60,
+        })
+
+    def btce_ActiveOrders(self, params):
+        return {str(200000 + i): {
+            'pair': self.btce_pair(self.choice(self.markets)),
+            'type': self.choice(['buy', 'sell']),
+            'amount': float(self.amount()),
+            'rate': float(self.price()),
+            'timestamp_created': START_TIME + i * 60,
+            'status': 0,
+        } for i in xrange(self.size)}
+
+    def btce_Trade(self, params):
+        return {'received': 0, 'remains': float(params.get('amount', 0)),
+                'order_id': 300000, 'funds': {}}
+
+    def btce_CancelOrder(self, params):
+        return {'order_id': int(params.get('order_id', 0)), 'funds': {}}
+
+    def btce_public(self, method, pairs, params):
+        limit = int(params.get('limit', 150))
+        if method == 'info':
+            return {
+                'server_time': int(time.time()),
+                'pairs': {self.btce_pair(m): {
+                    'decimal_places': 8,
+                    'min_price': 0.00000001,
+                    'max_price': 10000,
+                    'min_amount': 0.01,
+                    'hidden': 0,
+                    'fee': 0.2,
+                } for m in self.markets},
+            }
+        result = {}
+        for pair in pairs:
+            if method == 'ticker':
+                result[pair] = {
+                    'high': float(self.price()), 'low': float(self.price()),
+                    'avg': float(self.price()), 'vol': float(self.amount()),
+                    'vol_cur': float(self.amount()), 'last': float(self.price()),
+                    'buy': float(self.price()), 'sell': float(self.price()),
+                    'updated': int(time.time()),
+                }
+            elif method == 'depth':
+                result[pair] = {
+                    'asks': [[float(self.price()), float(self.amount())]
+                             for _ in xrange(min(limit, self.size))],
+                    'bids': [[float(self.price()), float(self.amount())]
+                             for _ in xrange(min(limit, self.size))],
+                }
+            elif method == 'trades':
+                result[pair] = [{
+                    'type': self.choice(['bid', 'ask']),
+                    'price': float(self.price()),
+                    'amount': float(self.amount()),
+                    'tid': i + 1,
+                    'timestamp': START_TIME + i * 60,
+                } for i in xrange(min(limit, self.size))]
+            else:
+                return None
+        return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, content, status=200):
+        body = json.dumps(content)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.exchange._handle_get(self)
+
+    def do_POST(self):
+        self.server.exchange._handle_post(self)
+
+
+class _HTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class ExchangeServer(object):
+    '''
+    Emulates the endpoints of one exchange, CRYPTSY or BTCE, on localhost
+
+    :param keys: {api key: secret} accepted for private calls
+    :param size: number of records in list responses
+    :param latency: seconds added to every response
+    :param jitter: random extra latency of up to this many seconds
+    :param error_rate: fraction of calls answered with an API error
+    '''
+    def __init__(self, exchange, keys=None, size=20, latency=0, jitter=0,
+                 error_rate=0, seed=0, port=0):
+        if exchange not in (CRYPTSY, BTCE):
+            raise ValueError('Unknown exchange "%s"' % exchange)
+        self.exchange = exchange
+        self.keys = keys or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.generator = _Generator(size, seed)
+        self.random = random.Random(seed)
+        self.nonces = {}
+        self.stats = {'requests': 0, 'errors': 0, 'bad_signatures': 0,
+                      'bad_nonces': 0}
+        self._lock = threading.Lock()
+        self._server = _HTTPServer(('127.0.0.1', port), _Handler)
+        self._server.exchange = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:%d' % self._server.server_address[1]
+
+    @property
+    def private_url(self):
+        '''
+        Replacement for SingleEndpointAPI.base_url of the private API
+        '''
+        return self.base_url + ('/api' if self.exchange == CRYPTSY else '/tapi')
+
+    @property
+    def public_url(self):
+        '''
+        Replacement for the CryptsyPublic endpoint or BTCEPublic.URL_ROOT
+        '''
+        if self.exchange == CRYPTSY:
+            return self.base_url + '/api.php'
+        return self.base_url + '/api/3/'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def _delay(self):
+        with self._lock:
+            self.stats['requests'] += 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            fail = self.error_rate and self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.stats['errors'] += 1
+        return fail
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _call(self, method, params):
+        handler = getattr(self.generator, '%s_%s' % (self.exchange, method), None)
+        if handler is None:
+            return {'success': 0, 'error': 'Invalid method'}
+        result = handler(params)
+        if self.exchange == CRYPTSY and method == 'createorder':
+            # Cryptsy answers createorder without a "return" member
+            return dict(result, success='1')
+        success = '1' if self.exchange == CRYPTSY else 1
+        return {'success': success, 'return': result}
+
+    def _check_auth(self, request, body, params):
+        '''
+        Returns an error response for a bad key, signature or nonce
+        '''
+        key = request.headers.get('Key')
+        secret = self.keys.get(key)
+        signature = hmac.new(secret or '', body, hashlib.sha512).hexdigest()
+        if secret is None or signature != request.headers.get('Sign'):
+            self._count('bad_signatures')
+            return {'success': 0, 'error': 'Invalid API key or signature'}
+        try:
+            nonce = int(params.get('nonce'))
+        except (TypeError, ValueError):
+            nonce = 0
+        with self._lock:
+            last = self.nonces.get(key, 0)
+            if nonce <= last:
+                self.stats['bad_nonces'] += 1
+                return {'success': 0, 'error': (
+                    'invalid nonce parameter; on key:%d, you sent:%d'
+                    % (last, nonce))}
+            self.nonces[key] = nonce
+        return None
+
+    def _handle_post(self, request):
+        length = int(request.headers.get('Content-Length', 0))
+        body = request.rfile.read(length)
+        params = dict(urlparse.parse_qsl(body))
+        error = self._check_auth(request, body, params)
+        if error is None and self._delay():
+            error = {'success': 0, 'error': 'Injected error'}
+        request._reply(error or self._call(params.get('method'), params))
+
+    def _handle_get(self, request):
+        url = urlparse.urlparse(request.path)
+        params = dict(urlparse.parse_qsl(url.query))
+        if self._delay():
+            return request._reply({'success': 0, 'error': 'Injected error'})
+        if self.exchange == CRYPTSY:
+            return request._reply(self._call(params.get('method'), params))
+        parts = url.path.strip('/').split('/')
+        method = parts[2] if len(parts) > 2 else None
+        pairs = parts[3].split('-') if len(parts) > 3 else []
+        result = self.generator.btce_public(method, pairs, params)
+        if result is None:
+            return request._reply({'success': 0, 'error': 'Invalid method'})
+        request._reply(result)
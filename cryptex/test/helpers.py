@@ -0,0 +1,31 @@
+import collections
+import datetime
+
+import pytz
+
+from cryptex.exchange.simulated import SimulatedExchange
+
+
+def utc(*args):
+    return datetime.datetime(*args, tzinfo=pytz.utc)
+
+
+class CountingExchange(SimulatedExchange):
+    """
+    SimulatedExchange that counts the calls of the account state getters
+    """
+    def __init__(self, *args, **kwargs):
+        self.calls = collections.Counter()
+        super(CountingExchange, self).__init__(*args, **kwargs)
+
+    def get_my_balances(self):
+        self.calls['get_my_balances'] += 1
+        return super(CountingExchange, self).get_my_balances()
+
+    def get_my_open_orders(self):
+        self.calls['get_my_open_orders'] += 1
+        return super(CountingExchange, self).get_my_open_orders()
+
+    def get_my_new_trades(self, last_trade=None):
+        self.calls['get_my_new_trades'] += 1
+        return super(CountingExchange, self).get_my_new_trades(last_trade)
@@ -0,0 +1,143 @@
+'''
+Load driver for the API clients against a local ExchangeServer.
+
+    python -m cryptex.test.load_driver --size 200 --latency 0.01
+
+Reports requests per second and p50/p99 latency of SingleEndpointAPI and the
+Cryptsy and BTC-e exchange classes at increasing concurrency. Errors of
+signed calls at higher concurrency are mostly nonce races that ran out of
+SingleEndpointAPI.NONCE_RETRIES, as they would against the real exchanges.
+'''
+import argparse
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from cryptex.exchange.single_endpoint import SingleEndpointAPI
+from cryptex.exchange.nonce import NonceAllocator
+from cryptex.exchange.cryptsy import Cryptsy
+from cryptex.exchange.btce import BTCE
+from cryptex.test.exchange_server import ExchangeServer, CRYPTSY, BTCE as BTCE_SERVER
+
+KEY = 'load-key'
+SECRET = 'load-secret'
+CONCURRENCY = [1, 2, 4, 8, 16]
+
+
+def percentile(values, fraction):
+    '''
+    Nearest-rank percentile of sorted values
+    '''
+    if not values:
+        return None
+    index = int(round(fraction * (len(values) - 1)))
+    return values[index]
+
+
+def run_load(call, concurrency, requests):
+    '''
+    Runs call() requests times on concurrency threads and returns
+    {concurrency, requests, errors, throughput, p50, p99}, times in seconds
+    '''
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def timed(_):
+        start = time.time()
+        try:
+            call()
+        except Exception:
+            with lock:
+                errors[0] += 1
+            return
+        elapsed = time.time() - start
+        with lock:
+            latencies.append(elapsed)
+
+    pool = ThreadPool(concurrency)
+    try:
+        start = time.time()
+        pool.map(timed, xrange(requests))
+        elapsed = time.time() - start
+    finally:
+        pool.close()
+        pool.join()
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': errors[0],
+        'throughput': requests / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+    }
+
+
+def cryptsy_cases(server, nonce):
+    api = SingleEndpointAPI(server.private_url, KEY, SECRET, nonce=nonce)
+    exchange = Cryptsy(KEY, SECRET, nonce=nonce)
+    exchange.api.base_url = server.private_url
+    return [
+        ('SingleEndpointAPI.getinfo', lambda: api.perform_request('getinfo')),
+        ('Cryptsy.get_my_trades', exchange.get_my_trades),
+        ('Cryptsy.get_my_open_orders', exchange.get_my_open_orders),
+    ]
+
+
+def btce_cases(server, nonce):
+    exchange = BTCE(KEY, SECRET, nonce=nonce)
+    exchange.api.base_url = server.private_url
+    exchange.public.URL_ROOT = server.public_url
+    return [
+        ('BTCE.get_my_trades', exchange.get_my_trades),
+        ('BTCE.get_my_open_orders', exchange.get_my_open_orders),
+    ]
+
+
+def run(size=20, latency=0, error_rate=0, requests=200,
+        concurrency=CONCURRENCY, report=None):
+    '''
+    Drives every case at each concurrency and returns
+    {case name: [run_load results]}
+    '''
+    results = {}
+    for flavor, cases in ((CRYPTSY, cryptsy_cases), (BTCE_SERVER, btce_cases)):
+        server = ExchangeServer(flavor, keys={KEY: SECRET}, size=size,
+                                latency=latency, error_rate=error_rate)
+        with server:
+            # Clients of one key must share its nonces
+            for name, call in cases(server, NonceAllocator()):
+                for c in concurrency:
+                    result = run_load(call, c, requests)
+                    results.setdefault(name, []).append(result)
+                    if report is not None:
+                        report(name, result)
+    return results
+
+
+def _print_result(name, result):
+    print '%-30s %4d %9.1f/s %8.2fms %8.2fms %5d errors' % (
+        name, result['concurrency'], result['throughput'],
+        (result['p50'] or 0) * 1000, (result['p99'] or 0) * 1000,
+        result['errors'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--size', type=int, default=20,
+                        help='records per list response')
+    parser.add_argument('--latency', type=float, default=0,
+                        help='seconds of injected server latency')
+    parser.add_argument('--error-rate', type=float, default=0,
+                        help='fraction of calls that fail')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='requests per case and concurrency')
+    args = parser.parse_args()
+    print '%-30s %4s %11s %10s %10s' % ('case', 'conc', 'throughput', 'p50', 'p99')
+    run(args.size, args.latency, args.error_rate, args.requests,
+        report=_print_result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+from decimal import Decimal
+import threading
+import unittest
+
+from cryptex.exchange import Cryptsy
+from cryptex.exchange.async_exchange import (AsyncExchange,
+                                             AsyncSingleEndpointAPI, gather)
+from cryptex.exception import APIException
+from cryptex.test.test_cryptsy import cryptsy_mock
+
+class TestAsyncExchange(unittest.TestCase):
+
+    def test_gather(self):
+        responses = {
+            'getinfo': 'get_info.json',
+            'allmyorders': 'all_my_orders_empty.json',
+        }
+        with cryptsy_mock(responses):
+            # httpretty's fake sockets are not thread-safe, so the two
+            # calls must not overlap
+            c = AsyncExchange(Cryptsy('key', 'secret'), signed_concurrency=1)
+            balances, orders = gather(c.get_my_balances(),
+                                      c.get_my_open_orders())
+        self.assertEqual(balances['DOGE'], Decimal('42561.89842537'))
+        self.assertEqual(orders, [])
+
+    def test_error_is_raised_on_get(self):
+        responses = {
+            'cancelorder': 'cancel_order_failure.json',
+        }
+        with cryptsy_mock(responses):
+            c = AsyncExchange(Cryptsy('key', 'secret'))
+            result = c.cancel_order(u'12345')
+            self.assertRaises(APIException, result.get, 5)
+
+    def test_signed_calls_overlap(self):
+        started = threading.Semaphore(0)
+        release = threading.Event()
+
+        class API(object):
+            authenticated = True
+            key = 'overlap'
+
+            def perform_request(self, method, data={}):
+                started.release()
+                release.wait(5)
+                return method
+
+        api = AsyncSingleEndpointAPI(API(), signed_concurrency=2)
+        first = api.perform_request('getinfo')
+        second = api.perform_request('allmyorders')
+        for _ in range(2):
+            started.acquire()
+        release.set()
+        self.assertEqual(gather(first, second, timeout=5),
+                         ['getinfo', 'allmyorders'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import calendar
+from decimal import Decimal
+import unittest
+
+from cryptex.exchange import Exchange
+from cryptex.exchange.balance_cache import BalanceCache
+from cryptex.exchange.exchange import ExchangeListener
+from cryptex.exchange.simulated import FeeModel
+from cryptex.order import BuyOrder
+from cryptex.test.helpers import utc, CountingExchange
+
+MARKET = ('LTC', 'BTC')
+
+class RawExchange(Exchange):
+    '''
+    Takes orders as given, like the live adapters pass them to the API
+    '''
+    def __init__(self):
+        self.during_fetch = None
+
+    def buy(self, market, quantity, price):
+        return self._order_placed(BuyOrder, market, quantity, price, '1')
+
+    def get_my_balances(self):
+        if self.during_fetch is not None:
+            self.during_fetch()
+        return {'BTC': Decimal('1')}
+
+class FailingListener(ExchangeListener):
+    def order_placed(self, exchange, order, balances=None):
+        raise ValueError('listener failed')
+
+class TestBalanceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = CountingExchange(
+            {'BTC': Decimal('1'), 'LTC': Decimal('10')},
+            FeeModel(Decimal('0.002'), Decimal('0.003')),
+            clock=utc(2014, 4, 1))
+        self.exchange.trade(MARKET, Decimal('0.02'), Decimal('1'),
+                            utc(2014, 4, 1, 0, 1))
+        clock = lambda: calendar.timegm(self.exchange.now.utctimetuple())
+        self.cache = BalanceCache(self.exchange, max_age=3600,
+                                  fee_rate=Decimal('0.003'), clock=clock)
+
+    def assertInSync(self, fetched=False):
+        fetches = self.exchange.calls['get_my_balances']
+        balances = self.cache.get_my_balances()
+        self.assertEqual(self.exchange.calls['get_my_balances'], fetches + fetched)
+        self.assertEqual(balances, self.exchange.get_my_balances())
+
+    def test_orders_and_fills_are_booked_locally(self):
+        ex, cache = self.exchange, self.cache
+        self.assertEqual(cache.get_my_balances()['BTC'], Decimal('1'))
+        self.assertEqual(ex.calls['get_my_balances'], 1)
+
+        buy = ex.buy(MARKET, Decimal('10'), Decimal('0.02'))
+        ex.sell(MARKET, Decimal('4'), Decimal('0.03'))
+        self.assertEqual(cache.get_my_balances(),
+                         {'BTC': Decimal('0.7994'), 'LTC': Decimal('6')})
+        self.assertInSync()
+
+        ex.trade(MARKET, Decimal('0.02'), Decimal('4'), utc(2014, 4, 1, 0, 2))
+        ex.trade(MARKET, Decimal('0.03'), Decimal('1'), utc(2014, 4, 1, 0, 3))
+        ex.get_my_trades()
+        ex.get_my_trades()
+        ex.cancel_order(buy)
+        self.assertInSync()
+        self.assertEqual(cache.last_drift, {})
+        self.assertEqual(cache.stats()['open_orders'], 1)
+
+        ex.deposit('BTC', Decimal('2'))
+        ex.withdraw('LTC', Decimal('1'))
+        ex.get_my_transactions()
+        self.assertInSync()
+        self.assertEqual(cache.last_drift, {})
+
+    def test_reconciles_when_stale(self):
+        ex, cache = self.exchange, self.cache
+        cache.get_my_balances()
+        # Not seen by the cache
+        ex.deposit('BTC', Decimal('1'))
+        cache.get_my_balances()
+        self.assertEqual(ex.calls['get_my_balances'], 1)
+
+        ex.trade(MARKET, Decimal('0.02'), Decimal('1'), utc(2014, 4, 1, 2))
+        self.assertEqual(cache.get_my_balances()['BTC'], Decimal('2'))
+        self.assertEqual(ex.calls['get_my_balances'], 2)
+        self.assertEqual(cache.last_drift, {'BTC': Decimal('1')})
+
+    def test_unknown_events_mark_dirty(self):
+        ex, cache = self.exchange, self.cache
+        cache.get_my_balances()
+        ex.remove_listener(cache)
+        order_id = ex.buy(MARKET, Decimal('1'), Decimal('0.02'))
+        ex.add_listener(cache)
+        ex.cancel_order(order_id)
+        self.assertTrue(cache.stats()['dirty'])
+        self.assertInSync(fetched=True)
+
+    def test_reported_balances_replace_local_state(self):
+        cache = self.cache
+        cache.get_my_balances()
+        cache.order_cancelled(self.exchange, '7', {'BTC': Decimal('3')})
+        self.assertEqual(cache.get_my_balances(), {'BTC': Decimal('3')})
+        self.assertEqual(self.exchange.calls['get_my_balances'], 1)
+
+    def test_order_arguments_are_normalized(self):
+        ex = RawExchange()
+        cache = BalanceCache(ex)
+        cache.get_my_balances()
+        ex.buy(MARKET, '0.5', '0.02')
+        ex.buy(MARKET, 1, 0.02)
+        self.assertEqual(cache.balances, {'BTC': Decimal('0.97')})
+
+    def test_failing_listener_does_not_fail_the_order(self):
+        ex = RawExchange()
+        ex.add_listener(FailingListener())
+        cache = BalanceCache(ex)
+        cache.get_my_balances()
+        self.assertEqual(ex.buy(MARKET, Decimal('1'), Decimal('0.02')), '1')
+        self.assertEqual(cache.balances, {'BTC': Decimal('0.98')})
+
+    def test_orders_during_first_fetch_are_kept(self):
+        ex = RawExchange()
+        cache = BalanceCache(ex)
+        ex.during_fetch = lambda: ex.buy(MARKET, Decimal('1'), Decimal('0.02'))
+        self.assertEqual(cache.get_my_balances(), {'BTC': Decimal('0.98')})
@@ -0,0 +1,72 @@
+from datetime import datetime
+from decimal import Decimal
+import unittest
+
+import pytz
+
+from cryptex.trade import Buy, Sell
+from cryptex.transaction import Deposit, Withdrawal
+import cryptex.common as common
+
+try:
+    from cryptex.batch import TradeBatch, TransactionBatch
+except ImportError:
+    TradeBatch = None
+
+T0 = datetime(2014, 3, 2, 9, 4, 29, tzinfo=pytz.utc)
+
+@unittest.skipIf(TradeBatch is None, 'numpy is not installed')
+class TestTradeBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.trades = [
+            Buy(u'1', u'DOGE', u'BTC', T0, u'10', Decimal('62661.89842537'),
+                Decimal('0.00000180'), Decimal('0.00022558'), u'BTC'),
+            Sell(u'2', u'BTC', u'USD', T0, u'11', Decimal('1500.5'),
+                 Decimal('912.34567891'), Decimal('2.5'), u'USD'),
+            Buy(u'3', u'LTC', u'BTC', T0, u'12', Decimal('2'),
+                Decimal('0.02'), Decimal('0.01'), u'LTC'),
+            Sell(u'4', u'LTC', u'BTC', T0, None, Decimal('1'), Decimal('0')),
+        ]
+        self.batch = TradeBatch.from_trades(self.trades)
+
+    def test_round_trip(self):
+        for original, copy in zip(self.trades, self.batch.to_trades()):
+            self.assertEqual(type(original), type(copy))
+            for attr in ('trade_id', 'base_currency', 'counter_currency',
+                         'datetime', 'order_id', 'amount', 'price', 'fee',
+                         'fee_currency'):
+                self.assertEqual(getattr(original, attr), getattr(copy, attr))
+
+    def test_netto_matches_trade_methods(self):
+        amounts = self.batch.netto_amount()
+        totals = self.batch.netto_total()
+        for i, t in enumerate(self.trades):
+            self.assertEqual(common.from_fixed(amounts[i]), t.netto_amount())
+            self.assertEqual(common.from_fixed(totals[i]), t.netto_total())
+
+    def test_aggregates(self):
+        transactions = TransactionBatch.from_transactions([
+            Deposit(u'a', T0, u'LTC', Decimal('5'), u'', Decimal('0')),
+            Withdrawal(u'b', T0, u'LTC', Decimal('0.5'), u'addr'),
+        ])
+        positions = self.batch.positions(transactions)
+        self.assertEqual(positions[(u'LTC', u'BTC')], Decimal('5.5'))
+        self.assertEqual(positions[(u'BTC', u'USD')], Decimal('-1500.5'))
+
+        totals = self.batch.totals()[(u'LTC', u'BTC')]
+        self.assertEqual(totals['bought'], Decimal('2'))
+        self.assertEqual(totals['sold'], Decimal('1'))
+        self.assertEqual(totals['cost'], Decimal('0.04'))
+
+        fees = self.batch.fees()
+        self.assertEqual(fees[u'LTC'], Decimal('0.01'))
+        self.assertEqual(fees[u'USD'], Decimal('2.5'))
+
+    def test_select_market(self):
+        ltc = self.batch.select(self.batch.market_mask((u'LTC', u'BTC')))
+        self.assertEqual(list(ltc.trade_id), [u'3', u'4'])
+        self.assertEqual(len(self.batch.select(self.batch.market_mask(('X', 'Y')))), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+from cryptex.test import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_cases_run(self):
+        for case in benchmark.CASES:
+            result = benchmark.measure(case, 20, repeat=1)
+            self.assertTrue(result['seconds'] >= 0, case)
+            self.assertTrue(result['peak_rss_kb'] > 0, case)
+
+    def test_run_case_in_subprocess(self):
+        results = benchmark.run(['timestamps'], [10], repeat=1)
+        self.assertEqual(results.keys(), ['timestamps/10'])
+
+    def test_compare(self):
+        baseline = {
+            'a/10': {'seconds': 1.0, 'memory_kb': 1000},
+            'b/10': {'seconds': 1.0, 'memory_kb': 1000},
+        }
+        results = {
+            'a/10': {'seconds': 1.1, 'memory_kb': 1100},
+            'b/10': {'seconds': 1.5, 'memory_kb': 5000},
+            'c/10': {'seconds': 9.0, 'memory_kb': 9000},
+        }
+        self.assertEqual(benchmark.compare(results, baseline), [
+            ('b/10', 'seconds', 1.0, 1.5),
+            ('b/10', 'memory_kb', 1000, 5000),
+        ])
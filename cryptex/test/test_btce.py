@@ -0,0 +1,78 @@
+import os
+from datetime import datetime
+from decimal import Decimal
+import unittest
+
+import pytz
+
+from cryptex.test.api_mock import APIMock
+from cryptex.exchange import BTCE
+from cryptex.trade import Buy, build_trades
+import cryptex.trade
+import cryptex.order
+import cryptex.transaction
+
+def btce_mock(responses):
+    test_dir = os.path.dirname(os.path.realpath(__file__))
+    mock_dir = os.path.join(test_dir, 'mocks', 'btce')
+    return APIMock("https://btc-e.com/tapi", mock_dir, responses)
+
+class TestBTCEPrivate(unittest.TestCase):
+
+    def test_trades(self):
+        responses = {
+            'TradeHistory': 'trade_history.json',
+        }
+        with btce_mock(responses):
+            trades = BTCE('key', 'secret').get_my_trades()
+        trade = [t for t in trades if t.trade_id == u'20292389'][0]
+        self.assertTrue(isinstance(trade, cryptex.trade.Buy))
+        self.assertFalse(hasattr(trade, '__dict__'))
+        self.assertEqual(trade.order_id, '84290005')
+        self.assertEqual(trade.base_currency, u'LTC')
+        self.assertEqual(trade.counter_currency, u'BTC')
+        self.assertEqual(trade.datetime, datetime(2013, 12, 12, 6, 39, 31, tzinfo=pytz.utc))
+        self.assertEqual(trade.amount, Decimal('1.67577'))
+        self.assertEqual(trade.price, Decimal('0.03505'))
+        self.assertEqual(trade.fee, None)
+
+    def test_open_orders(self):
+        responses = {
+            'ActiveOrders': 'open_orders.json',
+        }
+        with btce_mock(responses):
+            orders = BTCE('key', 'secret').get_my_open_orders()
+        order = [o for o in orders if o.order_id == u'212120498'][0]
+        self.assertTrue(isinstance(order, cryptex.order.BuyOrder))
+        self.assertEqual(order.as_dict()['amount'], Decimal('1.13461567'))
+        self.assertEqual(order.price, Decimal('0.001'))
+
+    def test_transactions(self):
+        responses = {
+            'TransHistory': 'transaction_history.json',
+        }
+        with btce_mock(responses):
+            transactions = BTCE('key', 'secret').get_my_transactions()
+        for tx in transactions:
+            self.assertTrue(isinstance(tx, (cryptex.transaction.Deposit,
+                                            cryptex.transaction.Withdrawal)))
+
+class TestRecords(unittest.TestCase):
+
+    def test_fee_currency_is_validated(self):
+        self.assertRaises(ValueError, Buy, '1', 'LTC', 'BTC', None, '2',
+                          Decimal('1'), Decimal('1'), Decimal('0.1'), 'USD')
+        self.assertRaises(ValueError, build_trades, [
+            (Buy, '1', 'LTC', 'BTC', None, '2', Decimal('1'), Decimal('1'),
+             Decimal('0.1'), 'USD')])
+
+    def test_bulk_matches_constructor(self):
+        row = (Buy, '1', 'LTC', 'BTC', None, '2', Decimal('1'), Decimal('2'),
+               Decimal('0.1'), 'LTC')
+        built = build_trades([row])[0]
+        constructed = Buy(*row[1:])
+        self.assertEqual(built.as_dict(), constructed.as_dict())
+        self.assertEqual(built.netto_amount(), Decimal('0.9'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import threading
+import time
+import unittest
+
+from cryptex.exchange.cache import ResponseCache
+from cryptex.exchange.btce import BTCEPublic
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class FakeResponse(object):
+    def __init__(self, content):
+        self.content = content
+
+    def json(self, **kwargs):
+        return dict(self.content)
+
+class FakePool(object):
+    def __init__(self, content):
+        self.content = content
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return FakeResponse(self.content)
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.fetches = []
+
+    def fetch(self):
+        self.fetches.append(self.clock.now)
+        return len(self.fetches)
+
+    def test_ttl_per_method(self):
+        cache = ResponseCache({'info': 60}, default_ttl=2, clock=self.clock)
+        self.assertEqual(cache.get(('info',), self.fetch), 1)
+        self.assertEqual(cache.get(('ticker',), self.fetch), 2)
+        self.clock.now += 5
+        self.assertEqual(cache.get(('info',), self.fetch), 1)
+        self.assertEqual(cache.get(('ticker',), self.fetch), 3)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 3)
+
+    def test_stale_while_revalidate(self):
+        cache = ResponseCache(default_ttl=2, stale_ttl=10, clock=self.clock)
+        cache.get(('ticker',), self.fetch)
+        self.clock.now += 5
+        self.assertEqual(cache.get(('ticker',), self.fetch), 1)
+        for _ in range(100):
+            if cache.stats()['entries'] and len(self.fetches) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get(('ticker',), self.fetch), 2)
+        self.assertEqual(cache.stats()['stale_hits'], 1)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        cache = ResponseCache(default_ttl=2)
+        release = threading.Event()
+        def slow_fetch():
+            release.wait(5)
+            return self.fetch()
+        results = []
+        threads = [threading.Thread(target=lambda:
+                   results.append(cache.get(('depth',), slow_fetch)))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        while cache.stats()['coalesced'] < 4:
+            time.sleep(0.01)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(len(self.fetches), 1)
+
+    def test_errors_are_not_cached(self):
+        cache = ResponseCache(clock=self.clock)
+        def failing():
+            raise ValueError('boom')
+        self.assertRaises(ValueError, cache.get, ('info',), failing)
+        self.assertEqual(cache.get(('info',), self.fetch), 1)
+
+class TestBTCEPublicCache(unittest.TestCase):
+
+    def test_info_is_fetched_once(self):
+        pair = {'decimal_places': 3, 'min_amount': 0.01, 'fee': 0.2}
+        pool = FakePool({'server_time': 1397958708, 'pairs': {'btc_usd': pair}})
+        public = BTCEPublic(pool)
+        self.assertEqual(public.get_markets(), [('BTC', 'USD')])
+        self.assertEqual(public.perform_request('info')['pairs'].keys(),
+                         ['btc_usd'])
+        self.assertEqual(len(pool.urls), 1)
+
+    def test_server_time_is_not_cached(self):
+        pool = FakePool({'server_time': 1397958708, 'pairs': {}})
+        public = BTCEPublic(pool)
+        public.perform_request('info')
+        pool.content = {'server_time': 1397958768, 'pairs': {}}
+        info = public.get_info()
+        self.assertEqual(info['server_time'].minute, 52)
+        self.assertEqual(len(pool.urls), 2)
+
+    def test_conversions_leave_cached_response_alone(self):
+        pool = FakePool({'ltc_btc': {'last': 0.025, 'updated': 1397958708}})
+        public = BTCEPublic(pool)
+        first = public.get_ticker([('LTC', 'BTC')])
+        second = public.get_ticker([('LTC', 'BTC')])
+        self.assertEqual(first, second)
+        self.assertEqual(second['ltc_btc']['updated'].year, 2014)
+        self.assertEqual(len(pool.urls), 1)
+
+    def test_cache_disabled(self):
+        pool = FakePool({'server_time': 1397958708, 'pairs': {}})
+        public = BTCEPublic(pool, cache=False)
+        public.get_info()
+        public.get_info()
+        self.assertEqual(len(pool.urls), 2)
+
+    def test_depth_lists_are_copies(self):
+        pool = FakePool({'ltc_btc': {'asks': [[0.025, 1], [0.026, 2]],
+                                     'bids': [[0.022, 1]]}})
+        public = BTCEPublic(pool)
+        depth = public.get_depth(('LTC', 'BTC'))['ltc_btc']
+        depth['asks'].reverse()
+        depth['bids'][0][1] = 0
+        depth = public.get_depth(('LTC', 'BTC'))['ltc_btc']
+        self.assertEqual(depth, {'asks': [[0.025, 1], [0.026, 2]],
+                                 'bids': [[0.022, 1]]})
+        self.assertEqual(len(pool.urls), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import unittest
+from decimal import Decimal
+
+import cryptex.common as common
+from cryptex.exchange import BTCE
+from cryptex.exchange.exchange import ExchangeListener
+from cryptex.lots import LotBook, AVERAGE
+from cryptex.test.test_btce import btce_mock
+from cryptex.trade import Buy, Sell
+
+
+class TestDecimalBackend(unittest.TestCase):
+
+    def test_sell_total_rounds_once(self):
+        sell = Sell(None, 'LTC', 'BTC', None, None, Decimal('1.000000005'),
+                    Decimal('1'), Decimal('0.000000005'), 'BTC')
+        self.assertEqual(sell.netto_total(), Decimal('1.00000000'))
+
+
+class TestFixedBackend(unittest.TestCase):
+
+    def setUp(self):
+        common.set_backend(common.FIXED)
+
+    def tearDown(self):
+        common.set_backend(common.DECIMAL)
+
+    def test_parse(self):
+        parsed = json.loads('{"amount": 1.67577, "id": 84290005, "tiny": 1e-05}',
+                            parse_float=common.parse_float)
+        self.assertEqual(parsed, {'amount': 167577000L, 'id': 84290005,
+                                  'tiny': 1000L})
+        self.assertEqual(common.number('-12.123456789'), -1212345678L)
+        # JSON integers are whole units
+        self.assertEqual(common.number(2), 200000000L)
+        self.assertEqual(common.number(167577000L), 167577000L)
+        self.assertEqual(common.format_number(-1L), '-0.00000001')
+        self.assertEqual(common.format_number(1), '1')
+        self.assertEqual(common.to_fixed(150000000), 15000000000000000L)
+        self.assertEqual(common.to_fixed(150000000L), 150000000L)
+        self.assertEqual(common.to_decimal(2), Decimal('2'))
+
+    def test_rounding_matches_decimal(self):
+        amount, price, fee = '1.67577', '0.03505123', '0.00000100'
+        fixed = Sell(None, 'LTC', 'BTC', None, None, common.number(amount),
+                     common.number(price), common.number(fee), 'BTC')
+        self.assertEqual(fixed.netto_total(), 5873679L)
+        self.assertEqual(str(fixed), '<Sell of 1.67577000 LTC>')
+        common.set_backend(common.DECIMAL)
+        exact = Sell(None, 'LTC', 'BTC', None, None, Decimal(amount),
+                     Decimal(price), Decimal(fee), 'BTC')
+        self.assertEqual(common.from_fixed(5873679), exact.netto_total())
+
+    def test_average_lot(self):
+        book = LotBook(('LTC', 'BTC'), AVERAGE)
+        book.buy(common.number('1'), common.number('0.03'), None)
+        book.buy(common.number('2'), common.number('0.0301'), None)
+        book.sell(common.number('0.5'))
+        self.assertEqual([(l.amount, l.price) for l in book.open_lots()],
+                         [(250000000L, 3006666L)])
+
+    def test_exchange_trades(self):
+        with btce_mock({'TradeHistory': 'trade_history.json'}):
+            trades = BTCE('key', 'secret').get_my_trades()
+        trade = [t for t in trades if t.trade_id == u'20292389'][0]
+        self.assertEqual(trade.amount, 167577000L)
+        self.assertEqual(trade.price, 3505000L)
+        self.assertEqual(trade.order_id, '84290005')
+        self.assertTrue(isinstance(trade, Buy))
+
+    def test_orders_with_plain_numbers(self):
+        btce = BTCE('key', 'secret')
+        sent = []
+        def perform_request(method, params={}):
+            sent.append((params['amount'], params['rate']))
+            return {'order_id': 42, 'funds': None}
+        btce.perform_request = perform_request
+        placed = []
+        listener = ExchangeListener()
+        listener.order_placed = lambda ex, order, balances: placed.append(order)
+        btce.add_listener(listener)
+        btce.buy(('LTC', 'BTC'), 1, 2)
+        btce.sell(('LTC', 'BTC'), 0.5, 0.025)
+        btce.buy(('LTC', 'BTC'), 50000000L, '0.02')
+        self.assertEqual(sent, [('1.00000000', '2.00000000'),
+                                ('0.50000000', '0.02500000'),
+                                ('0.50000000', '0.02000000')])
+        self.assertEqual([(o.amount, o.price) for o in placed],
+                         [(100000000L, 200000000L), (50000000L, 2500000L),
+                          (50000000L, 2000000L)])
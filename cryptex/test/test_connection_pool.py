@@ -0,0 +1,44 @@
+import unittest
+
+import requests
+
+from cryptex.exchange import Cryptsy
+from cryptex.exchange.connection_pool import ConnectionPool
+from cryptex.test.test_cryptsy import cryptsy_mock
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_shared_pool_counts_requests(self):
+        responses = {
+            'getinfo': 'get_info.json',
+            'allmyorders': 'all_my_orders_empty.json',
+        }
+        pool = ConnectionPool(pool_maxsize=2)
+        with cryptsy_mock(responses):
+            c = Cryptsy('key', 'secret', pool=pool)
+            c.get_my_balances()
+            c.get_my_open_orders()
+        stats = pool.stats()
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['waits'], 0)
+        self.assertEqual(stats['overflows'], 0)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['hits'] + stats['new_connections'], 2)
+
+    def test_exhausted_pool_waits_only_when_blocking(self):
+        for pool_block, waits, overflows in ((False, 0, 1), (True, 1, 0)):
+            pool = ConnectionPool(pool_maxsize=1, pool_block=pool_block)
+            pool._acquire('api.cryptsy.com')
+            pool._acquire('api.cryptsy.com')
+            stats = pool.stats()
+            self.assertEqual((stats['waits'], stats['overflows']),
+                             (waits, overflows))
+
+    def test_injected_session(self):
+        session = requests.Session()
+        pool = ConnectionPool(session=session)
+        self.assertIs(pool.session, session)
+        self.assertEqual(pool.stats()['new_connections'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
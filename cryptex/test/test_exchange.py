@@ -0,0 +1,85 @@
+from decimal import Decimal
+import threading
+import unittest
+
+from cryptex.exception import APIException
+from cryptex.exchange.exchange import Exchange, BatchResult, run_batch
+from cryptex.exchange.single_endpoint import SingleEndpointAPI
+from cryptex.order import BuyOrder, SellOrder
+
+class FakeExchange(Exchange):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_id = 100
+        self.cancelled = []
+        self.open_orders = [
+            BuyOrder('1', 'LTC', 'BTC', None, Decimal('1'), Decimal('0.02')),
+            SellOrder('2', 'DOGE', 'BTC', None, Decimal('1000'), Decimal('0.000002')),
+        ]
+
+    def _create(self, market, quantity, price):
+        if quantity <= 0:
+            raise APIException('Invalid quantity')
+        with self.lock:
+            self.next_id += 1
+            return self.next_id
+
+    buy = sell = _create
+
+    def cancel_order(self, order_id):
+        with self.lock:
+            self.cancelled.append(order_id)
+
+    def get_my_open_orders(self):
+        return self.open_orders
+
+class TestBatchOrders(unittest.TestCase):
+
+    def test_submit_orders_in_input_order(self):
+        exchange = FakeExchange()
+        orders = [BuyOrder(None, 'LTC', 'BTC', None, Decimal(i), Decimal('0.02'))
+                  for i in range(1, 11)]
+        orders[3] = SellOrder(None, 'LTC', 'BTC', None, Decimal('0'), Decimal('0.03'))
+        results = exchange.submit_orders(orders)
+        self.assertEqual(len(results), 10)
+        self.assertFalse(results[3].ok)
+        self.assertTrue(isinstance(results[3].error, APIException))
+        self.assertRaises(APIException, results[3].get)
+        ids = [r.get() for i, r in enumerate(results) if i != 3]
+        self.assertEqual(sorted(ids), range(101, 110))
+
+    def test_cancel_all_of_market(self):
+        exchange = FakeExchange()
+        results = exchange.cancel_all(('LTC', 'BTC'))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(exchange.cancelled, ['1'])
+        exchange.cancel_all()
+        self.assertEqual(sorted(exchange.cancelled), ['1', '1', '2'])
+
+    def test_run_batch_empty(self):
+        self.assertEqual(run_batch(None, []), [])
+
+class TestNonceRetry(unittest.TestCase):
+
+    def test_out_of_order_nonce_is_retried(self):
+        responses = [
+            {'success': 0, 'error': 'invalid nonce parameter; on key:5, you sent:4'},
+            {'success': 1, 'return': {'order_id': 7}},
+        ]
+        sent = []
+        class Response(object):
+            def __init__(self, content):
+                self.content = content
+            def json(self, **kwargs):
+                return self.content
+        class Pool(object):
+            def post(self, url, data, headers):
+                sent.append(data['nonce'])
+                return Response(responses.pop(0))
+        api = SingleEndpointAPI('http://example.com', 'key', 'secret', pool=Pool())
+        self.assertEqual(api.perform_request('Trade'), {'order_id': 7})
+        self.assertEqual(len(sent), 2)
+        self.assertTrue(sent[1] > sent[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import time
+import unittest
+
+from cryptex.exception import APIException
+from cryptex.exchange.btce import BTCE
+from cryptex.exchange.cryptsy import Cryptsy
+from cryptex.exchange.nonce import NonceAllocator
+from cryptex.exchange.single_endpoint import SingleEndpointAPI
+from cryptex.test.exchange_server import ExchangeServer, CRYPTSY
+from cryptex.test.exchange_server import BTCE as BTCE_SERVER
+from cryptex.test import load_driver
+
+KEY = 'key'
+SECRET = 'secret'
+
+
+class TestExchangeServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ExchangeServer(CRYPTSY, keys={KEY: SECRET}, size=25)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_cryptsy_trades(self):
+        exchange = Cryptsy(KEY, SECRET, nonce=NonceAllocator())
+        exchange.api.base_url = self.server.private_url
+        trades = exchange.get_my_trades()
+        self.assertEqual(len(trades), 25)
+        self.assertEqual(len(exchange.get_my_open_orders()), 25)
+
+    def test_cryptsy_order(self):
+        exchange = Cryptsy(KEY, SECRET, nonce=NonceAllocator())
+        exchange.api.base_url = self.server.private_url
+        market = exchange.get_markets()[0]
+        self.assertEqual(exchange.buy(market, '1', '0.02'), '300000')
+        self.assertEqual(exchange.sell(market, '1', '0.03'), '300000')
+
+    def test_cryptsy_cancel_all(self):
+        exchange = Cryptsy(KEY, SECRET, nonce=NonceAllocator())
+        exchange.api.base_url = self.server.private_url
+        self.assertEqual(len(exchange.cancel_all(concurrency=8)), 25)
+
+    def test_bad_signature(self):
+        api = SingleEndpointAPI(self.server.private_url, KEY, 'wrong',
+                                nonce=NonceAllocator())
+        with self.assertRaises(APIException):
+            api.perform_request('getinfo')
+        self.assertEqual(self.server.stats['bad_signatures'], 1)
+
+    def test_replayed_nonce(self):
+        ahead = NonceAllocator(int(time.time()) + 1000)
+        api = SingleEndpointAPI(self.server.private_url, KEY, SECRET,
+                                nonce=ahead)
+        api.perform_request('getinfo')
+        # A second client behind on nonces has its calls retried and rejected
+        stale = SingleEndpointAPI(self.server.private_url, KEY, SECRET,
+                                  nonce=NonceAllocator())
+        with self.assertRaises(APIException):
+            stale.perform_request('getinfo')
+        self.assertEqual(self.server.stats['bad_nonces'],
+                         SingleEndpointAPI.NONCE_RETRIES + 1)
+
+    def test_injected_errors(self):
+        self.server.error_rate = 1
+        api = SingleEndpointAPI(self.server.private_url, KEY, SECRET,
+                                nonce=NonceAllocator())
+        with self.assertRaises(APIException):
+            api.perform_request('getinfo')
+
+
+class TestBTCEServer(unittest.TestCase):
+
+    def test_btce_paged_history(self):
+        with ExchangeServer(BTCE_SERVER, keys={KEY: SECRET}, size=30) as server:
+            exchange = BTCE(KEY, SECRET, nonce=NonceAllocator())
+            exchange.api.base_url = server.private_url
+            exchange.public.URL_ROOT = server.public_url
+            self.assertEqual(len(exchange.get_my_trades()), 30)
+            self.assertEqual(len(exchange.public.get_ticker([('LTC', 'BTC')])), 1)
+
+
+class TestLoadDriver(unittest.TestCase):
+
+    def test_run(self):
+        results = load_driver.run(size=5, requests=10, concurrency=[1, 4])
+        for name, runs in results.iteritems():
+            self.assertEqual([r['concurrency'] for r in runs], [1, 4])
+            # Concurrent signed calls may lose nonce races, serial ones not
+            self.assertEqual(runs[0]['errors'], 0, name)
+            for r in runs:
+                self.assertTrue(r['p50'] <= r['p99'])
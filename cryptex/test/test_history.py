@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+import unittest
+
+from cryptex.test.api_mock import APIMock
+from cryptex.exchange import Cryptsy, BTCE
+from cryptex.history import HistoryStore, HistorySync
+import cryptex.trade
+import cryptex.transaction
+
+def mock(exchange, url, responses):
+    test_dir = os.path.dirname(os.path.realpath(__file__))
+    mock_dir = os.path.join(test_dir, 'mocks', exchange)
+    return APIMock(url, mock_dir, responses)
+
+class TestHistorySync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cryptsy_sync_is_incremental(self):
+        responses = {
+            'allmytrades': 'all_my_trades.json',
+            'getmarkets': 'get_markets.json',
+            'mytransactions': 'my_transactions.json',
+        }
+        store = HistoryStore(os.path.join(self.tmp_dir, 'cryptsy'))
+        with mock('cryptsy', 'https://api.cryptsy.com/api', responses):
+            sync = HistorySync(Cryptsy('key', 'secret'), store)
+            trades, transactions = sync.sync()
+            self.assertEqual(len(transactions), 3)
+            self.assertEqual(sync.sync(), ([], []))
+        self.assertEqual(store.last_trade().trade_id, u'27208199')
+
+        reopened = HistoryStore(os.path.join(self.tmp_dir, 'cryptsy'))
+        self.assertEqual(len(reopened.trades()), len(trades))
+        trade = [t for t in reopened.trades() if t.trade_id == u'27208199'][0]
+        self.assertTrue(isinstance(trade, cryptex.trade.Buy))
+        self.assertEqual(trade.amount, Decimal('62661.89842537'))
+        self.assertEqual(trade.fee, Decimal('0.000225580'))
+        self.assertEqual(trade.datetime, store.last_trade().datetime)
+        tx = reopened.transactions()[-1]
+        self.assertTrue(isinstance(tx, cryptex.transaction.Deposit))
+        self.assertEqual(tx.currency, u'Points')
+
+    def test_btce_pages_from_last_id(self):
+        responses = {
+            'TradeHistory': 'trade_history.json',
+        }
+        store = HistoryStore(os.path.join(self.tmp_dir, 'btce'))
+        with mock('btce', 'https://btc-e.com/tapi', responses):
+            sync = HistorySync(BTCE('key', 'secret'), store)
+            trades = sync.get_my_trades()
+        self.assertEqual(store.last_trade().trade_id, u'36117209')
+        self.assertEqual(len(trades), len(set(t.trade_id for t in trades)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import unittest
+from decimal import Decimal
+
+from cryptex.exception import APIException
+from cryptex.exchange.cryptsy import CryptsyPublic
+from cryptex.exchange.json_stream import iter_members
+from cryptex.test.exchange_server import ExchangeServer, CRYPTSY
+
+
+def chunked(document, size):
+    return [document[i:i + size] for i in xrange(0, len(document), size)]
+
+
+class TestIterMembers(unittest.TestCase):
+
+    def test_object_members_across_chunks(self):
+        document = json.dumps({
+            'success': '1',
+            'return': {'markets': {
+                'LTC/BTC': {'price': 0.025, 'trades': [{'id': '1'}]},
+                'ODD/BTC': {'label': 'quotes \\" and }]:, in strings'},
+                'NEW/BTC': [],
+            }},
+        })
+        for size in (1, 5, 4096):
+            header = {}
+            members = dict(iter_members(chunked(document, size),
+                                        ('return', 'markets'), header=header))
+            self.assertEqual(members['LTC/BTC'],
+                             {'price': Decimal('0.025'), 'trades': [{'id': '1'}]})
+            self.assertEqual(members['ODD/BTC']['label'],
+                             'quotes \\" and }]:, in strings')
+            self.assertEqual(members['NEW/BTC'], [])
+            self.assertEqual(header, {'success': '1'})
+
+    def test_array_members(self):
+        document = json.dumps({'return': [{'a': 1}, [2, 3], 4.5, 'x']})
+        self.assertEqual(list(iter_members(chunked(document, 3), ('return',))),
+                         [(0, {'a': 1}), (1, [2, 3]), (2, Decimal('4.5')),
+                          (3, 'x')])
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            list(iter_members(['{"return": {"a": 1'], ('return',)))
+
+
+class TestCryptsyStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ExchangeServer(CRYPTSY, size=5).start()
+        self.public = CryptsyPublic()
+        self.public.api.base_url = self.server.public_url
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_iter_market_data(self):
+        self.public.api.STREAM_CHUNK_SIZE = 100
+        streamed = dict(self.public.iter_market_data())
+        # Prices are random, so compare the shape of the responses
+        self.assertEqual(sorted(streamed), sorted(self.public.get_market_data()))
+        market = streamed['LTC/BTC']
+        self.assertEqual(len(market['recenttrades']), 5)
+        self.assertEqual(market['lasttradetime'].tzinfo.zone, 'UTC')
+
+    def test_iter_order_data(self):
+        streamed = dict(self.public.iter_order_data())
+        self.assertEqual(sorted(streamed), sorted(self.public.get_order_data()))
+        self.assertEqual(len(streamed['LTC/BTC']['buyorders']), 5)
+
+    def test_error(self):
+        self.server.error_rate = 1
+        with self.assertRaises(APIException):
+            list(self.public.iter_order_data())
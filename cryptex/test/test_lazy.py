@@ -0,0 +1,55 @@
+import unittest
+
+from cryptex.exchange.cryptsy import CryptsyPublic
+from cryptex.lazy import LazyRecord
+from cryptex.test.exchange_server import ExchangeServer, CRYPTSY
+
+
+class TestLazyRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        def convert(value):
+            self.calls.append(value)
+            return int(value)
+        self.record = LazyRecord({'a': '1', 'b': 'x'}, {'a': convert})
+
+    def test_converts_once_on_access(self):
+        self.assertEqual(self.record['b'], 'x')
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.record['a'], 1)
+        self.assertEqual(self.record['a'], 1)
+        self.assertEqual(self.calls, ['1'])
+        self.assertEqual(self.record.raw('a'), '1')
+
+    def test_dict_behaviour(self):
+        self.assertEqual(self.record, {'a': 1, 'b': 'x'})
+        self.assertEqual(sorted(self.record), ['a', 'b'])
+        self.assertTrue('a' in self.record)
+        self.assertEqual(self.record.get('c', 3), 3)
+        self.record['a'] = 5
+        self.assertEqual(self.record['a'], 5)
+        del self.record['a']
+        self.assertEqual(dict(self.record), {'b': 'x'})
+        # Only the comparison converted a
+        self.assertEqual(self.calls, ['1'])
+
+
+class TestLazyMarketData(unittest.TestCase):
+
+    def test_prices_skip_timestamp_conversion(self):
+        with ExchangeServer(CRYPTSY, size=5) as server:
+            public = CryptsyPublic()
+            public.api.base_url = server.public_url
+            converter = public._get_converter()
+            calls = []
+            convert = converter.convert
+            converter.convert = lambda s: calls.append(s) or convert(s)
+            try:
+                public.get_last_trade_prices()
+                self.assertEqual(calls, [])
+                market = public.get_market_data()['LTC/BTC']
+                self.assertEqual(market['recenttrades'][0]['time'].tzinfo.zone, 'UTC')
+                self.assertEqual(len(calls), 1)
+            finally:
+                del converter.convert
@@ -0,0 +1,65 @@
+import os
+import json
+import shutil
+import tempfile
+from decimal import Decimal
+import unittest
+
+from cryptex.exchange.market_registry import MarketRegistry, MarketInfo
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class TestMarketRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'markets.json')
+        self.clock = FakeClock()
+        self.loads = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def loader(self):
+        self.loads += 1
+        return [
+            MarketInfo('3', 'LTC', 'BTC'),
+            MarketInfo('132', 'DOGE', 'BTC', 8, Decimal('0.1'), Decimal('0.2')),
+        ]
+
+    def test_lookups_both_ways(self):
+        registry = MarketRegistry(self.loader, clock=self.clock)
+        self.assertEqual(registry.get(('DOGE', 'BTC')).market_id, '132')
+        self.assertEqual(registry.get_by_id('3').market, ('LTC', 'BTC'))
+        self.assertTrue(registry.is_market_id('3'))
+        self.assertFalse(registry.is_market_id(('LTC', 'BTC')))
+        self.assertEqual(self.loads, 1)
+
+    def test_unknown_market_refreshes_once(self):
+        registry = MarketRegistry(self.loader, clock=self.clock)
+        self.assertIsNone(registry.get(('FOO', 'BTC')))
+        self.assertEqual(self.loads, 1)
+        self.clock.now += 120
+        self.assertIsNone(registry.get(('FOO', 'BTC')))
+        self.assertEqual(self.loads, 2)
+
+    def test_persisted_markets_skip_loader(self):
+        MarketRegistry(self.loader, self.path, clock=self.clock).markets()
+        with open(self.path) as f:
+            j = json.load(f)
+        self.assertEqual(j['version'], MarketRegistry.VERSION)
+        self.assertEqual(j['expires_at'], 1000.0 + 3600)
+
+        registry = MarketRegistry(self.loader, self.path, clock=self.clock)
+        market = registry.get(('DOGE', 'BTC'))
+        self.assertEqual(market.min_amount, Decimal('0.1'))
+        self.assertEqual(market.fee, Decimal('0.2'))
+        self.assertEqual(self.loads, 1)
+
+if __name__ == '__main__':
+    unittest.main()
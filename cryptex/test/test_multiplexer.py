@@ -0,0 +1,147 @@
+import json
+import socket
+import threading
+import time
+import unittest
+
+import websocket
+
+from cryptex.soxex.blockchaininfo import BlockChainInfoSocket
+from cryptex.soxex.multiplexer import (SocketManager, ConsumerQueue,
+                                       DROP_OLDEST, BLOCK, COALESCE)
+
+def frame(data, opcode=websocket.ABNF.OPCODE_TEXT, fin=1):
+    return websocket.ABNF(fin, 0, 0, 0, opcode, 0, data).format()
+
+class Server(object):
+    '''
+    Hands out websocket connections whose server ends the test writes to
+    '''
+    def __init__(self):
+        self.peers = {}
+
+    def connect(self, url):
+        client, server = socket.socketpair()
+        ws = websocket.WebSocket()
+        ws.sock = client
+        ws.connected = True
+        self.peers[url] = server
+        return ws
+
+def read_frame(peer):
+    ws = websocket.WebSocket()
+    ws.sock = peer
+    return ws.recv_frame().data
+
+def wait_for(condition, timeout=2):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+class TestConsumerQueue(unittest.TestCase):
+
+    def drain(self, queue):
+        messages = []
+        entry = queue.get()
+        while entry is not None:
+            messages.append(entry[1])
+            entry = queue.get()
+        return messages
+
+    def test_drop_oldest(self):
+        queue = ConsumerQueue(2, DROP_OLDEST)
+        self.assertTrue(queue.put(0, 1))
+        self.assertFalse(queue.put(0, 2))
+        queue.put(0, 3)
+        self.assertEqual(self.drain(queue), [2, 3])
+        self.assertEqual(queue.dropped, 1)
+        self.assertTrue(queue.put(0, 4))
+
+    def test_coalesce_by_key(self):
+        queue = ConsumerQueue(10, COALESCE, key=lambda m: m['market'])
+        queue.put(0, {'market': 'LTC', 'price': 1})
+        queue.put(0, {'market': 'DOGE', 'price': 2})
+        queue.put(0, {'market': 'LTC', 'price': 3})
+        self.assertEqual([m['price'] for m in self.drain(queue)], [3, 2])
+        self.assertEqual(queue.coalesced, 1)
+
+    def test_block(self):
+        queue = ConsumerQueue(1, BLOCK)
+        queue.put(0, 1)
+        t = threading.Thread(target=queue.put, args=(0, 2))
+        t.start()
+        time.sleep(0.02)
+        self.assertTrue(t.is_alive())
+        self.assertEqual(queue.get(), (0, 1))
+        t.join(1)
+        self.assertEqual(self.drain(queue), [2])
+
+class TestSocketManager(unittest.TestCase):
+
+    def setUp(self):
+        self.server = Server()
+        self.manager = SocketManager(connect=self.server.connect)
+        self.manager.start()
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def test_sockets_share_one_loop(self):
+        received = {'a': [], 'b': []}
+        release = threading.Event()
+        def slow(message):
+            release.wait(2)
+            received['a'].append(message)
+        a = self.manager.add('ws://a', slow)
+        b = self.manager.add('ws://b', received['b'].append)
+
+        self.server.peers['ws://a'].sendall(frame(json.dumps({'n': 1})))
+        self.server.peers['ws://b'].sendall(
+            frame('{"n":', fin=0) +
+            frame('', websocket.ABNF.OPCODE_PING) +
+            frame(' 2}', websocket.ABNF.OPCODE_CONT))
+        # b is delivered while a's callback is still busy
+        self.assertTrue(wait_for(lambda: received['b'] == [{'n': 2}]))
+        self.assertEqual(received['a'], [])
+        release.set()
+        self.assertTrue(wait_for(lambda: received['a'] == [{'n': 1}]))
+
+        stats = self.manager.stats()
+        self.assertEqual(stats['ws://b']['delivered'], 1)
+        self.assertEqual(stats['ws://b']['queue_depth'], 0)
+        self.assertTrue(stats['ws://a']['lag'] > 0)
+
+    def test_send_and_close(self):
+        closed = []
+        sock = self.manager.add('ws://a', lambda m: None, on_close=closed.append)
+        sock.send('{"op":"unconfirmed_sub"}')
+        peer = self.server.peers['ws://a']
+        self.assertEqual(read_frame(peer), '{"op":"unconfirmed_sub"}')
+        peer.close()
+        self.assertTrue(wait_for(lambda: len(closed) == 1))
+        self.assertEqual(self.manager.sockets(), [])
+
+    def test_late_close_keeps_socket_on_reused_fd(self):
+        a = self.manager.add('ws://a', lambda m: None)
+        self.server.peers['ws://a'].close()
+        self.assertTrue(wait_for(lambda: self.manager.sockets() == []))
+        b = self.manager.add('ws://b', lambda m: None)
+        # The OS may hand the dropped socket's fd to the new one
+        a.fd = b.fd
+        a.close()
+        self.assertEqual(self.manager.sockets(), [b])
+
+    def test_consumer_on_manager(self):
+        txs = []
+        blockchain = BlockChainInfoSocket(self.manager)
+        blockchain.subscribe_txs(txs.append)
+        peer = self.server.peers[BlockChainInfoSocket.WEBSOCKET_HOST]
+        self.assertEqual(read_frame(peer), '{"op":"unconfirmed_sub"}')
+        peer.sendall(frame('{"op": "utx", "x": {"hash": "abc"}}'))
+        self.assertTrue(wait_for(lambda: txs == [{'hash': 'abc'}]))
+        blockchain.close()
+        self.assertEqual(self.manager.sockets(), [])
+
+if __name__ == '__main__':
+    unittest.main()
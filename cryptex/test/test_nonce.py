@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import cryptex.exchange.nonce as nonce
+from cryptex.exchange.nonce import (NonceAllocator, FileNonceAllocator,
+                                    get_nonce_allocator)
+from cryptex.exchange.single_endpoint import SingleEndpointAPI
+
+class TestNonceAllocator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'nonce')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_strictly_increasing(self):
+        allocator = NonceAllocator()
+        nonces = [allocator.next() for _ in range(5000)]
+        self.assertEqual(nonces, sorted(set(nonces)))
+
+    def test_threads_never_share_a_nonce(self):
+        allocator = NonceAllocator()
+        nonces = []
+        def draw():
+            nonces.extend(allocator.next() for _ in range(1000))
+        threads = [threading.Thread(target=draw) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(set(nonces)), 4000)
+
+    def test_file_allocators_share_high_water_mark(self):
+        a = FileNonceAllocator(self.path)
+        b = FileNonceAllocator(self.path)
+        first = a.next()
+        self.assertEqual(b.next(), first + 1)
+        self.assertEqual(a.next(), first + 2)
+        a.close()
+        b.close()
+
+    def test_restart_continues_above_stored_nonce(self):
+        with open(self.path, 'w') as f:
+            f.write('%020d\n' % (10 ** 12))
+        allocator = FileNonceAllocator(self.path)
+        self.assertEqual(allocator.next(), 10 ** 12 + 1)
+        allocator.close()
+
+    def test_same_key_shares_allocator(self):
+        a = SingleEndpointAPI('https://example.com', 'key', 'secret')
+        b = SingleEndpointAPI('https://example.com', 'key', 'secret')
+        self.assertIs(a.nonce, b.nonce)
+        self.assertIsNone(SingleEndpointAPI('https://example.com').nonce)
+
+    def test_default_allocator_stays_in_process(self):
+        allocator = get_nonce_allocator('in-process-key')
+        self.assertFalse(isinstance(allocator, FileNonceAllocator))
+        nonce._allocators.pop(('in-process-key', None))
+
+    def test_directory_allocator_persists_high_water_mark(self):
+        key = 'persisted-key'
+        allocator = get_nonce_allocator(key, self.tmp_dir)
+        self.assertTrue(isinstance(allocator, FileNonceAllocator))
+        self.assertIs(get_nonce_allocator(key, self.tmp_dir), allocator)
+        self.assertIsNot(get_nonce_allocator(key), allocator)
+        last = max(allocator.next() for _ in range(100))
+        # A restarted process continues above it
+        restarted = FileNonceAllocator(allocator.path)
+        self.assertEqual(restarted.next(), last + 1)
+        self.assertFalse(key in allocator.path)
+        restarted.close()
+        nonce._allocators.pop((key, None))
+        nonce._allocators.pop((key, self.tmp_dir)).close()
+
+if __name__ == '__main__':
+    unittest.main()
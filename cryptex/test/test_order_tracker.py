@@ -0,0 +1,107 @@
+from decimal import Decimal
+import unittest
+
+from cryptex.exchange import BTCE
+from cryptex.exchange.order_tracker import OrderTracker
+from cryptex.exchange.simulated import FeeModel
+from cryptex.test.helpers import utc, CountingExchange
+from cryptex.test.test_btce import btce_mock
+
+MARKET = ('LTC', 'BTC')
+
+class TestOrderTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.exchange = CountingExchange(
+            {'BTC': Decimal('1'), 'LTC': Decimal('10')},
+            FeeModel(Decimal('0.002'), Decimal('0.003')))
+        self.tracker = OrderTracker(self.exchange, max_age=60,
+                                    clock=lambda: self.now)
+
+    def open_orders(self):
+        return sorted((o.order_id, o.amount)
+                      for o in self.tracker.get_my_open_orders())
+
+    def test_tracks_orders_between_polls(self):
+        ex, tracker = self.exchange, self.tracker
+        self.assertEqual(self.open_orders(), [])
+        self.assertEqual(ex.calls['get_my_open_orders'], 1)
+
+        buy = ex.buy(MARKET, Decimal('2'), Decimal('0.02'))
+        sell = ex.sell(MARKET, Decimal('1'), Decimal('0.03'))
+        other = ex.sell(MARKET, Decimal('1'), Decimal('0.04'))
+        ex.cancel_order(other)
+        ex.trade(MARKET, Decimal('0.02'), Decimal('0.5'), utc(2014, 4, 1))
+        ex.get_my_trades()
+        self.assertEqual(self.open_orders(),
+                         [(buy, Decimal('1.5')), (sell, Decimal('1'))])
+        self.assertEqual(ex.calls['get_my_open_orders'], 1)
+
+        self.now = 60
+        self.assertEqual(self.open_orders(),
+                         [(buy, Decimal('1.5')), (sell, Decimal('1'))])
+        self.assertEqual(ex.calls['get_my_open_orders'], 2)
+        diff = tracker.last_diff
+        self.assertEqual([(o.order_id, a) for o, a in diff.partially_filled],
+                         [(buy, Decimal('0.5'))])
+        self.assertEqual((diff.new, diff.filled, diff.cancelled), ([], [], []))
+
+    def test_diff_of_changes_made_elsewhere(self):
+        ex, tracker = self.exchange, self.tracker
+        ex.sell(MARKET, Decimal('1'), Decimal('0.05'))
+        ex.trade(MARKET, Decimal('0.05'), Decimal('1'), utc(2014, 3, 1))
+        ex.get_my_trades()
+        tracker.reconcile()
+        filled = ex.buy(MARKET, Decimal('1'), Decimal('0.02'))
+        partial = ex.sell(MARKET, Decimal('2'), Decimal('0.03'))
+        cancelled = ex.sell(MARKET, Decimal('1'), Decimal('0.04'))
+
+        ex.remove_listener(tracker)
+        new = ex.buy(MARKET, Decimal('1'), Decimal('0.01'))
+        ex.cancel_order(cancelled)
+        ex.add_listener(tracker)
+        ex.trade(MARKET, Decimal('0.02'), Decimal('1'), utc(2014, 4, 1))
+        ex.trade(MARKET, Decimal('0.03'), Decimal('0.5'), utc(2014, 4, 2))
+
+        diff = tracker.reconcile()
+        self.assertEqual([o.order_id for o in diff.new], [new])
+        self.assertEqual([o.order_id for o in diff.filled], [filled])
+        self.assertEqual([o.order_id for o in diff.cancelled], [cancelled])
+        self.assertEqual([(o.order_id, a) for o, a in diff.partially_filled],
+                         [(partial, Decimal('0.5'))])
+        self.assertEqual(self.open_orders(),
+                         [(partial, Decimal('1.5')), (new, Decimal('1'))])
+        self.assertEqual(ex.calls['get_my_new_trades'], 1)
+
+        self.assertFalse(tracker.reconcile())
+        self.assertEqual(tracker.stats()['reconciliations'], 3)
+
+    def test_no_trade_history_download_before_a_trade_is_seen(self):
+        ex, tracker = self.exchange, self.tracker
+        tracker.reconcile()
+        order_id = ex.buy(MARKET, Decimal('1'), Decimal('0.02'))
+        ex.trade(MARKET, Decimal('0.02'), Decimal('1'), utc(2014, 4, 1))
+        diff = tracker.reconcile()
+        self.assertEqual([o.order_id for o in diff.cancelled], [order_id])
+        self.assertEqual(ex.calls['get_my_new_trades'], 0)
+
+    def test_cancel_all_forces_reconciliation(self):
+        ex, tracker = self.exchange, self.tracker
+        ex.buy(MARKET, Decimal('1'), Decimal('0.02'))
+        tracker.get_my_open_orders()
+        tracker.order_cancelled(ex, None)
+        ex.orders.clear()
+        self.assertEqual(self.open_orders(), [])
+        self.assertEqual(ex.calls['get_my_open_orders'], 2)
+
+    def test_btce_order_ids_match_active_orders(self):
+        btce = BTCE('key', 'secret')
+        tracker = OrderTracker(btce, clock=lambda: self.now)
+        with btce_mock({'Trade': 'trade.json',
+                        'ActiveOrders': 'open_orders_placed.json'}):
+            order_id = btce.buy(MARKET, Decimal('1.13461567'), Decimal('0.001'))
+            self.assertEqual(order_id, '212129899')
+            self.assertFalse(tracker.reconcile())
+        order, = tracker.get_my_open_orders()
+        self.assertEqual(order.order_id, '212129899')
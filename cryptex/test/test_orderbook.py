@@ -0,0 +1,74 @@
+from decimal import Decimal as D
+import json
+import unittest
+
+import cryptex.common as common
+from cryptex.orderbook import OrderBook, BID, ASK
+
+MARKET = ('LTC', 'BTC')
+
+class TestOrderBook(unittest.TestCase):
+
+    def setUp(self):
+        self.book = OrderBook(MARKET,
+                              bids=[(D('0.020'), D('1')), (D('0.022'), D('2')),
+                                    (D('0.021'), D('3'))],
+                              asks=[(D('0.025'), D('1')), (D('0.024'), D('4'))])
+
+    def test_best_prices(self):
+        self.assertEqual(self.book.best_bid(), (D('0.022'), D('2')))
+        self.assertEqual(self.book.best_ask(), (D('0.024'), D('4')))
+        self.assertEqual(self.book.spread(), D('0.002'))
+        self.assertEqual(OrderBook(MARKET).best_bid(), None)
+
+    def test_updates(self):
+        self.book.update(BID, D('0.022'), 0)
+        self.book.update(BID, D('0.0215'), D('5'))
+        self.book.update(ASK, D('0.0245'), D('1'))
+        self.assertEqual(self.book.levels(BID), [
+            (D('0.0215'), D('5')), (D('0.021'), D('3')), (D('0.020'), D('1'))])
+        self.assertEqual(self.book.levels(ASK, 2), [
+            (D('0.024'), D('4')), (D('0.0245'), D('1'))])
+        self.book.update(ASK, D('0.03'), 0)
+        self.assertEqual(len(self.book.asks), 3)
+
+    def test_depth_and_cost(self):
+        self.assertEqual(self.book.depth(BID, D('0.021')), D('5'))
+        self.assertEqual(self.book.depth(ASK, D('0.025')), D('5'))
+        self.assertEqual(self.book.depth(ASK, D('0.01')), 0)
+        self.assertEqual(self.book.cost(ASK, D('4.5')),
+                         (D('4.5'), D('4') * D('0.024') + D('0.5') * D('0.025')))
+        self.assertEqual(self.book.cost(ASK, D('10'))[0], D('5'))
+
+    def test_apply_snapshot(self):
+        updates = self.book.apply_snapshot(
+            bids=[(D('0.022'), D('2')), (D('0.021'), D('1'))],
+            asks=[(D('0.024'), D('4')), (D('0.026'), D('1'))])
+        self.assertEqual(sorted(updates), sorted([
+            (BID, D('0.020'), 0), (BID, D('0.021'), D('1')),
+            (ASK, D('0.025'), 0), (ASK, D('0.026'), D('1'))]))
+        self.assertEqual(self.book.levels(ASK), [
+            (D('0.024'), D('4')), (D('0.026'), D('1'))])
+
+    def test_from_cryptsy(self):
+        book = OrderBook.from_cryptsy(MARKET, {
+            'sellorders': [{'sellprice': '0.025', 'quantity': '1', 'total': '0.025'}],
+            'buyorders': [{'buyprice': '0.022', 'quantity': '2', 'total': '0.044'}],
+        })
+        self.assertEqual(book.best_bid(), (D('0.022'), D('2')))
+        self.assertEqual(book.best_ask(), (D('0.025'), D('1')))
+
+    def test_from_btce_depth_fixed(self):
+        common.set_backend(common.FIXED)
+        try:
+            depth = json.loads('{"bids": [[0.022, 2]], "asks": [[0.025, 1.5]]}',
+                               parse_float=common.parse_float)
+            book = OrderBook.from_btce_depth(MARKET, depth)
+            self.assertEqual(book.best_bid(), (2200000L, 200000000L))
+            self.assertEqual(book.cost(ASK, common.number('1')),
+                             (100000000L, 2500000L))
+        finally:
+            common.set_backend(common.DECIMAL)
+
+if __name__ == '__main__':
+    unittest.main()
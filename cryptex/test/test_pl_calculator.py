@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+import unittest
+
+import pytz
+
+from cryptex.pl_calculator import PLCalculator
+from cryptex.lots import LotEngine, FIFO, LIFO, AVERAGE
+from cryptex.trade import Buy, Sell
+from cryptex.transaction import Deposit, Withdrawal
+
+T0 = datetime(2014, 3, 2, 4, 4, 29, tzinfo=pytz.utc)
+MARKET = ('LTC', 'BTC')
+
+def at(minutes):
+    return T0 + timedelta(minutes=minutes)
+
+def buy(minutes, amount, price):
+    return Buy(None, 'LTC', 'BTC', at(minutes), None, Decimal(amount),
+               Decimal(price))
+
+def sell(minutes, amount, price):
+    return Sell(None, 'LTC', 'BTC', at(minutes), None, Decimal(amount),
+                Decimal(price))
+
+class FakeExchange(object):
+    def __init__(self, trades, transactions):
+        self.trades = trades
+        self.transactions = transactions
+
+    def get_my_trades(self):
+        return self.trades
+
+    def get_my_transactions(self):
+        return self.transactions
+
+def lots(buys):
+    return [(b.amount, b.price) for b in buys]
+
+class TestPLCalculator(unittest.TestCase):
+
+    def setUp(self):
+        self.trades = [
+            buy(0, '1', '0.02'),
+            buy(1, '2', '0.03'),
+            sell(2, '2.5', '0.04'),
+        ]
+
+    def test_lifo(self):
+        result = PLCalculator.calculate_pl(MARKET, self.trades)
+        self.assertEqual(lots(result), [(Decimal('0.5'), Decimal('0.02'))])
+
+    def test_fifo(self):
+        result = PLCalculator.calculate_pl(MARKET, self.trades, FIFO)
+        self.assertEqual(lots(result), [(Decimal('0.5'), Decimal('0.03'))])
+
+    def test_average(self):
+        result = PLCalculator.calculate_pl(MARKET, self.trades[:2], AVERAGE)
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result[0].amount, Decimal('3'))
+        self.assertEqual(result[0].price.quantize(Decimal('0.0001')),
+                         Decimal('0.0266'))
+
+    def test_transactions_count_in_later_markets(self):
+        exchange = FakeExchange(
+            [sell(5, '1', '0.04'), buy(6, '3', '0.03')],
+            [Deposit('1', at(0), 'LTC', Decimal('2'), '', Decimal('0')),
+             Withdrawal('2', at(7), 'LTC', Decimal('1'), 'addr')])
+        result = PLCalculator(exchange).unrealized_pl()
+        self.assertEqual(lots(result[MARKET]), [
+            (Decimal('1'), Decimal('0')),
+            (Decimal('2'), Decimal('0.03')),
+        ])
+        self.assertEqual(PLCalculator(exchange).unrealized_pl(('X', 'Y')), [])
+
+    def test_incremental_engine(self):
+        engine = LotEngine(FIFO)
+        for t in self.trades:
+            engine.add(t)
+        engine.add(buy(3, '1', '0.05'))
+        self.assertEqual(lots(engine.open_lots(MARKET)), [
+            (Decimal('0.5'), Decimal('0.03')),
+            (Decimal('1'), Decimal('0.05')),
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import json
+import logging
+import unittest
+
+import pusherclient
+
+import cryptex.soxex.pushersocket as pushersocket
+from cryptex.soxex.cryptsy import CryptsySocket
+
+class Recorder(object):
+    def __init__(self):
+        self.events = []
+
+    def send(self, message):
+        self.events.append(json.loads(message))
+
+    def close(self):
+        pass
+
+class TestPusherConnection(unittest.TestCase):
+
+    def setUp(self):
+        socket = pusherclient.Pusher(CryptsySocket.PUSHER_APP_KEY,
+                                     log_level=logging.ERROR)
+        self.sent = Recorder()
+        socket.connection.socket = self.sent
+        self.connection = pushersocket.PusherConnection(
+            CryptsySocket.PUSHER_APP_KEY, socket)
+        pushersocket._connections[CryptsySocket.PUSHER_APP_KEY] = self.connection
+        # The socket thread is never started
+        self.disconnected = []
+        self.connection.disconnect = lambda: self.disconnected.append(True)
+
+    def tearDown(self):
+        pushersocket._connections.clear()
+
+    def established(self):
+        self.connection.socket.connection._on_message(None, json.dumps({
+            'event': 'pusher:connection_established',
+            'data': json.dumps({'socket_id': '1.2'}),
+        }))
+        self.connection.socket.connection._stop_timers()
+
+    def push(self, channel, data):
+        self.connection.socket._connection_handler(
+            CryptsySocket.PUSHER_EVENT, json.dumps(data), channel)
+
+    def subscribed(self):
+        return [e['data']['channel'] for e in self.sent.events
+                if e['event'] == 'pusher:subscribe']
+
+    def test_channels_share_one_connection(self):
+        trades, tickers = [], []
+        socket = CryptsySocket()
+        socket.subscribe_txs('3', trades.append)
+        socket.subscribe_ticker('3', tickers.append)
+        self.established()
+        self.assertEqual(sorted(self.subscribed()), ['ticker.3', 'trade.3'])
+
+        socket.subscribe_txs('132', trades.append)
+        self.assertEqual(self.subscribed()[-1], 'trade.132')
+        self.push('trade.3', {'trade': 1})
+        self.push('ticker.3', {'ticker': 2})
+        self.push('trade.132', {'trade': 3})
+        self.assertEqual(trades, [{'trade': 1}, {'trade': 3}])
+        self.assertEqual(tickers, [{'ticker': 2}])
+
+        socket.unsubscribe_txs('3')
+        self.assertEqual(self.sent.events[-1], {
+            'event': 'pusher:unsubscribe', 'data': {'channel': 'trade.3'}})
+        self.push('trade.3', {'trade': 4})
+        self.assertEqual(len(trades), 2)
+
+        self.assertEqual(self.disconnected, [])
+        socket.unsubscribe_all()
+        self.assertEqual(self.disconnected, [True])
+        self.assertEqual(pushersocket._connections, {})
+
+    def test_resubscribe_after_reconnect(self):
+        first, second = [], []
+        CryptsySocket().subscribe_txs('3', first.append)
+        self.established()
+        CryptsySocket().subscribe_txs('3', second.append)
+        self.assertEqual(self.subscribed(), ['trade.3'])
+
+        self.sent.events = []
+        self.established()
+        self.assertEqual(self.subscribed(), ['trade.3'])
+        self.push('trade.3', {'trade': 1})
+        self.assertEqual(first, [{'trade': 1}])
+        self.assertEqual(second, [{'trade': 1}])
+
+    def test_subscribers_wait_for_reconnect_after_drop(self):
+        trades = []
+        self.established()
+        self.connection.socket.connection._on_close(None)
+        self.assertFalse(self.connection.connected)
+        CryptsySocket().subscribe_txs('3', trades.append)
+        self.assertEqual(self.subscribed(), [])
+
+        self.established()
+        self.assertEqual(self.subscribed(), ['trade.3'])
+        self.push('trade.3', {'trade': 1})
+        self.assertEqual(trades, [{'trade': 1}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import threading
+import time
+import unittest
+
+from cryptex.exchange.scheduler import (TokenBucket, RequestScheduler,
+                                        ORDER, HISTORY)
+from cryptex.exchange.single_endpoint import SingleEndpointAPI
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        clock = Clock()
+        bucket = TokenBucket(2, 3, clock)
+        for _ in range(3):
+            self.assertEqual(bucket.delay(), 0)
+            bucket.take()
+        self.assertEqual(bucket.delay(), 0.5)
+        clock.now = 0.5
+        self.assertEqual(bucket.delay(), 0)
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def test_orders_jump_ahead_of_history(self):
+        scheduler = RequestScheduler({None: (10, 1)})
+        scheduler.acquire('getinfo')
+        sent = []
+        def request(method):
+            scheduler.acquire(method)
+            sent.append(method)
+        threads = []
+        for method in ('allmytrades', 'TradeHistory', 'mytransactions'):
+            threads.append(threading.Thread(target=request, args=(method,)))
+            threads[-1].start()
+        while sum(scheduler.queue_depth().values()) < 3:
+            time.sleep(0.001)
+        threads.append(threading.Thread(target=request, args=('createorder',)))
+        threads[-1].start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sent[0], 'createorder')
+
+        stats = scheduler.stats()
+        self.assertEqual(stats[ORDER]['requests'], 1)
+        self.assertEqual(stats[HISTORY]['requests'], 3)
+        self.assertEqual(stats[HISTORY]['queued'], 0)
+        self.assertTrue(stats[HISTORY]['max_wait'] > 0)
+
+    def test_endpoint_limit(self):
+        scheduler = RequestScheduler({'depth': (100, 1)})
+        start = time.time()
+        for _ in range(3):
+            scheduler.acquire('depth')
+            scheduler.acquire('ticker')
+        self.assertTrue(time.time() - start >= 0.015)
+
+    def test_nonce_drawn_after_turn(self):
+        order = []
+        class Scheduler(object):
+            def acquire(self, method):
+                order.append('acquire')
+        class Nonce(object):
+            def next(self):
+                order.append('nonce')
+                return 1
+        class Response(object):
+            def json(self, **kwargs):
+                return {'success': 1, 'return': {}}
+        class Pool(object):
+            def post(self, url, **kwargs):
+                order.append('post')
+                return Response()
+        api = SingleEndpointAPI('http://example.com', 'key', 'secret',
+                                pool=Pool(), nonce=Nonce(), scheduler=Scheduler())
+        api.perform_request('getinfo')
+        self.assertEqual(order, ['acquire', 'nonce', 'post'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+from decimal import Decimal
+import unittest
+
+import cryptex.common as common
+from cryptex.exception import APIException
+from cryptex.exchange.simulated import SimulatedExchange, FeeModel
+from cryptex.order import BuyOrder, SellOrder
+from cryptex.orderbook import ASK
+from cryptex.pl_calculator import PLCalculator
+from cryptex.test.helpers import utc
+from cryptex.ticks import Tick, TRADE, BUY, BOOK_ASK
+from cryptex.trade import Buy, Sell
+
+MARKET = ('LTC', 'BTC')
+
+class TestSimulatedExchange(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = SimulatedExchange(
+            {'BTC': Decimal('1'), 'LTC': Decimal('10')},
+            FeeModel(Decimal('0.002'), Decimal('0.003')))
+
+    def test_resting_orders_fill_in_price_time_priority(self):
+        ex = self.exchange
+        first = ex.buy(MARKET, Decimal('1'), Decimal('0.02'))
+        better = ex.buy(MARKET, Decimal('1'), Decimal('0.021'))
+        second = ex.buy(MARKET, Decimal('1'), Decimal('0.02'))
+        self.assertEqual(ex.get_my_balances()['BTC'], Decimal('0.938817'))
+
+        ex.trade(MARKET, Decimal('0.0205'), Decimal('5'), utc(2014, 4, 1))
+        self.assertEqual([t.order_id for t in ex.get_my_trades()], [better])
+        ex.trade(MARKET, Decimal('0.02'), Decimal('1.5'), utc(2014, 4, 2))
+        trades = ex.get_my_trades()
+        self.assertEqual([(t.order_id, t.amount) for t in trades],
+                         [(better, 1), (first, 1), (second, Decimal('0.5'))])
+
+        trade = trades[1]
+        self.assertTrue(isinstance(trade, Buy))
+        self.assertEqual(trade.datetime, utc(2014, 4, 2))
+        self.assertEqual((trade.price, trade.fee, trade.fee_currency),
+                         (Decimal('0.02'), Decimal('0.00004'), 'BTC'))
+
+        order, = ex.get_my_open_orders()
+        self.assertTrue(isinstance(order, BuyOrder))
+        self.assertEqual((order.order_id, order.amount), (second, Decimal('0.5')))
+
+        ex.cancel_order(second)
+        self.assertEqual(ex.get_my_open_orders(), [])
+        self.assertRaises(APIException, ex.cancel_order, second)
+        balances = ex.get_my_balances()
+        self.assertEqual(balances['LTC'], Decimal('12.5'))
+        self.assertEqual(balances['BTC'],
+                         1 - sum(t.amount * t.price + t.fee for t in trades))
+
+    def test_taker_fill_against_book(self):
+        ex = self.exchange
+        ex.feed([
+            Tick(MARKET, utc(2014, 4, 1), BOOK_ASK, Decimal('0.03'), Decimal('2')),
+            Tick(MARKET, utc(2014, 4, 1), BOOK_ASK, Decimal('0.031'), Decimal('5')),
+        ])
+        order_id = ex.buy(MARKET, Decimal('3'), Decimal('0.031'))
+        trades = ex.get_my_trades()
+        self.assertEqual([(t.amount, t.price) for t in trades],
+                         [(Decimal('2'), Decimal('0.03')),
+                          (Decimal('1'), Decimal('0.031'))])
+        self.assertEqual(trades[0].fee, Decimal('0.00018'))
+        self.assertEqual(ex.markets[MARKET].book.best_ask(),
+                         (Decimal('0.031'), Decimal('4')))
+        self.assertEqual(ex.get_my_open_orders(), [])
+
+        sell_id = ex.sell(MARKET, Decimal('4'), Decimal('0.05'))
+        ex.feed([Tick(MARKET, utc(2014, 4, 2), TRADE, Decimal('0.05'), Decimal('10'))])
+        sell = ex.get_my_trades()[-1]
+        self.assertTrue(isinstance(sell, Sell))
+        self.assertEqual(sell.order_id, sell_id)
+        self.assertEqual([t.trade_id for t in ex.get_my_new_trades(trades[-1])],
+                         [sell.trade_id])
+
+        lots = PLCalculator(ex).unrealized_pl(MARKET)
+        self.assertEqual(sum(l.amount for l in lots), Decimal('9'))
+
+    def test_market_trade_fills_at_most_its_amount(self):
+        ex = self.exchange
+        buy = ex.buy(MARKET, Decimal('2'), Decimal('0.03'))
+        sell = ex.sell(MARKET, Decimal('1'), Decimal('0.031'))
+        ex.trade(MARKET, Decimal('0.03'), Decimal('1.5'), utc(2014, 4, 1))
+        self.assertEqual([(t.order_id, t.amount) for t in ex.get_my_trades()],
+                         [(buy, Decimal('1.5'))])
+        # A buyer taking liquidity only fills resting sells
+        ex.feed([Tick(MARKET, utc(2014, 4, 2), BUY, Decimal('0.03'), Decimal('5')),
+                 Tick(MARKET, utc(2014, 4, 3), BUY, Decimal('0.031'), Decimal('5'))])
+        self.assertEqual([(t.order_id, t.amount) for t in ex.get_my_trades()[1:]],
+                         [(sell, Decimal('1'))])
+
+    def test_orders_never_cross_own_book(self):
+        ex = self.exchange
+        ex.buy(MARKET, Decimal('1'), Decimal('0.03'))
+        sell = ex.sell(MARKET, Decimal('1'), Decimal('0.031'))
+        self.assertRaises(APIException, ex.buy, MARKET, Decimal('1'),
+                          Decimal('0.031'))
+        self.assertRaises(APIException, ex.sell, MARKET, Decimal('1'),
+                          Decimal('0.03'))
+        ex.cancel_order(sell)
+        ex.buy(MARKET, Decimal('1'), Decimal('0.031'))
+        self.assertEqual(len(ex.get_my_open_orders()), 2)
+        self.assertEqual(ex.get_my_trades(), [])
+
+    def test_insufficient_funds(self):
+        self.assertRaises(APIException, self.exchange.buy, MARKET,
+                          Decimal('100'), Decimal('0.02'))
+        self.assertRaises(APIException, self.exchange.sell, MARKET,
+                          Decimal('11'), Decimal('0.02'))
+        self.exchange.sell(MARKET, Decimal('10'), Decimal('0.02'))
+        self.assertRaises(APIException, self.exchange.withdraw, 'LTC',
+                          Decimal('1'))
+
+class TestSimulatedExchangeFixed(unittest.TestCase):
+
+    def setUp(self):
+        common.set_backend(common.FIXED)
+
+    def tearDown(self):
+        common.set_backend(common.DECIMAL)
+
+    def test_fixed_point_fills(self):
+        number = common.number
+        ex = SimulatedExchange({'BTC': number('10')}, FeeModel())
+        ex.buy(MARKET, number('1'), number('0.02'))
+        self.assertEqual(ex.get_my_balances()['BTC'], number('9.97994'))
+        ex.trade(MARKET, number('0.02'), number('0.5'), utc(2014, 4, 1))
+        ex.trade(MARKET, number('0.02'), number('0.5'), utc(2014, 4, 2))
+        self.assertEqual([t.fee for t in ex.get_my_trades()],
+                         [number('0.00002')] * 2)
+        self.assertEqual(ex.holds['BTC'], 0)
+        self.assertEqual(ex.get_my_balances(),
+                         {'BTC': number('9.97996'), 'LTC': number('1')})
+
+if __name__ == '__main__':
+    unittest.main()
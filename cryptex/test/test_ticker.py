@@ -0,0 +1,68 @@
+from decimal import Decimal
+import threading
+import unittest
+from multiprocessing import TimeoutError
+
+from cryptex.ticker import ConsolidatedTicker
+from cryptex.exception import APIException
+
+class FakePublic(object):
+    def __init__(self, prices):
+        self.prices = prices
+
+    def get_last_trade_prices(self):
+        if isinstance(self.prices, Exception):
+            raise self.prices
+        return self.prices
+
+class HungPublic(object):
+    def __init__(self):
+        self.release = threading.Event()
+
+    def get_last_trade_prices(self):
+        self.release.wait()
+        return {('LTC', 'BTC'): Decimal('0.024')}
+
+class TestConsolidatedTicker(unittest.TestCase):
+
+    def test_markets_line_up_across_exchanges(self):
+        ticker = ConsolidatedTicker({
+            'btce': FakePublic({('LTC', 'BTC'): Decimal('0.025')}),
+            'cryptsy': FakePublic({(u'ltc', u'XBT'): Decimal('0.026'),
+                                   (u'DOGE', u'BTC'): Decimal('0.0000018')}),
+        })
+        snapshot = ticker.snapshot()
+        self.assertEqual(snapshot.prices[('LTC', 'BTC')], {
+            'btce': Decimal('0.025'),
+            'cryptsy': Decimal('0.026'),
+        })
+        self.assertEqual(snapshot.price(('DOGE', 'BTC'), 'btce'), None)
+        self.assertEqual(sorted(snapshot.timestamps), ['btce', 'cryptsy'])
+        self.assertIs(ticker.snapshot(), snapshot)
+
+    def test_failed_exchange_keeps_previous_prices(self):
+        btce = FakePublic({('LTC', 'BTC'): Decimal('0.025')})
+        ticker = ConsolidatedTicker({'btce': btce})
+        first = ticker.refresh()
+        btce.prices = APIException('down')
+        second = ticker.refresh()
+        self.assertEqual(second.price(('LTC', 'BTC'), 'btce'), Decimal('0.025'))
+        self.assertEqual(second.timestamps['btce'], first.timestamps['btce'])
+        self.assertTrue(isinstance(second.errors['btce'], APIException))
+
+    def test_hung_exchange_times_out(self):
+        hung = HungPublic()
+        ticker = ConsolidatedTicker({
+            'btce': FakePublic({('LTC', 'BTC'): Decimal('0.025')}),
+            'cryptsy': hung,
+        }, timeout=0.1)
+        try:
+            snapshot = ticker.refresh()
+        finally:
+            hung.release.set()
+        self.assertEqual(snapshot.prices[('LTC', 'BTC')],
+                         {'btce': Decimal('0.025')})
+        self.assertTrue(isinstance(snapshot.errors['cryptsy'], TimeoutError))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+from decimal import Decimal
+import os
+import shutil
+import tempfile
+import unittest
+
+from cryptex.orderbook import OrderBook, BID, ASK
+from cryptex.test.helpers import utc
+from cryptex.trade import Buy
+from cryptex.ticks import (TickRecorder, TickReader, RECORD, TRADE, BUY,
+                           TICKER, BOOK_ASK, cryptsy_trade)
+
+class TestTicks(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.recorder = TickRecorder(self.directory)
+        self.reader = TickReader(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record_sample(self):
+        r = self.recorder
+        r.record_trade(('LTC', 'BTC'), Decimal('0.025'), Decimal('1.5'),
+                       utc(2014, 4, 16, 23, 59, 59, 500000))
+        r.record_ticker(('DOGE', 'BTC'), Decimal('0.00000181'),
+                        time=utc(2014, 4, 17, 0, 0, 1))
+        r.record_trades([Buy(1, 'LTC', 'BTC', utc(2014, 4, 17, 0, 0, 2), 2,
+                             Decimal('3'), Decimal('0.026'))])
+        r.record_book(('LTC', 'BTC'), [(ASK, Decimal('0.027'), Decimal('10'))],
+                      utc(2014, 4, 17, 0, 0, 3))
+        r.close()
+
+    def test_segments_per_market_and_day(self):
+        self.record_sample()
+        self.assertEqual(self.reader.markets(), [('DOGE', 'BTC'), ('LTC', 'BTC')])
+        segments = self.reader.segments(('LTC', 'BTC'))
+        self.assertEqual([os.path.basename(s) for s in segments],
+                         ['2014-04-16.ticks', '2014-04-17.ticks'])
+        self.assertEqual(os.path.getsize(segments[1]), 2 * RECORD.size)
+        self.assertEqual(len(self.reader.segments(
+            ('LTC', 'BTC'), start=utc(2014, 4, 17))), 1)
+
+    def test_ticks_in_timestamp_order(self):
+        self.record_sample()
+        ticks = list(self.reader.ticks())
+        self.assertEqual([(t.market[0], t.kind) for t in ticks], [
+            ('LTC', TRADE), ('DOGE', TICKER), ('LTC', BUY), ('LTC', BOOK_ASK)])
+        self.assertEqual(ticks[0].datetime, utc(2014, 4, 16, 23, 59, 59, 500000))
+        self.assertEqual(ticks[0].price, Decimal('0.025'))
+        self.assertEqual(ticks[0].amount, Decimal('1.5'))
+        self.assertEqual(ticks[1].price, Decimal('0.00000181'))
+
+        book = OrderBook(('LTC', 'BTC'))
+        book.update(*ticks[3].book_update())
+        self.assertEqual(book.best_ask(), (Decimal('0.027'), Decimal('10')))
+        self.assertEqual(ticks[0].book_update(), None)
+
+        ticks = list(self.reader.ticks([('LTC', 'BTC')],
+                                       start=utc(2014, 4, 17, 0, 0, 2)))
+        self.assertEqual([t.kind for t in ticks], [BUY, BOOK_ASK])
+
+    def test_replay_speed(self):
+        self.record_sample()
+        now = [0.0]
+        slept = []
+        def sleep(seconds):
+            slept.append(round(seconds, 6))
+            now[0] += seconds
+        ticks = []
+        self.reader.replay(ticks.append, speed=2, sleep=sleep,
+                           clock=lambda: now[0])
+        self.assertEqual(len(ticks), 4)
+        self.assertEqual(slept, [0.75, 0.5, 0.5])
+
+        ticks = []
+        self.reader.replay(ticks.append, sleep=None)
+        self.assertEqual(len(ticks), 4)
+
+    def test_socket_callback(self):
+        callback = self.recorder.trade_callback(('DOGE', 'BTC'), cryptsy_trade)
+        callback({'channel': 'trade.132', 'trade': {
+            'type': 'Buy', 'price': '0.00000180', 'quantity': '1000'}})
+        self.recorder.flush()
+        tick, = self.reader.ticks()
+        self.assertEqual((tick.kind, tick.amount), (BUY, Decimal('1000')))
+
+    def test_partial_record_ignored(self):
+        self.record_sample()
+        path = self.reader.segments(('DOGE', 'BTC'))[0]
+        with open(path, 'ab') as f:
+            f.write('\x00' * 5)
+        self.assertEqual(len(list(self.reader.ticks([('DOGE', 'BTC')]))), 1)
+
+if __name__ == '__main__':
+    unittest.main()
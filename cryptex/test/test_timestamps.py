@@ -0,0 +1,57 @@
+import datetime
+import unittest
+
+import pytz
+
+from cryptex.timestamps import ServerTimeConverter, from_unix
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def reference(timezone, time_str):
+    naive_time = datetime.datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
+    return timezone.normalize(timezone.localize(naive_time)).astimezone(pytz.utc)
+
+class TestServerTimeConverter(unittest.TestCase):
+
+    def setUp(self):
+        self.times = [
+            '2014-03-02 04:04:29',
+            '2014-03-09 01:59:59',
+            '2014-03-09 03:00:00',
+            '2014-11-02 01:30:00',
+            '2014-11-02 02:30:00',
+            '2013-12-31 23:59:59',
+        ]
+
+    def test_matches_strptime_and_localize(self):
+        for zone in ('EST', 'US/Eastern', 'Europe/Moscow'):
+            timezone = pytz.timezone(zone)
+            converter = ServerTimeConverter(timezone)
+            expected = [reference(timezone, t) for t in self.times]
+            self.assertEqual(converter.convert_many(self.times), expected)
+            for t in expected:
+                self.assertEqual(t.tzinfo, pytz.utc)
+
+    def test_malformed_strings_raise(self):
+        converter = ServerTimeConverter(pytz.timezone('EST'))
+        self.assertRaises(ValueError, converter.convert, '2014-03-02T04:04:29Z')
+        self.assertRaises(ValueError, converter.convert, '0000-00-00 00:00:00')
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_convert_array(self):
+        timezone = pytz.timezone('US/Eastern')
+        converter = ServerTimeConverter(timezone)
+        converted = converter.convert_array(self.times)
+        for value, t in zip(converted, self.times):
+            expected = reference(timezone, t).replace(tzinfo=None)
+            self.assertEqual(value.astype(datetime.datetime), expected)
+
+    def test_from_unix(self):
+        self.assertEqual(from_unix(1386830371),
+                         datetime.datetime(2013, 12, 12, 6, 39, 31, tzinfo=pytz.utc))
+
+if __name__ == '__main__':
+    unittest.main()
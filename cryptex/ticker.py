@@ -0,0 +1,120 @@
+import datetime
+import threading
+
+import pytz
+
+from cryptex.exchange.async_exchange import get_default_executor
+
+
+def _fetch(client):
+    # Stamped in the worker, when the exchange answered
+    prices = client.get_last_trade_prices()
+    return prices, datetime.datetime.now(pytz.utc)
+
+
+class TickerSnapshot(object):
+    '''
+    Last trade prices across exchanges at one point in time
+    '''
+    def __init__(self, prices, timestamps, errors):
+        '''
+        :param prices: {market: {exchange name: price}}
+        :param timestamps: {exchange name: UTC datetime its prices were fetched}
+        :param errors: {exchange name: exception} of the last failed refresh
+        '''
+        self.prices = prices
+        self.timestamps = timestamps
+        self.errors = errors
+
+    def markets(self):
+        return self.prices.keys()
+
+    def price(self, market, exchange):
+        return self.prices.get(market, {}).get(exchange)
+
+
+class ConsolidatedTicker(object):
+    '''
+    Consolidated last trade prices of several public clients
+
+    clients maps exchange names to objects with get_last_trade_prices(), such
+    as BTCEPublic and CryptsyPublic. All clients are queried concurrently and
+    their market tuples are normalized, so the same market lines up across
+    exchanges. After start(), a background thread keeps the snapshot fresh
+    and snapshot() answers from memory. An exchange that does not answer
+    within timeout seconds counts as failed for that refresh.
+    '''
+    ALIASES = {'XBT': 'BTC'}
+
+    def __init__(self, clients, interval=5, aliases=None, executor=None,
+                 timeout=30):
+        self.clients = clients
+        self.interval = interval
+        self.timeout = timeout
+        self.aliases = ConsolidatedTicker.ALIASES if aliases is None else aliases
+        self.executor = executor or get_default_executor()
+        self._snapshot = None
+        self._results = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def normalize(self, market):
+        return tuple(self.aliases.get(c.upper(), c.upper()) for c in market)
+
+    def refresh(self):
+        '''
+        Queries all clients and returns the new snapshot. Exchanges that fail
+        keep their previous prices.
+        '''
+        pending = [(name, self.executor.apply_async(_fetch, (client,)))
+                   for name, client in self.clients.iteritems()]
+        fetched = {}
+        errors = {}
+        for name, result in pending:
+            try:
+                fetched[name] = result.get(self.timeout)
+            except Exception as e:
+                errors[name] = e
+
+        with self._lock:
+            for name, (prices, timestamp) in fetched.iteritems():
+                previous = self._results.get(name)
+                if previous is None or previous[1] < timestamp:
+                    self._results[name] = (prices, timestamp)
+
+            prices = {}
+            timestamps = {}
+            for name, (exchange_prices, timestamp) in self._results.iteritems():
+                timestamps[name] = timestamp
+                for market, price in exchange_prices.iteritems():
+                    prices.setdefault(self.normalize(market), {})[name] = price
+            self._snapshot = TickerSnapshot(prices, timestamps, errors)
+            return self._snapshot
+
+    def snapshot(self):
+        '''
+        Returns the latest TickerSnapshot, refreshing first if there is none
+        '''
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        return snapshot
+
+    def start(self):
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception:
+                    pass
+                if self._stop.wait(self.interval):
+                    return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,288 @@
+'''
+Compact binary recording of market events and their replay.
+
+Events are stored as fixed-width little-endian records of a timestamp in
+microseconds, a kind, a price and an amount, the latter two in satoshis
+(see common.to_fixed; anything beyond 8 decimal places is truncated), and
+are read back as numbers of the active common backend. Each
+market has its own directory with one segment file per UTC day:
+
+    <directory>/LTC_BTC/2014-04-16.ticks
+
+Records are appended in the order they are recorded, which is expected to
+be chronological within a segment.
+'''
+import datetime
+import heapq
+import mmap
+import os
+import struct
+import threading
+import time
+import pytz
+
+import cryptex.common as common
+from cryptex.orderbook import BID, ASK
+
+RECORD = struct.Struct('<qBqq')
+SUFFIX = '.ticks'
+
+# Kinds. Trades use the trade_type of cryptex.trade classes.
+TRADE = 0
+BUY = 1
+SELL = 2
+TICKER = 3
+BOOK_BID = 4
+BOOK_ASK = 5
+
+BOOK_KINDS = {BID: BOOK_BID, ASK: BOOK_ASK}
+BOOK_SIDES = {BOOK_BID: BID, BOOK_ASK: ASK}
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+def to_micros(dt):
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def from_micros(micros):
+    return EPOCH + datetime.timedelta(microseconds=micros)
+
+
+class Tick(object):
+    '''
+    One recorded event of a market
+    '''
+    __slots__ = ('market', 'datetime', 'kind', 'price', 'amount')
+
+    def __init__(self, market, datetime, kind, price, amount):
+        self.market = market
+        self.datetime = datetime
+        self.kind = kind
+        self.price = price
+        self.amount = amount
+
+    def book_update(self):
+        '''
+        Returns (side, price, amount) for OrderBook.update, or None if this
+        is not a book update
+        '''
+        side = BOOK_SIDES.get(self.kind)
+        if side is None:
+            return None
+        return (side, self.price, self.amount)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in Tick.__slots__}
+
+    def __repr__(self):
+        return 'Tick(%r)' % self.as_dict()
+
+
+def _market_dir(market):
+    return '%s_%s' % market
+
+def _parse_market_dir(name):
+    return tuple(name.split('_', 1))
+
+
+class TickRecorder(object):
+    '''
+    Appends events to per market and day segments under directory
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _file(self, market, day):
+        key = (market, day)
+        f = self._files.get(key)
+        if f is None:
+            for k in [k for k in self._files if k[0] == market]:
+                self._files.pop(k).close()
+            path = os.path.join(self.directory, _market_dir(market))
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            f = self._files[key] = open(
+                os.path.join(path, day.isoformat() + SUFFIX), 'ab')
+        return f
+
+    def record(self, market, kind, price, amount=0, time=None):
+        '''
+        Appends one event. time is a UTC datetime and defaults to now.
+        '''
+        if time is None:
+            time = datetime.datetime.now(pytz.utc)
+        data = RECORD.pack(to_micros(time), kind, common.to_fixed(price),
+                           common.to_fixed(amount))
+        with self._lock:
+            self._file(tuple(market), time.date()).write(data)
+
+    def record_trade(self, market, price, amount, time=None, kind=TRADE):
+        self.record(market, kind, price, amount, time)
+
+    def record_trades(self, trades):
+        '''
+        Records cryptex.trade.Trade objects, e.g. from get_my_trades
+        '''
+        for t in trades:
+            self.record((t.base_currency, t.counter_currency), t.trade_type,
+                        t.price, t.amount, t.datetime)
+
+    def record_ticker(self, market, price, volume=0, time=None):
+        self.record(market, TICKER, price, volume, time)
+
+    def record_prices(self, prices, time=None):
+        '''
+        Records the result of a public client's get_last_trade_prices
+        '''
+        if time is None:
+            time = datetime.datetime.now(pytz.utc)
+        for market, price in prices.iteritems():
+            self.record(market, TICKER, price, 0, time)
+
+    def record_book(self, market, updates, time=None):
+        '''
+        Records (side, price, amount) updates, such as those returned by
+        OrderBook.apply_snapshot
+        '''
+        if time is None:
+            time = datetime.datetime.now(pytz.utc)
+        for side, price, amount in updates:
+            self.record(market, BOOK_KINDS[side], price, amount, time)
+
+    def trade_callback(self, market, extract):
+        '''
+        Returns a socket callback that records the trades it receives.
+        extract(data) returns (kind, price, amount) of a message, see
+        bitstamp_trade and cryptsy_trade.
+        '''
+        def callback(data):
+            kind, price, amount = extract(data)
+            self.record(market, kind, price, amount)
+        return callback
+
+    def flush(self):
+        with self._lock:
+            for f in self._files.values():
+                f.flush()
+
+    def close(self):
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+
+def bitstamp_trade(data):
+    '''
+    (kind, price, amount) of a BitstampSocket live_trades message
+    '''
+    return (TRADE, common.number(data['price']), common.number(data['amount']))
+
+def cryptsy_trade(data):
+    '''
+    (kind, price, amount) of a CryptsySocket trade message
+    '''
+    trade = data['trade']
+    kind = BUY if trade.get('type') == 'Buy' else SELL
+    return (kind, common.number(trade['price']), common.number(trade['quantity']))
+
+
+class TickReader(object):
+    '''
+    Reads the segments written by a TickRecorder through memory maps
+    '''
+    def __init__(self, directory):
+        self.directory = directory
+
+    def markets(self):
+        return sorted(_parse_market_dir(name)
+                      for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)))
+
+    def segments(self, market, start=None, end=None):
+        '''
+        Returns the segment paths of market, oldest first, limited to the
+        days from start to end (dates or datetimes) if given
+        '''
+        path = os.path.join(self.directory, _market_dir(tuple(market)))
+        if not os.path.isdir(path):
+            return []
+        start_day = start and start.isoformat()[:10]
+        end_day = end and end.isoformat()[:10]
+        days = []
+        for name in sorted(os.listdir(path)):
+            if not name.endswith(SUFFIX):
+                continue
+            day = name[:-len(SUFFIX)]
+            if (start_day and day < start_day) or (end_day and day > end_day):
+                continue
+            days.append(os.path.join(path, name))
+        return days
+
+    @staticmethod
+    def _records(path):
+        '''
+        Yields the raw (micros, kind, price, amount) records of a segment
+        '''
+        size = RECORD.size
+        with open(path, 'rb') as f:
+            length = os.fstat(f.fileno()).st_size
+            # Ignore a trailing partial record of an interrupted write
+            length -= length % size
+            if not length:
+                return
+            data = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+            try:
+                unpack_from = RECORD.unpack_from
+                for offset in xrange(0, length, size):
+                    yield unpack_from(data, offset)
+            finally:
+                data.close()
+
+    def _market_records(self, market, start, end):
+        start_us = start and to_micros(start)
+        end_us = end and to_micros(end)
+        for path in self.segments(market, start, end):
+            for record in self._records(path):
+                if start_us and record[0] < start_us:
+                    continue
+                if end_us and record[0] > end_us:
+                    continue
+                yield record
+
+    def ticks(self, markets=None, start=None, end=None):
+        '''
+        Yields the Ticks of markets (default all) between the UTC datetimes
+        start and end, in timestamp order across markets
+        '''
+        if markets is None:
+            markets = self.markets()
+        markets = [tuple(m) for m in markets]
+        def stream(index, market):
+            for r in self._market_records(market, start, end):
+                yield (r[0], index) + r[1:]
+        streams = [stream(i, m) for i, m in enumerate(markets)]
+        from_fixed = common.fixed_to_number
+        for micros, i, kind, price, amount in heapq.merge(*streams):
+            yield Tick(markets[i], from_micros(micros), kind,
+                       from_fixed(price), from_fixed(amount))
+
+    def replay(self, callback, markets=None, start=None, end=None, speed=None,
+               sleep=time.sleep, clock=time.time):
+        '''
+        Calls callback(tick) for every tick, like a socket callback. With the
+        default speed of None ticks are replayed as fast as possible; speed=1
+        keeps the recorded intervals and speed=10 runs ten times as fast.
+        '''
+        started = first = None
+        for tick in self.ticks(markets, start, end):
+            if speed:
+                micros = to_micros(tick.datetime)
+                if first is None:
+                    started, first = clock(), micros
+                delay = started + (micros - first) / 1e6 / speed - clock()
+                if delay > 0:
+                    sleep(delay)
+            callback(tick)
@@ -0,0 +1,97 @@
+'''
+Conversion of exchange timestamps to timezone-aware datetimes in UTC.
+'''
+import datetime
+import threading
+
+import pytz
+
+SERVER_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def from_unix(timestamp):
+    '''
+    Convert a unix timestamp to a datetime in UTC
+    '''
+    return datetime.datetime.fromtimestamp(timestamp, pytz.utc)
+
+def from_unix_many(timestamps):
+    utc = pytz.utc
+    fromtimestamp = datetime.datetime.fromtimestamp
+    return [fromtimestamp(t, utc) for t in timestamps]
+
+
+class ServerTimeConverter(object):
+    '''
+    Converts "YYYY-MM-DD HH:MM:SS" strings in a server's local time to UTC
+
+    The UTC offset is looked up once per local hour and cached, which assumes
+    the server timezone only changes its offset on whole hours. Strings are
+    parsed by position; anything else falls back to strptime.
+    '''
+    MAX_CACHED_HOURS = 100000
+
+    def __init__(self, timezone):
+        self.timezone = timezone
+        self._offsets = {}
+
+    def _offset(self, time_str):
+        hour = time_str[:13]
+        offset = self._offsets.get(hour)
+        if offset is None:
+            naive = datetime.datetime(int(time_str[0:4]), int(time_str[5:7]),
+                                      int(time_str[8:10]), int(time_str[11:13]))
+            offset = self.timezone.localize(naive).utcoffset()
+            if len(self._offsets) >= self.MAX_CACHED_HOURS:
+                self._offsets = {}
+            self._offsets[hour] = offset
+        return offset
+
+    def _convert_slow(self, time_str):
+        naive_time = datetime.datetime.strptime(time_str, SERVER_FORMAT)
+        tz = self.timezone
+        return tz.normalize(tz.localize(naive_time)).astimezone(pytz.utc)
+
+    def convert(self, time_str):
+        if len(time_str) != 19:
+            return self._convert_slow(time_str)
+        try:
+            utc_time = datetime.datetime(
+                int(time_str[0:4]), int(time_str[5:7]), int(time_str[8:10]),
+                int(time_str[11:13]), int(time_str[14:16]), int(time_str[17:19]),
+                tzinfo=pytz.utc)
+        except ValueError:
+            return self._convert_slow(time_str)
+        return utc_time - self._offset(time_str)
+
+    def convert_many(self, time_strs):
+        convert = self.convert
+        return [convert(s) for s in time_strs]
+
+    def convert_array(self, time_strs):
+        '''
+        Vectorized conversion of a sequence of strings to a numpy
+        datetime64[s] array in UTC. Requires numpy.
+        '''
+        import numpy as np
+        local = np.array(time_strs, dtype='datetime64[s]')
+        hours = local.astype('datetime64[h]')
+        unique_hours, index = np.unique(hours, return_inverse=True)
+        offsets = np.array([
+            int(self._offset(str(h).replace('T', ' ')).total_seconds())
+            for h in unique_hours
+        ], dtype='int64').astype('timedelta64[s]')
+        return local - offsets[index]
+
+
+_converters = {}
+_converters_lock = threading.Lock()
+
+def get_converter(timezone):
+    '''
+    Returns the converter shared by all clients of a server timezone
+    '''
+    with _converters_lock:
+        converter = _converters.get(timezone.zone)
+        if converter is None:
+            converter = _converters[timezone.zone] = ServerTimeConverter(timezone)
+        return converter
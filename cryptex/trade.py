@@ -4,6 +4,8 @@ class Trade(object):
     '''
     Basic trade
     '''
+    __slots__ = ('trade_id', 'base_currency', 'counter_currency', 'datetime',
+                 'order_id', 'amount', 'price', 'fee', 'fee_currency')
     trade_type = 0
     def __init__(self, trade_id, base_currency, counter_currency,
                 datetime, order_id, amount, price, fee=None, fee_currency=None):
@@ -18,6 +20,7 @@ class Trade(object):
         :param fee: anmount of fee payed to the exchange
         :param fee_currency: the currency the fee was payed in (base_currency or counter_currency)
         '''
+        _check_fee_currency(base_currency, counter_currency, fee, fee_currency)
         self.trade_id = trade_id
         self.base_currency = base_currency
         self.counter_currency = counter_currency
@@ -28,22 +31,20 @@ class Trade(object):
         self.fee = fee
         self.fee_currency = fee_currency
 
-    def __setattr__(self, name, value):
-        if name == 'fee_currency' and self.fee and \
-                value not in (self.base_currency, self.counter_currency):
-            raise ValueError('Wrong fee_currency "%r"' % value)
-        super(Trade, self).__setattr__(name, value)
-
     def type(self):
         return self.__class__.__name__
 
+    def as_dict(self):
+        return {name: getattr(self, name) for name in Trade.__slots__}
+
     def __str__(self):
         return '<%s of %.8f %s>' % (self.type(),
-                                    self.amount,
+                                    common.to_decimal(self.amount),
                                     self.base_currency)
 
 
 class Buy(Trade):
+    __slots__ = ()
     trade_type = 1
 
     def netto_amount(self):
@@ -52,9 +53,10 @@ class Buy(Trade):
         return self.amount
 
     def netto_total(self):
-        return common.quantize(self.amount * self.price)
+        return common.mul(self.amount, self.price)
 
 class Sell(Trade):
+    __slots__ = ()
     trade_type = 2
 
     def netto_amount(self):
@@ -62,5 +64,35 @@ class Sell(Trade):
 
     def netto_total(self):
         if self.fee is not None:
-            return common.quantize((self.amount * self.price) - self.fee)
-        return common.quantize(self.amount * self.price)
+            return common.quantize(
+                common.descale(self.amount * self.price) - self.fee)
+        return common.mul(self.amount, self.price)
+
+def _check_fee_currency(base_currency, counter_currency, fee, fee_currency):
+    if fee and fee_currency not in (base_currency, counter_currency):
+        raise ValueError('Wrong fee_currency "%r"' % fee_currency)
+
+def build_trades(rows):
+    '''
+    Builds trades from rows of the form (cls, trade_id, base_currency,
+    counter_currency, datetime, order_id, amount, price, fee, fee_currency),
+    skipping the per-object constructor call.
+    '''
+    trades = []
+    append = trades.append
+    new = object.__new__
+    for (cls, trade_id, base_currency, counter_currency, datetime, order_id,
+         amount, price, fee, fee_currency) in rows:
+        _check_fee_currency(base_currency, counter_currency, fee, fee_currency)
+        t = new(cls)
+        t.trade_id = trade_id
+        t.base_currency = base_currency
+        t.counter_currency = counter_currency
+        t.datetime = datetime
+        t.order_id = order_id
+        t.amount = amount
+        t.price = price
+        t.fee = fee
+        t.fee_currency = fee_currency
+        append(t)
+    return trades
@@ -1,8 +1,12 @@
+import cryptex.common as common
+
 class Transaction(object):
     '''
     Transaction that is neither deopsit nor withdrawal
     Used for CryptsyPoint credit
     '''
+    __slots__ = ('transaction_id', 'datetime', 'currency', 'amount', 'address',
+                 'fee')
     transaction_type = 0
     def __init__(self, transaction_id, datetime, currency, amount, address, fee=None):
         self.transaction_id = transaction_id
@@ -15,12 +19,36 @@ class Transaction(object):
     def type(self):
         return self.__class__.__name__
 
+    def as_dict(self):
+        return {name: getattr(self, name) for name in Transaction.__slots__}
+
     def __str__(self):
         return '<%s transaction of %.8f %s>' % (self.type(),
-                                                self.amount,
+                                                common.to_decimal(self.amount),
                                                 self.currency)
 class Deposit(Transaction):
+    __slots__ = ()
     transaction_type = 1
 
 class Withdrawal(Transaction):
+    __slots__ = ()
     transaction_type = 2
+
+def build_transactions(rows):
+    '''
+    Builds transactions from rows of the form (cls, transaction_id, datetime,
+    currency, amount, address, fee).
+    '''
+    transactions = []
+    append = transactions.append
+    new = object.__new__
+    for cls, transaction_id, datetime, currency, amount, address, fee in rows:
+        t = new(cls)
+        t.transaction_id = transaction_id
+        t.datetime = datetime
+        t.currency = currency
+        t.amount = amount
+        t.address = address
+        t.fee = fee
+        append(t)
+    return transactions
@@ -11,5 +11,8 @@ setup(
         'httpretty>=0.8.0',
         'websocket-client==0.12.0',
         'pusherclient==0.2.0',
-    ]
+    ],
+    extras_require={
+        'batch': ['numpy>=1.7'],
+    }
 )